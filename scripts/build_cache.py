@@ -0,0 +1,136 @@
+import hashlib
+import pickle
+import shutil
+import tempfile
+import time
+
+
+FORMAT_VERSION = 1
+END = "end"
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    try:
+        with open(path, "rb") as handle:
+            for block in iter(lambda: handle.read(1 << 20), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """Normalised records stored as a stream of pickles, validated by source hashes.
+
+    The file holds a header (format version, salt, source digests and any
+    extra values), one pickle per record and an end marker, so both writing
+    and reading handle one record at a time. load settles the cache before
+    anything streams and can keep a compact index entry per record in the
+    header, so callers can look across the whole dataset without reading
+    the records back.
+    """
+
+    def __init__(self, path, sources, salt=""):
+        self.path = path
+        self.sources = sources
+        self.salt = salt
+        self.warm = None
+        self.header = {}
+        self.index = None
+        self.digests = None
+        self.parse = None
+        self.count = 0
+        self.elapsed = 0.0
+
+    def source_digests(self):
+        return {name: file_digest(path) for name, path in sorted(self.sources.items())}
+
+    def load(self, parse, header=None, derive=None, index=None):
+        """Validate the cache now, rewriting it in full on a miss; returns the index entries."""
+        started = time.perf_counter()
+        self.digests = self.source_digests()
+        self.parse = parse
+        handle = self.open(self.digests)
+        self.warm = handle is not None
+        if self.warm:
+            handle.close()
+        else:
+            self.store(self.digests, parse(), header() if header else {}, derive, index)
+        self.elapsed += time.perf_counter() - started
+        return self.index
+
+    def cached_records(self, restore=None):
+        """Stream the records of a cache settled by load."""
+        self.count = 0
+        started = time.perf_counter()
+        handle = self.open(self.digests)
+        # Another build may have replaced the file since load; parse rather than mix datasets.
+        source = self.read(handle, restore) if handle is not None else self.parse()
+        self.elapsed += time.perf_counter() - started
+        while True:
+            started = time.perf_counter()
+            try:
+                record = next(source)
+            except StopIteration:
+                return
+            finally:
+                self.elapsed += time.perf_counter() - started
+            self.count += 1
+            yield record
+
+    def open(self, digests):
+        try:
+            handle = open(self.path, "rb")
+        except OSError:
+            return None
+        try:
+            header = pickle.load(handle)
+        except Exception:
+            handle.close()
+            return None
+        if (
+            not isinstance(header, dict)
+            or header.get("version") != FORMAT_VERSION
+            or header.get("salt") != self.salt
+            or header.get("sources") != digests
+        ):
+            handle.close()
+            return None
+        self.header = header.get("extra", {})
+        self.index = header.get("index")
+        return handle
+
+    def read(self, handle, restore):
+        with handle:
+            while True:
+                entry = pickle.load(handle)
+                if entry == END:
+                    return
+                record, extra = entry
+                if restore is not None:
+                    restore(record, extra)
+                yield record
+
+    def store(self, digests, records, header, derive, index):
+        """Write every record, then the header with its index entries ahead of them."""
+        import shared_cache
+
+        self.header = header
+        self.index = [] if index else None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryFile(dir=self.path.parent) as body:
+            for record in records:
+                if index:
+                    self.index.append(index(record))
+                pickle.dump((record, derive(record) if derive else None), body, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(END, body, pickle.HIGHEST_PROTOCOL)
+            body.seek(0)
+            with shared_cache.atomic_file(self.path) as handle:
+                meta = {"version": FORMAT_VERSION, "salt": self.salt, "sources": digests, "extra": header, "index": self.index}
+                pickle.dump(meta, handle, pickle.HIGHEST_PROTOCOL)
+                shutil.copyfileobj(body, handle)
+
+    def describe(self):
+        label = "warm (build cache hit)" if self.warm else "cold (parsed JSON, refreshed build cache)"
+        return f"Loaded {self.count} destinations in {self.elapsed * 1000:.0f} ms, {label}"
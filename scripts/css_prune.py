@@ -0,0 +1,228 @@
+import re
+
+
+COMMENT = re.compile(r"/\*.*?\*/", re.S)
+TAG_NAME = re.compile(r"<([a-zA-Z][a-zA-Z0-9-]*)")
+# Literal prefixes keep these scans fast; a stray "data-class=" only makes
+# pruning keep more rules, never fewer.
+CLASS_ATTR = re.compile(r"""class\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>"']+))""")
+ID_ATTR = re.compile(r"""id\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>"']+))""")
+WORD = re.compile(r"[A-Za-z_][\w-]*")
+PSEUDO_ARGS = re.compile(r"::?[\w-]+\((?:[^()]|\([^()]*\))*\)")
+PSEUDO = re.compile(r"::?[\w-]+")
+ATTRIBUTE_SELECTOR = re.compile(r"\[\s*([\w-]+)[^\]]*\]")
+CLASS_OR_ID = re.compile(r"([.#])(-?[A-Za-z_][\w-]*)")
+ELEMENT = re.compile(r"(?:^|[\s>+~(])([a-zA-Z][a-zA-Z0-9]*)")
+GROUPING_AT_RULES = ("@media", "@supports", "@layer", "@container")
+ALWAYS_USED = {"html", "body", "root"}
+SCRIPT_CACHE_SIZE = 64
+
+
+def split_rules(text):
+    """Split a stylesheet into (prelude, body, source) tuples, body None for statements."""
+    rules = []
+    pos = 0
+    length = len(text)
+    while pos < length:
+        while pos < length and text[pos].isspace():
+            pos += 1
+        if pos >= length:
+            break
+        start = pos
+        quote = None
+        while pos < length:
+            ch = text[pos]
+            if quote:
+                if ch == "\\":
+                    pos += 1
+                elif ch == quote:
+                    quote = None
+            elif ch in "\"'":
+                quote = ch
+            elif ch in "{;":
+                break
+            pos += 1
+        prelude = text[start:pos].strip()
+        if pos >= length or text[pos] == ";":
+            pos += 1
+            rules.append((prelude, None, text[start:pos].strip()))
+            continue
+        depth = 0
+        body_start = pos + 1
+        while pos < length:
+            ch = text[pos]
+            if quote:
+                if ch == "\\":
+                    pos += 1
+                elif ch == quote:
+                    quote = None
+            elif ch in "\"'":
+                quote = ch
+            elif ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    break
+            pos += 1
+        rules.append((prelude, text[body_start:pos], text[start : pos + 1]))
+        pos += 1
+    return rules
+
+
+def attribute_pattern(names):
+    if not names:
+        return None
+    alternatives = "|".join(re.escape(name) for name in sorted(names, key=len, reverse=True))
+    return re.compile(r"(" + alternatives + r")(?=\s*=|[\s/>])")
+
+
+def script_blocks(html):
+    pos = 0
+    while True:
+        start = html.find("<script", pos)
+        if start < 0:
+            return
+        start = html.find(">", start) + 1
+        end = html.find("</script>", start)
+        if start <= 0 or end < 0:
+            return
+        yield html[start:end]
+        pos = end
+
+
+def markup_tokens(html, attributes=None):
+    """Tokens ("<tag", ".class", "#id", "[attr") the markup of html provides.
+
+    Only attribute names matched by the attributes pattern are collected,
+    since those are the only ones a selector can ask for.
+    """
+    tokens = {"<" + name.lower() for name in set(TAG_NAME.findall(html))}
+    for value in set(CLASS_ATTR.findall(html)):
+        tokens.update("." + item for item in "".join(value).split())
+    tokens.update("#" + "".join(value) for value in ID_ATTR.findall(html))
+    if attributes is not None:
+        tokens.update("[" + name.lower() for name in set(attributes.findall(html)))
+    return tokens
+
+
+def selector_requirements(selector):
+    selector = PSEUDO_ARGS.sub("", selector)
+    needed = set()
+    for name in ATTRIBUTE_SELECTOR.findall(selector):
+        needed.add("[" + name.lower())
+    selector = ATTRIBUTE_SELECTOR.sub("", selector)
+    for kind, name in CLASS_OR_ID.findall(selector):
+        needed.add(kind + name)
+    selector = PSEUDO.sub("", CLASS_OR_ID.sub("", selector))
+    for name in ELEMENT.findall(selector):
+        needed.add("<" + name.lower())
+    return needed
+
+
+def selector_used(selector, tokens, keep_prefixes=()):
+    for token in selector_requirements(selector):
+        if token in tokens or token[1:] in ALWAYS_USED:
+            continue
+        if token[0] == "." and token[1:].startswith(keep_prefixes):
+            continue
+        return False
+    return True
+
+
+def prune_rules(rules, tokens, keep_prefixes=()):
+    kept = []
+    for prelude, body, source in rules:
+        if body is None:
+            kept.append(source)
+        elif prelude.startswith("@"):
+            if prelude.lower().startswith(GROUPING_AT_RULES):
+                inner = prune_rules(split_rules(body), tokens, keep_prefixes)
+                if inner:
+                    kept.append(prelude + " {\n" + "\n".join(inner) + "\n}")
+            else:
+                kept.append(source)
+        elif any(selector_used(part, tokens, keep_prefixes) for part in prelude.split(",")):
+            kept.append(source)
+    return kept
+
+
+def collect_vocabulary(rules, vocabulary):
+    for prelude, body, _ in rules:
+        if body is None:
+            continue
+        if prelude.startswith("@"):
+            if prelude.lower().startswith(GROUPING_AT_RULES):
+                collect_vocabulary(split_rules(body), vocabulary)
+            continue
+        for part in prelude.split(","):
+            vocabulary.update(selector_requirements(part))
+
+
+def drop_unused_keyframes(chunks):
+    text = "\n".join(chunks)
+    out = []
+    for chunk in chunks:
+        match = re.match(r"@(?:-\w+-)?keyframes\s+([\w-]+)", chunk)
+        if match and len(re.findall(r"\b" + re.escape(match.group(1)) + r"\b", text)) < 2:
+            continue
+        out.append(chunk)
+    return out
+
+
+class CssPruner:
+    def __init__(self, css, extra_scripts=(), keep_prefixes=("leaflet-",)):
+        self.css = css
+        self.rules = split_rules(COMMENT.sub("", css))
+        self.keep_prefixes = tuple(keep_prefixes)
+        self.vocabulary = set()
+        collect_vocabulary(self.rules, self.vocabulary)
+        self.attributes = attribute_pattern({token[1:] for token in self.vocabulary if token[0] == "["})
+        self.script_tokens = {}
+        self.extra_tokens = set()
+        for script in extra_scripts:
+            self.extra_tokens |= self.scripted(script)
+        self.cache = {}
+        self.pages = 0
+
+    def scripted(self, script):
+        """Vocabulary tokens a script might create at runtime: any word counts."""
+        try:
+            return self.script_tokens[script]
+        except KeyError:
+            pass
+        words = set(WORD.findall(script))
+        tokens = frozenset(token for token in self.vocabulary if token[1:] in words)
+        if len(self.script_tokens) >= SCRIPT_CACHE_SIZE:
+            self.script_tokens.pop(next(iter(self.script_tokens)))
+        self.script_tokens[script] = tokens
+        return tokens
+
+    def tokens(self, html):
+        """The stylesheet tokens html uses; only these decide what survives."""
+        tokens = markup_tokens(html, self.attributes) & self.vocabulary
+        tokens |= self.extra_tokens
+        for script in script_blocks(html):
+            tokens |= self.scripted(script)
+        return frozenset(tokens)
+
+    def prune_for(self, html):
+        self.pages += 1
+        tokens = self.tokens(html)
+        try:
+            return self.cache[tokens]
+        except KeyError:
+            pass
+        pruned = "\n".join(drop_unused_keyframes(prune_rules(self.rules, tokens, self.keep_prefixes)))
+        self.cache[tokens] = pruned
+        return pruned
+
+    def apply(self, html, extra=""):
+        """Replace the full stylesheet in html; extra is markup the page loads later."""
+        if self.css not in html:
+            return html
+        before, after = html.split(self.css, 1)
+        return before + self.prune_for(before + after + extra) + after
+
+    def format_stats(self):
+        return f"CSS pruning: {self.pages} pages, {len(self.cache)} layout variants"
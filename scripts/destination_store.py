@@ -0,0 +1,527 @@
+import contextlib
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+
+
+SCHEMA_VERSION = 1
+STORE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+BUSY_TIMEOUT = 30.0
+SEARCH_LIMIT = 20
+
+# Fields with a column of their own, and the JSON type a value needs to be
+# stored there. Values of any other type, and fields without a column, keep
+# their JSON in the row's "extra" column; "fields" remembers the key order
+# whenever it differs from the column order, so an export reproduces each
+# record exactly as it was imported.
+DESTINATION_COLUMNS = {
+    "title": str,
+    "summary": str,
+    "description": str,
+    "category_page": str,
+    "category_label": str,
+    "length": str,
+    "tag": str,
+    "best_for": str,
+    "image": str,
+    "alt": str,
+    "access_note": str,
+    "groomed": bool,
+}
+MAP_COLUMNS = {"legend": str, "source_label": str, "source_url": str}
+PHOTO_COLUMNS = {"src": str, "alt": str}
+ITINERARY_COLUMNS = {"title": str, "text": str}
+POINT_COLUMNS = {"name": str, "lat": float, "lon": float, "maps_url": str}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS destinations (
+    id INTEGER PRIMARY KEY,
+    slug TEXT NOT NULL UNIQUE,
+    position INTEGER NOT NULL,
+    title TEXT,
+    summary TEXT,
+    description TEXT,
+    category_page TEXT,
+    category_label TEXT,
+    length TEXT,
+    tag TEXT,
+    best_for TEXT,
+    image TEXT,
+    alt TEXT,
+    access_note TEXT,
+    groomed INTEGER,
+    center_lat REAL,
+    center_lon REAL,
+    extra TEXT,
+    fields TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    revision INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS destinations_position ON destinations (position);
+CREATE INDEX IF NOT EXISTS destinations_length ON destinations (length);
+CREATE INDEX IF NOT EXISTS destinations_groomed ON destinations (groomed);
+CREATE INDEX IF NOT EXISTS destinations_category ON destinations (category_page);
+CREATE INDEX IF NOT EXISTS destinations_revision ON destinations (revision);
+CREATE TABLE IF NOT EXISTS modes (
+    destination_id INTEGER NOT NULL REFERENCES destinations (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    mode TEXT NOT NULL,
+    PRIMARY KEY (destination_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS notes (
+    destination_id INTEGER NOT NULL REFERENCES destinations (id) ON DELETE CASCADE,
+    field TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (destination_id, field, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS photos (
+    destination_id INTEGER NOT NULL REFERENCES destinations (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    src TEXT,
+    alt TEXT,
+    extra TEXT,
+    fields TEXT,
+    PRIMARY KEY (destination_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS itinerary (
+    destination_id INTEGER NOT NULL REFERENCES destinations (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    title TEXT,
+    text TEXT,
+    extra TEXT,
+    fields TEXT,
+    PRIMARY KEY (destination_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS maps (
+    destination_id INTEGER PRIMARY KEY REFERENCES destinations (id) ON DELETE CASCADE,
+    legend TEXT,
+    source_label TEXT,
+    source_url TEXT,
+    center_lat REAL,
+    center_lon REAL,
+    extra TEXT,
+    fields TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS map_points (
+    destination_id INTEGER NOT NULL REFERENCES destinations (id) ON DELETE CASCADE,
+    layer TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT,
+    lat REAL,
+    lon REAL,
+    maps_url TEXT,
+    extra TEXT,
+    fields TEXT,
+    PRIMARY KEY (destination_id, layer, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS map_points_layer ON map_points (layer);
+CREATE TABLE IF NOT EXISTS travel_times (
+    destination_id INTEGER NOT NULL REFERENCES destinations (id) ON DELETE CASCADE,
+    mode TEXT NOT NULL,
+    minutes INTEGER,
+    PRIMARY KEY (destination_id, mode)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS travel_times_mode ON travel_times (mode, destination_id);
+CREATE TABLE IF NOT EXISTS removed (
+    slug TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS removed_revision ON removed (revision);
+CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5 (title, summary, body, tokenize = 'unicode61 remove_diacritics 2');
+"""
+
+
+class StoreError(ValueError):
+    pass
+
+
+def is_store(path):
+    return Path(path).suffix.lower() in STORE_SUFFIXES
+
+
+def connect(path, readonly=False):
+    """Open the store at path, creating the schema unless readonly."""
+    if readonly:
+        conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True, timeout=BUSY_TIMEOUT)
+    else:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+    conn.execute("PRAGMA foreign_keys = ON")
+    if not readonly:
+        with conn:
+            conn.executescript(SCHEMA)
+            version = meta(conn, "schema")
+            if version is None:
+                set_meta(conn, "schema", SCHEMA_VERSION)
+            elif int(version) != SCHEMA_VERSION:
+                raise StoreError(f"{path}: store schema {version}, expected {SCHEMA_VERSION}")
+    return conn
+
+
+@contextlib.contextmanager
+def reading(path):
+    """A read-only connection to the store; SQLite errors surface as StoreError."""
+    try:
+        conn = connect(path, readonly=True)
+        try:
+            yield conn
+        finally:
+            conn.close()
+    except sqlite3.Error as exc:
+        raise StoreError(f"{path}: {exc}") from exc
+
+
+def meta(conn, key, default=None):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def set_meta(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+
+def revision(conn):
+    return int(meta(conn, "revision", 0))
+
+
+def record_digest(record):
+    return hashlib.sha1(json.dumps(record, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def is_strings(value):
+    return isinstance(value, list) and value and all(type(item) is str for item in value)
+
+
+def is_rows(value):
+    return isinstance(value, list) and value and all(isinstance(item, dict) for item in value)
+
+
+def is_point(value):
+    return isinstance(value, dict) and list(value) == ["lat", "lon"] and all(type(item) is float for item in value.values())
+
+
+def pack(obj, columns, keys=None):
+    """Column values, extra JSON and key order (None when implied) for obj."""
+    values = {key: value for key, value in obj.items() if key in columns and type(value) is columns[key]}
+    extra = {key: value for key, value in obj.items() if key not in values}
+    keys = list(obj) if keys is None else keys
+    implied = [key for key in columns if key in values] + list(extra)
+    return (
+        [values.get(key) for key in columns]
+        + [json.dumps(extra) if extra else None, None if keys == implied else json.dumps(keys)]
+    )
+
+
+def unpack(row, columns, nested=None):
+    """Rebuild an object from pack() output, with nested values filled in by key."""
+    values = dict(nested or {})
+    for (key, kind), value in zip(columns.items(), row):
+        if value is not None:
+            values[key] = kind(value)
+    extra, fields = row[len(columns)], row[len(columns) + 1]
+    extra = json.loads(extra) if extra else {}
+    values.update(extra)
+    keys = json.loads(fields) if fields else [key for key in columns if key in values] + list(extra)
+    return {key: values[key] for key in keys}
+
+
+def columns_sql(columns):
+    return ", ".join(list(columns) + ["extra", "fields"])
+
+
+def placeholders(count):
+    return ", ".join("?" * count)
+
+
+def search_text(record):
+    parts = [record.get("description"), record.get("best_for")]
+    for key, value in record.items():
+        if is_strings(value) and key != "modes":
+            parts.extend(value)
+    for row in record.get("itinerary") or []:
+        if isinstance(row, dict):
+            parts.extend([row.get("title"), row.get("text")])
+    return "\n".join(part for part in parts if isinstance(part, str))
+
+
+def write_destination(conn, dest_id, record, position, digest, rev, travel):
+    """Insert or replace one destination and all of its child rows."""
+    nested = {}
+    scalars = {}
+    for key, value in record.items():
+        if key == "slug":
+            continue
+        if key == "center" and is_point(value):
+            nested[key] = value
+        elif key in ("modes", "photo_deck", "itinerary") and (is_strings(value) if key == "modes" else is_rows(value)):
+            nested[key] = value
+        elif key == "map" and isinstance(value, dict):
+            nested[key] = value
+        elif key not in DESTINATION_COLUMNS and is_strings(value):
+            nested[key] = value
+        else:
+            scalars[key] = value
+    # The key order is always stored, since nested fields have no column.
+    keys = list(record)
+    center = nested.get("center") or {}
+    row = pack(scalars, DESTINATION_COLUMNS, keys)
+    row[-1] = json.dumps(keys)
+    if dest_id is not None:
+        conn.execute("DELETE FROM destinations WHERE id = ?", (dest_id,))
+        conn.execute("DELETE FROM search WHERE rowid = ?", (dest_id,))
+    cursor = conn.execute(
+        f"INSERT INTO destinations (id, slug, position, {columns_sql(DESTINATION_COLUMNS)}, center_lat, center_lon, hash, revision)"
+        f" VALUES ({placeholders(len(DESTINATION_COLUMNS) + 9)})",
+        [dest_id, record["slug"], position] + row + [center.get("lat"), center.get("lon"), digest, rev],
+    )
+    dest_id = cursor.lastrowid
+
+    conn.executemany(
+        "INSERT INTO modes (destination_id, position, mode) VALUES (?, ?, ?)",
+        [(dest_id, index, mode) for index, mode in enumerate(nested.get("modes") or [])],
+    )
+    conn.executemany(
+        "INSERT INTO notes (destination_id, field, position, text) VALUES (?, ?, ?, ?)",
+        [
+            (dest_id, key, index, text)
+            for key, value in nested.items()
+            if key not in ("modes", "center", "map", "photo_deck", "itinerary")
+            for index, text in enumerate(value)
+        ],
+    )
+    for table, key, columns in (("photos", "photo_deck", PHOTO_COLUMNS), ("itinerary", "itinerary", ITINERARY_COLUMNS)):
+        conn.executemany(
+            f"INSERT INTO {table} (destination_id, position, {columns_sql(columns)}) VALUES ({placeholders(len(columns) + 4)})",
+            [[dest_id, index] + pack(entry, columns) for index, entry in enumerate(nested.get(key) or [])],
+        )
+    if "map" in nested:
+        write_map(conn, dest_id, nested["map"])
+    conn.executemany(
+        "INSERT INTO travel_times (destination_id, mode, minutes) VALUES (?, ?, ?)",
+        [(dest_id, mode, minutes) for mode, minutes in travel.items()],
+    )
+    conn.execute(
+        "INSERT INTO search (rowid, title, summary, body) VALUES (?, ?, ?, ?)",
+        (dest_id, scalars.get("title") or "", scalars.get("summary") or "", search_text(record)),
+    )
+    return dest_id
+
+
+def write_map(conn, dest_id, map_cfg):
+    layers = {key: value for key, value in map_cfg.items() if is_rows(value)}
+    center = map_cfg.get("center")
+    scalars = {key: value for key, value in map_cfg.items() if key not in layers and not (key == "center" and is_point(value))}
+    row = pack(scalars, MAP_COLUMNS, list(map_cfg))
+    row[-1] = json.dumps(list(map_cfg))
+    center = center if is_point(center) else {}
+    conn.execute(
+        f"INSERT INTO maps (destination_id, {columns_sql(MAP_COLUMNS)}, center_lat, center_lon)"
+        f" VALUES ({placeholders(len(MAP_COLUMNS) + 5)})",
+        [dest_id] + row + [center.get("lat"), center.get("lon")],
+    )
+    conn.executemany(
+        f"INSERT INTO map_points (destination_id, layer, position, {columns_sql(POINT_COLUMNS)})"
+        f" VALUES ({placeholders(len(POINT_COLUMNS) + 5)})",
+        [[dest_id, layer, index] + pack(point, POINT_COLUMNS) for layer, points in layers.items() for index, point in enumerate(points)],
+    )
+
+
+def import_records(conn, records, derive=None, merge=False, salt=""):
+    """Write records into the store, skipping those whose content is unchanged.
+
+    derive(record) returns {mode: minutes} for the travel_times table; a full
+    import re-runs it for every record when salt changes. Without merge, destinations
+    missing from records are removed and positions follow records; with
+    merge, the records are added or updated and new ones go last. Changed and
+    removed destinations are stamped with a new revision for changed_since();
+    positions shifted by an insert or removal are renumbered in place, and
+    only an actual reorder marks the moved records as changed.
+    """
+    records = list(records)
+    seen = set()
+    changed = []
+    with conn:
+        # Take the write lock before reading, so concurrent imports serialise.
+        conn.execute("BEGIN IMMEDIATE")
+        existing = {
+            slug: (dest_id, digest, position)
+            for dest_id, slug, digest, position in conn.execute("SELECT id, slug, hash, position FROM destinations")
+        }
+        stale = meta(conn, "salt", "") != salt
+        rev = revision(conn) + 1
+        last = max((position for _, _, position in existing.values()), default=-1)
+        kept = [record.get("slug") for record in records if record.get("slug") in existing]
+        reordered = not merge and kept != sorted(kept, key=lambda slug: existing[slug][2])
+        for index, record in enumerate(records):
+            slug = record.get("slug")
+            if not isinstance(slug, str) or not slug:
+                raise StoreError(f"record {index} has no slug")
+            if slug in seen:
+                raise StoreError(f"duplicate slug {slug!r}")
+            seen.add(slug)
+            old = existing.get(slug)
+            if merge:
+                position = old[2] if old else last + 1
+                last = max(last, position)
+            else:
+                position = index
+            digest = record_digest(record)
+            if old and not stale and old[1] == digest:
+                if old[2] == position:
+                    continue
+                if not reordered:
+                    conn.execute("UPDATE destinations SET position = ? WHERE id = ?", (position, old[0]))
+                    continue
+            travel = derive(record) if derive else {mode: None for mode in record.get("modes") or [] if isinstance(mode, str)}
+            write_destination(conn, old[0] if old else None, record, position, digest, rev, travel)
+            changed.append(slug)
+        removed = [] if merge else sorted(set(existing) - seen)
+        for slug in removed:
+            dest_id = existing[slug][0]
+            conn.execute("DELETE FROM destinations WHERE id = ?", (dest_id,))
+            conn.execute("DELETE FROM search WHERE rowid = ?", (dest_id,))
+        conn.executemany("INSERT OR REPLACE INTO removed (slug, revision) VALUES (?, ?)", [(slug, rev) for slug in removed])
+        conn.executemany("DELETE FROM removed WHERE slug = ?", [(slug,) for slug in changed])
+        if changed or removed:
+            set_meta(conn, "revision", rev)
+        if not merge:
+            set_meta(conn, "salt", salt)
+    return {"changed": changed, "removed": removed, "unchanged": len(seen) - len(changed), "revision": revision(conn)}
+
+
+def load_destination(conn, row):
+    dest_id, slug = row[0], row[1]
+    center_lat, center_lon = row[-2:]
+    nested = {"slug": slug}
+    if center_lat is not None:
+        nested["center"] = {"lat": center_lat, "lon": center_lon}
+    modes = [mode for (mode,) in conn.execute("SELECT mode FROM modes WHERE destination_id = ? ORDER BY position", (dest_id,))]
+    if modes:
+        nested["modes"] = modes
+    for field, text in conn.execute("SELECT field, text FROM notes WHERE destination_id = ? ORDER BY field, position", (dest_id,)):
+        nested.setdefault(field, []).append(text)
+    for table, key, columns in (("photos", "photo_deck", PHOTO_COLUMNS), ("itinerary", "itinerary", ITINERARY_COLUMNS)):
+        entries = [
+            unpack(entry, columns)
+            for entry in conn.execute(f"SELECT {columns_sql(columns)} FROM {table} WHERE destination_id = ? ORDER BY position", (dest_id,))
+        ]
+        if entries:
+            nested[key] = entries
+    map_cfg = load_map(conn, dest_id)
+    if map_cfg is not None:
+        nested["map"] = map_cfg
+    return unpack(row[2:-2], DESTINATION_COLUMNS, nested)
+
+
+def load_map(conn, dest_id):
+    row = conn.execute(
+        f"SELECT {columns_sql(MAP_COLUMNS)}, center_lat, center_lon FROM maps WHERE destination_id = ?", (dest_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    nested = {}
+    if row[-2] is not None:
+        nested["center"] = {"lat": row[-2], "lon": row[-1]}
+    for entry in conn.execute(
+        f"SELECT layer, {columns_sql(POINT_COLUMNS)} FROM map_points WHERE destination_id = ? ORDER BY layer, position", (dest_id,)
+    ):
+        nested.setdefault(entry[0], []).append(unpack(entry[1:], POINT_COLUMNS))
+    return unpack(row[:-2], MAP_COLUMNS, nested)
+
+
+DESTINATION_SELECT = f"SELECT id, slug, {columns_sql(DESTINATION_COLUMNS)}, center_lat, center_lon FROM destinations"
+
+
+def iter_records(conn, slugs=None):
+    """Records in store order, or just those for slugs."""
+    if slugs is None:
+        rows = conn.execute(DESTINATION_SELECT + " ORDER BY position")
+    else:
+        slugs = list(slugs)
+        rows = conn.execute(f"{DESTINATION_SELECT} WHERE slug IN ({placeholders(len(slugs))}) ORDER BY position", slugs)
+    for row in rows.fetchall():
+        yield load_destination(conn, row)
+
+
+def read_records(path, slugs=None):
+    with reading(path) as conn:
+        yield from iter_records(conn, slugs)
+
+
+def export_records(conn):
+    return list(iter_records(conn))
+
+
+def slugs_in_order(conn):
+    return [slug for (slug,) in conn.execute("SELECT slug FROM destinations ORDER BY position")]
+
+
+def record_hashes(conn):
+    return dict(conn.execute("SELECT slug, hash FROM destinations"))
+
+
+def changed_since(conn, since):
+    """(changed slugs, removed slugs, current revision) after revision since."""
+    changed = [slug for (slug,) in conn.execute("SELECT slug FROM destinations WHERE revision > ? ORDER BY position", (since,))]
+    removed = [slug for (slug,) in conn.execute("SELECT slug FROM removed WHERE revision > ? ORDER BY slug", (since,))]
+    return changed, removed, revision(conn)
+
+
+def select_slugs(conn, mode=None, day_trip=None, groomed=None, category_page=None, slugs=None):
+    """Slugs in store order matching every given filter, using the indexes.
+
+    mode matches the derived travel_times rows; day_trip compares the length
+    with "1 day"; groomed and category_page match their columns.
+    """
+    sql = "SELECT d.slug FROM destinations d"
+    where, params = [], []
+    if mode is not None:
+        sql += " JOIN travel_times t ON t.destination_id = d.id AND t.mode = ?"
+        params.append(mode)
+    if groomed is not None:
+        where.append("d.groomed = 1" if groomed else "(d.groomed = 0 OR d.groomed IS NULL)")
+    if day_trip is not None:
+        where.append("d.length = '1 day'" if day_trip else "d.length IS NOT '1 day'")
+    if category_page is not None:
+        where.append("d.category_page = ?")
+        params.append(category_page)
+    if slugs is not None:
+        slugs = list(slugs)
+        where.append(f"d.slug IN ({placeholders(len(slugs))})")
+        params.extend(slugs)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return [slug for (slug,) in conn.execute(sql + " ORDER BY d.position", params)]
+
+
+def fts_query(text):
+    """Every word of text as a quoted FTS5 term, the last one as a prefix."""
+    terms = ['"%s"' % word.replace('"', '""') for word in text.split()]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search(conn, text, limit=SEARCH_LIMIT):
+    """(slug, title, snippet) for destinations matching text, best first."""
+    query = fts_query(text)
+    if not query:
+        return []
+    return conn.execute(
+        "SELECT d.slug, d.title, snippet(search, 2, '[', ']', '...', 12) FROM search"
+        " JOIN destinations d ON d.id = search.rowid WHERE search MATCH ? ORDER BY rank LIMIT ?",
+        (query, limit),
+    ).fetchall()
+
+
+def format_import(report, path):
+    return (
+        f"Store {path}: {len(report['changed'])} written, {report['unchanged']} unchanged,"
+        f" {len(report['removed'])} removed (revision {report['revision']})"
+    )
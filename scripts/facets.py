@@ -0,0 +1,228 @@
+import base64
+import html
+import json
+import re
+import struct
+
+
+FACETS = [
+    ("length", "Length"),
+    ("minutes", "Travel time"),
+    ("best_for", "Best for"),
+    ("country", "Country"),
+    ("indoor", "Indoor options"),
+]
+SORTS = [
+    ("default", "Suggested order"),
+    ("minutes", "Shortest trip first"),
+    ("title", "A to Z"),
+]
+MINUTE_BUCKETS = [
+    (60, "Under 1 hour"),
+    (120, "1 to 2 hours"),
+    (240, "2 to 4 hours"),
+    (None, "4 hours or more"),
+]
+BEST_FOR_GROUPS = [
+    ("Culture and history", ("culture", "history", "historic", "museum", "art", "castle")),
+    ("Outdoors and scenery", ("nature", "scenery", "scenic", "hike", "hiking", "meadow", "outdoor", "valley", "view", "park")),
+    ("Water and beaches", ("beach", "sea", "seaside", "coast", "water", "lake", "lakeside", "river", "riverside", "rhine", "canal")),
+    ("Easy pace", ("easy", "relaxed", "low-stress", "short", "calm", "quiet", "mellow", "gentle")),
+    ("City breaks", ("city", "urban", "transit")),
+]
+
+
+def minutes_bucket(minutes):
+    if minutes is None:
+        return None
+    for limit, label in MINUTE_BUCKETS:
+        if limit is None or minutes < limit:
+            return label
+    return None
+
+
+WORD = re.compile(r"[a-z]+(?:-[a-z]+)*")
+
+
+def best_for_words(text):
+    """Whole words in text, with hyphenated words also split, and plural endings dropped."""
+    words = set()
+    for word in WORD.findall((text or "").lower()):
+        for part in {word, *word.split("-")}:
+            words.add(part)
+            if part.endswith("es"):
+                words.add(part[:-2])
+            if part.endswith("s"):
+                words.add(part[:-1])
+    return words
+
+
+def best_for_groups(text):
+    words = best_for_words(text)
+    return [label for label, group in BEST_FOR_GROUPS if words.intersection(group)]
+
+
+def country_from_title(title):
+    if not title or "," not in title:
+        return None
+    return title.rsplit(",", 1)[-1].strip() or None
+
+
+def facet_values(dest, minutes):
+    bucket = minutes_bucket(minutes)
+    country = country_from_title(dest.get("title", ""))
+    return {
+        "length": [dest["length"]] if dest.get("length") else [],
+        "minutes": [bucket] if bucket else [],
+        "best_for": best_for_groups(dest.get("best_for", "")),
+        "country": [country] if country else [],
+        "indoor": ["Has indoor options" if dest.get("indoor_attractions") else "Outdoor focus"],
+    }
+
+
+def encode_bitset(indices, size):
+    words = [0] * ((size + 31) // 32)
+    for idx in indices:
+        words[idx >> 5] |= 1 << (idx & 31)
+    return base64.b64encode(struct.pack(f"<{len(words)}I", *words)).decode("ascii")
+
+
+def value_order(facet, values):
+    if facet == "minutes":
+        labels = [label for _, label in MINUTE_BUCKETS]
+        return [label for label in labels if label in values]
+    return sorted(values)
+
+
+def build_facet_table(rows):
+    size = len(rows)
+    members = {facet: {} for facet, _ in FACETS}
+    for idx, row in enumerate(rows):
+        for facet, values in row["values"].items():
+            for value in values:
+                members[facet].setdefault(value, []).append(idx)
+
+    facets = {}
+    counts = {}
+    for facet, _ in FACETS:
+        values = members[facet]
+        if len(values) < 2:
+            continue
+        ordered = value_order(facet, values)
+        facets[facet] = {value: encode_bitset(values[value], size) for value in ordered}
+        counts[facet] = [(value, len(values[value])) for value in ordered]
+
+    no_minutes = 10 ** 9
+    orders = {
+        "minutes": sorted(range(size), key=lambda i: (rows[i]["minutes"] if rows[i]["minutes"] is not None else no_minutes, i)),
+        "title": sorted(range(size), key=lambda i: (rows[i]["title"].lower(), i)),
+    }
+    return {"size": size, "facets": facets, "orders": orders}, counts
+
+
+def card_data_attrs(idx, row):
+    minutes = "" if row["minutes"] is None else str(row["minutes"])
+    country = (row["values"].get("country") or [""])[0]
+    length = (row["values"].get("length") or [""])[0]
+    indoor = "1" if row["values"].get("indoor") == ["Has indoor options"] else "0"
+    return (
+        f' data-card="{idx}" data-minutes="{minutes}" data-country="{html.escape(country, quote=True)}"'
+        f' data-length="{html.escape(length, quote=True)}" data-indoor="{indoor}"'
+    )
+
+
+def facet_controls_html(table, counts):
+    if table["size"] < 2:
+        return ""
+    labels = dict(FACETS)
+    selects = []
+    for facet, values in counts.items():
+        options = "".join(
+            f'<option value="{html.escape(value, quote=True)}">{html.escape(value)} ({count})</option>' for value, count in values
+        )
+        selects.append(
+            f'<label class="facet"><span>{labels[facet]}</span>'
+            f'<select data-facet="{facet}"><option value="">Any</option>{options}</select></label>'
+        )
+    sort_options = "".join(f'<option value="{key}">{label}</option>' for key, label in SORTS)
+    selects.append(f'<label class="facet"><span>Sort</span><select data-facet-sort>{sort_options}</select></label>')
+    data = json.dumps(table, ensure_ascii=True, separators=(",", ":")).replace("</", "<\\/")
+    return f"""
+      <section class="facets" aria-label="Filter destinations">
+        {"".join(selects)}
+        <span class="facet-count" aria-live="polite">{table["size"]} destinations</span>
+      </section>
+      <script type="application/json" id="facet-table">{data}</script>"""
+
+
+def facet_script():
+    return """
+  <script>
+    (function(){
+      var dataEl = document.getElementById("facet-table");
+      var grid = document.querySelector("[data-facet-grid]");
+      if (!dataEl || !grid) return;
+      var table = JSON.parse(dataEl.textContent);
+      var words = Math.ceil(table.size / 32);
+      var selects = document.querySelectorAll("[data-facet]");
+      var sortSel = document.querySelector("[data-facet-sort]");
+      var count = document.querySelector(".facet-count");
+      var decoded = {};
+      var full = new Uint32Array(words);
+      for (var w = 0; w < words; w++){
+        var rem = table.size - w * 32;
+        full[w] = rem >= 32 ? 0xffffffff : ((1 << rem) - 1) >>> 0;
+      }
+
+      function bitset(facet, value){
+        var key = facet + "\\u0000" + value;
+        if (!decoded[key]){
+          var raw = atob(table.facets[facet][value]);
+          var bytes = new Uint8Array(words * 4);
+          for (var i = 0; i < raw.length; i++) bytes[i] = raw.charCodeAt(i);
+          decoded[key] = new Uint32Array(bytes.buffer);
+        }
+        return decoded[key];
+      }
+
+      function cardsByIndex(){
+        var out = [];
+        var nodes = grid.querySelectorAll("[data-card]");
+        for (var i = 0; i < nodes.length; i++){
+          out[+nodes[i].getAttribute("data-card")] = nodes[i];
+        }
+        return out;
+      }
+
+      function apply(){
+        var mask = full.slice();
+        for (var s = 0; s < selects.length; s++){
+          var value = selects[s].value;
+          if (!value) continue;
+          var bits = bitset(selects[s].getAttribute("data-facet"), value);
+          for (var w = 0; w < words; w++) mask[w] &= bits[w];
+        }
+        var order = table.orders[sortSel ? sortSel.value : "default"];
+        var cards = cardsByIndex();
+        var shown = 0;
+        for (var pos = 0; pos < table.size; pos++){
+          var idx = order ? order[pos] : pos;
+          var on = (mask[idx >> 5] >>> (idx & 31)) & 1;
+          shown += on;
+          var card = cards[idx];
+          if (!card) continue;
+          card.hidden = !on;
+          card.style.order = pos;
+        }
+        if (count) count.textContent = shown + (shown === 1 ? " destination" : " destinations");
+      }
+
+      function update(){
+        if (window.kmcGrid) window.kmcGrid.loadAll().then(apply); else apply();
+      }
+
+      for (var s = 0; s < selects.length; s++) selects[s].addEventListener("change", update);
+      if (sortSel) sortSel.addEventListener("change", update);
+    })();
+  </script>
+    """
@@ -0,0 +1,74 @@
+import pickle
+
+
+FORMAT_VERSION = 1
+DEFAULT_MAX_ENTRIES = 50000
+
+
+class FragmentCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, salt=""):
+        self.max_entries = max_entries
+        self.salt = salt
+        self.entries = {}
+        self.hits = {}
+        self.misses = {}
+
+    def get(self, kind, inputs, render):
+        key = (kind, inputs)
+        try:
+            # Move hits to the end, so eviction from the front drops the least recently used.
+            value = self.entries[key] = self.entries.pop(key)
+        except KeyError:
+            pass
+        else:
+            self.hits[kind] = self.hits.get(kind, 0) + 1
+            return value
+        self.misses[kind] = self.misses.get(kind, 0) + 1
+        value = render()
+        if self.max_entries:
+            if len(self.entries) >= self.max_entries:
+                self.entries.pop(next(iter(self.entries)))
+            self.entries[key] = value
+        return value
+
+    def put(self, kind, inputs, value):
+        if self.max_entries:
+            key = (kind, inputs)
+            if key not in self.entries and len(self.entries) >= self.max_entries:
+                self.entries.pop(next(iter(self.entries)))
+            self.entries[key] = value
+
+    def reset_stats(self):
+        self.hits = {}
+        self.misses = {}
+
+    def stats(self):
+        kinds = sorted(set(self.hits) | set(self.misses))
+        return {kind: {"hits": self.hits.get(kind, 0), "misses": self.misses.get(kind, 0)} for kind in kinds}
+
+    def format_stats(self):
+        parts = []
+        for kind, counts in self.stats().items():
+            total = counts["hits"] + counts["misses"]
+            parts.append(f"{kind} {counts['hits']}/{total} ({counts['hits'] / total:.0%})")
+        return "Fragment cache hits: " + (", ".join(parts) if parts else "none")
+
+    def save(self, path):
+        import shared_cache
+
+        with shared_cache.atomic_file(path) as handle:
+            pickle.dump({"version": FORMAT_VERSION, "salt": self.salt, "entries": self.entries}, handle, pickle.HIGHEST_PROTOCOL)
+
+    def load(self, path):
+        try:
+            with open(path, "rb") as handle:
+                stored = pickle.load(handle)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+            return 0
+        if not isinstance(stored, dict) or stored.get("version") != FORMAT_VERSION or stored.get("salt") != self.salt:
+            return 0
+        for key, value in stored["entries"].items():
+            if len(self.entries) >= self.max_entries:
+                break
+            self.entries.setdefault(key, value)
+        return len(stored["entries"])
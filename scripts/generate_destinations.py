@@ -1,37 +1,102 @@
+import hashlib
 import json
 import os
 import re
+import sys
+import time
 import urllib.parse
-import urllib.request
+from html import escape, unescape
 from urllib.parse import urlparse
 from pathlib import Path
+
+import build_cache
+import facets
+import fragment_cache
+import json_stream
+import search_index
 
 
 ROOT = Path(__file__).resolve().parents[1]
 DATA_PATH = ROOT / "data" / "destinations.json"
+STORE_PATH = ROOT / "data" / "destinations.sqlite"
+PHOTO_OVERLAY_PATH = ROOT / "data" / "photo-overlay.json"
+MAP_OVERLAY_PATH = ROOT / "data" / "map-overlay.json"
 TEMPLATE_PATH = ROOT / "templates" / "destination.html"
 INDEX_PATH = ROOT / "index.html"
-GOOGLE_MAPS_API_KEY = os.environ.get("GOOGLE_MAPS_API_KEY", "").strip()
+CACHE_DIR = ROOT / ".cache"
+IMAGE_CHECK_CACHE = CACHE_DIR / "image-check.json"
 PHOTO_SEARCH_LIMIT = 6
+PHOTO_FIELDS = ("photo_deck", "image", "alt")
+PHOTO_PHASE_BUDGET = 60.0
+COMMONS_API = "https://commons.wikimedia.org/w/api.php"
+HTTP_CLIENT = None
+FRAGMENTS = fragment_cache.FragmentCache()
+FRAGMENT_CACHE_PATH = CACHE_DIR / "fragments.pickle"
+BUILD_CACHE_PATH = CACHE_DIR / "build.pickle"
+# The build cache is salted with these modules, which shape its records and index rows.
+SALT_MODULES = ("generate_destinations.py", "related.py", "trip_planner.py")
+WEIGHT_REPORT_PATH = CACHE_DIR / "page-weight.json"
+PLACEHOLDER_CACHE_PATH = CACHE_DIR / "placeholders.json"
+IMAGE_CACHE_DIR = CACHE_DIR / "images"
+DISTANCE_CACHE_PATH = CACHE_DIR / "distances.pickle"
+RELATED_CACHE_PATH = CACHE_DIR / "related-terms.pickle"
+SHARED_CACHE_DIR = CACHE_DIR / "shared"
+SHARED_CACHE_ENV = "KMC_SHARED_CACHE"
+COMMONS_PHOTO_NAMESPACE = "commons-photos"
+DAILY_DRIVE_MINUTES = 300
+RELATED_LIMIT = 4
+ORIGIN_SLOT = re.compile(r"\{\{origin\.(\w+)\}\}")
+MIN_ESTIMATED_DRIVE_MINUTES = 10
+LIST_PAGE_SIZE = 48
+LIST_CHUNK_SIZE = 24
 
 
-def load_base_css():
-    if not INDEX_PATH.exists():
-        return ""
-    html = INDEX_PATH.read_text(encoding="utf-8")
+def source_fingerprint():
+    """Digest of the modules whose code shapes the build cache's records and index rows."""
+    digest = hashlib.sha1()
+    for name in SALT_MODULES:
+        digest.update(Path(__file__).with_name(name).read_bytes())
+    return digest.hexdigest()
+
+
+def shared_cache_dir():
+    return Path(os.environ.get(SHARED_CACHE_ENV) or SHARED_CACHE_DIR)
+
+
+def google_maps_api_key():
+    return os.environ.get("GOOGLE_MAPS_API_KEY", "").strip()
+
+
+def default_http_client():
+    global HTTP_CLIENT
+    if HTTP_CLIENT is None:
+        import http_client
+
+        HTTP_CLIENT = http_client.HttpClient()
+    return HTTP_CLIENT
+
+
+def base_css_from_html(html):
     match = re.search(r"<style>(.*)</style>", html, re.S)
-    return match.group(1).strip() if match else ""
+    return match.group(1).strip() if match else ""
+
+
+def load_base_css(index_path=None):
+    index_path = index_path or INDEX_PATH
+    if not index_path.exists():
+        return ""
+    return base_css_from_html(index_path.read_text(encoding="utf-8"))
 
 
-def normalize_wikimedia_url(src, width=None):
+def wikimedia_filename(src):
     if not src:
-        return src
+        return None
     try:
         parsed = urlparse(src)
     except ValueError:
-        return src
+        return None
     if "wikimedia.org" not in parsed.netloc:
-        return src
+        return None
     path = parsed.path
     filename = None
     if "/wikipedia/commons/thumb/" in path:
@@ -40,7 +105,7 @@ def normalize_wikimedia_url(src, width=None):
             idx = parts.index("thumb")
             filename = parts[idx + 3]
         except (ValueError, IndexError):
-            return src
+            return None
     elif "/wikipedia/commons/" in path:
         parts = path.split("/")
         try:
@@ -48,6 +113,15 @@ def normalize_wikimedia_url(src, width=None):
             filename = parts[idx + 3]
         except (ValueError, IndexError):
             filename = parts[-1] if parts else None
+    return filename or None
+
+
+def normalize_wikimedia_url(src, width=None):
+    return FRAGMENTS.get("image_url", (src, width), lambda: commons_file_url(src, width))
+
+
+def commons_file_url(src, width=None):
+    filename = wikimedia_filename(src)
     if not filename:
         return src
     file_path = f"https://commons.wikimedia.org/wiki/Special:FilePath/{filename}"
@@ -56,7 +130,8 @@ def normalize_wikimedia_url(src, width=None):
     return file_path
 
 
-def commons_search(query, limit=8):
+def commons_search(query, limit=8, client=None):
+    """Image URLs Commons returns for query, or None when the request failed."""
     if not query:
         return []
     params = {
@@ -69,13 +144,11 @@ def commons_search(query, limit=8):
         "prop": "imageinfo",
         "iiprop": "url",
     }
-    url = "https://commons.wikimedia.org/w/api.php?" + urllib.parse.urlencode(params)
-    req = urllib.request.Request(url, headers={"User-Agent": "KMC-Exploration/1.0"})
+    url = COMMONS_API + "?" + urllib.parse.urlencode(params)
     try:
-        with urllib.request.urlopen(req, timeout=20) as resp:
-            data = json.load(resp)
+        data = (client or default_http_client()).get_json(url)
     except Exception:
-        return []
+        return None
     pages = data.get("query", {}).get("pages", {})
     results = []
     for page in pages.values():
@@ -90,7 +163,8 @@ def commons_search(query, limit=8):
     return results
 
 
-def fetch_commons_photos(title, count=PHOTO_SEARCH_LIMIT):
+def fetch_commons_photos(title, count=PHOTO_SEARCH_LIMIT, client=None):
+    """Up to count photos for title, or None if a search failed before enough were found."""
     if not title:
         return []
     queries = [
@@ -103,25 +177,46 @@ def fetch_commons_photos(title, count=PHOTO_SEARCH_LIMIT):
     ]
     photos = []
     seen = set()
+    failed = False
     for q in queries:
-        for url in commons_search(q, limit=8):
+        found = commons_search(q, limit=8, client=client)
+        if found is None:
+            failed = True
+            continue
+        for url in found:
             if url in seen:
                 continue
             seen.add(url)
             photos.append(url)
             if len(photos) >= count:
                 return photos
-    return photos
+    return None if failed else photos
 
 
-def apply_auto_photos(dest):
+def apply_auto_photos(dest, cache=None, client=None, misses=None):
+    """Fill an empty photo deck from Commons.
+
+    Only photos that were found go into cache, which may be shared across
+    builds. Titles whose searches all ran and found nothing go into misses,
+    kept for this process only, and failed lookups are not remembered at all,
+    so a later online build searches again.
+    """
     existing = dest.get("photo_deck") or []
     if existing:
-        return
+        return False
     title = dest.get("title", "").strip()
-    photos = fetch_commons_photos(title, count=PHOTO_SEARCH_LIMIT)
+    if cache is not None and title in cache:
+        photos = cache[title]
+    elif misses is not None and title in misses:
+        photos = []
+    else:
+        photos = fetch_commons_photos(title, count=PHOTO_SEARCH_LIMIT, client=client)
+        if photos and cache is not None:
+            cache[title] = photos
+        elif photos is not None and misses is not None:
+            misses.add(title)
     if not photos:
-        return
+        return False
     alt_base = title if title else "Destination"
     alt_suffixes = ["view", "landmark", "scene", "waterfront", "streetscape", "skyline"]
     deck = []
@@ -131,6 +226,116 @@ def apply_auto_photos(dest):
     dest["photo_deck"] = deck
     dest["image"] = photos[0]
     dest["alt"] = f"{alt_base} view"
+    return True
+
+
+def photo_fields(dest):
+    return {key: dest[key] for key in PHOTO_FIELDS if key in dest}
+
+
+def load_photo_overlay(path=None):
+    path = path or PHOTO_OVERLAY_PATH
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+def write_json_atomic(path, value, newline="\n", sort_keys=False):
+    import shared_cache
+
+    text = json.dumps(value, indent=2, ensure_ascii=True, sort_keys=sort_keys) + "\n"
+    shared_cache.write_atomic(path, text.replace("\n", newline).encode("utf-8"))
+
+
+def array_spans(text):
+    """(start, end) offsets of each element of the top-level JSON array in text."""
+    decoder = json.JSONDecoder()
+    separators = re.compile(r"[\s,]*")
+    spans = []
+    index = text.index("[") + 1
+    while True:
+        index = separators.match(text, index).end()
+        if text[index] == "]":
+            return spans
+        end = decoder.raw_decode(text, index)[1]
+        spans.append((index, end))
+        index = end
+
+
+def replace_records(text, updates):
+    """text with the array elements at the indexes in updates re-serialised in place.
+
+    Everything else, line endings included, is kept byte for byte; each new
+    element takes the layout, indentation and line ending of the one it
+    replaces.
+    """
+    parts = []
+    last = 0
+    for position, (start, end) in enumerate(array_spans(text)):
+        if position not in updates:
+            continue
+        original = text[start:end]
+        if "\n" not in original:
+            body = json.dumps(updates[position], ensure_ascii=True)
+        else:
+            newline = "\r\n" if "\r\n" in original else "\n"
+            indent = text[text.rfind("\n", 0, start) + 1 : start]
+            indent = indent if not indent.strip() else ""
+            body = json.dumps(updates[position], indent=2, ensure_ascii=True).replace("\n", newline + indent)
+        parts += [text[last:start], body]
+        last = end
+    parts.append(text[last:])
+    return "".join(parts)
+
+
+def dominant_newline(path):
+    raw = path.read_bytes()
+    crlf = raw.count(b"\r\n")
+    return "\r\n" if crlf * 2 > raw.count(b"\n") else "\n"
+
+
+def load_map_overlay(path=None):
+    try:
+        return json.loads((path or MAP_OVERLAY_PATH).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+def save_discovered_photos(discovered, target, data_path=DATA_PATH, overlay_path=None):
+    if not discovered:
+        return 0
+    if target == "overlay":
+        overlay_path = overlay_path or PHOTO_OVERLAY_PATH
+        overlay = load_photo_overlay(overlay_path)
+        overlay.update(discovered)
+        write_json_atomic(overlay_path, overlay, sort_keys=True)
+        return len(discovered)
+    import destination_store
+
+    if destination_store.is_store(data_path):
+        conn = destination_store.connect(data_path)
+        try:
+            records = list(destination_store.iter_records(conn, discovered))
+            for record in records:
+                record.update(discovered[record["slug"]])
+                record["auto_photos"] = True
+            destination_store.import_records(conn, records, store_travel, merge=True, salt=source_fingerprint())
+        finally:
+            conn.close()
+        return len(records)
+    import shared_cache
+
+    text = data_path.read_bytes().decode("utf-8")
+    updates = {}
+    for position, record in enumerate(json.loads(text)):
+        fields = discovered.get(record.get("slug"))
+        if fields:
+            record.update(fields)
+            record["auto_photos"] = True
+            updates[position] = record
+    shared_cache.write_atomic(data_path, replace_records(text, updates).encode("utf-8"))
+    return len(discovered)
 
 
 EXTRA_CSS = """
@@ -174,6 +379,21 @@ EXTRA_CSS = """
     .notes-actions{ display:flex; flex-wrap:wrap; align-items:center; gap:10px; }
     .notes-actions button{ border:1px solid var(--line); border-radius:10px; padding:8px 12px; background:#fff; font-size:13px; cursor:pointer; }
     .notes-status{ color:var(--muted); font-size:12px; }
+    .related{ display:flex; gap:12px; overflow-x:auto; margin:0; padding:0 0 6px; list-style:none; }
+    .related li{ flex:0 0 220px; }
+    .related a{ display:grid; gap:4px; height:100%; box-sizing:border-box; background:rgba(255,255,255,.76); border:1px solid var(--line); border-radius:14px; padding:12px 14px; }
+    .related span{ color:var(--muted); font-size:13px; }
+    .facets{ display:flex; flex-wrap:wrap; align-items:flex-end; gap:10px 14px; margin:16px 0 4px; }
+    .facet{ display:grid; gap:4px; font-size:11px; color:var(--muted); text-transform:uppercase; letter-spacing:.4px; }
+    .facet select{ border:1px solid var(--line); border-radius:10px; padding:7px 10px; background:#fff; font:inherit; font-size:13px; text-transform:none; letter-spacing:0; color:var(--ink); }
+    .facet-count{ margin-left:auto; font-size:12px; color:var(--muted); }
+    .card[hidden]{ display:none; }
+    .grid-chunk{ margin-top:18px; }
+    .grid-more{ height:1px; }
+    .pager{ display:flex; flex-wrap:wrap; gap:8px; margin-top:22px; }
+    .pager[hidden]{ display:none; }
+    .pager a{ min-width:36px; padding:8px 12px; border:1px solid var(--line); border-radius:10px; background:#fff; text-align:center; font-size:13px; font-weight:600; }
+    .pager a.active{ background:var(--sea-dark); border-color:var(--sea-dark); color:#fff; }
     @media (max-width: 900px){ .hero img{ height:260px; } }
     @media (max-width: 600px){ .hero img{ height:220px; } }
     @media (max-width: 900px){ .slide img{ height:300px; } }
@@ -181,8 +401,17 @@ EXTRA_CSS = """
 """.strip()
 
 
+def origin_slot(name):
+    """A marker that fill_origin replaces per origin, so shared markup renders once."""
+    return "{{origin.%s}}" % name
+
+
+def fill_origin(html, parts):
+    return ORIGIN_SLOT.sub(lambda match: parts[match.group(1)], html)
+
+
 NAV_ITEMS = [
-    ("../index.html", "Home"),
+    (origin_slot("root") + "../index.html", "Home"),
     ("../day-trips-car.html", "Day Trips by Car"),
     ("../day-trips-train.html", "Day Trips by Train"),
     ("../trips-plane.html", "Trips by Plane"),
@@ -193,7 +422,7 @@ NAV_ITEMS = [
 ]
 
 LIST_NAV_ITEMS = [
-    ("index.html", "Home"),
+    (origin_slot("root") + "index.html", "Home"),
     ("day-trips-car.html", "Day Trips by Car"),
     ("day-trips-train.html", "Day Trips by Train"),
     ("trips-plane.html", "Trips by Plane"),
@@ -209,24 +438,40 @@ NAV_ACTIVE_ALIAS = {
 }
 
 
-def make_nav(active_href):
-    active_href = NAV_ACTIVE_ALIAS.get(active_href, active_href)
-    out = []
-    for href, label in NAV_ITEMS:
-        cls = "active" if href == active_href else ""
-        out.append(f'        <a href="{href}" class="{cls}">{label}</a>')
-    return "\n".join(out)
+def nav_links(items, active_href):
+    active_href = NAV_ACTIVE_ALIAS.get(active_href, active_href)
+    out = []
+    for href, label in items:
+        cls = "active" if href == active_href else ""
+        out.append(f'        <a href="{href}" class="{cls}">{label}</a>')
+    return "\n".join(out)
+
 
+def make_nav(active_href):
+    return FRAGMENTS.get("nav", active_href, lambda: nav_links(NAV_ITEMS, active_href))
 
-def make_list_nav(active_href):
-    active_href = NAV_ACTIVE_ALIAS.get(active_href, active_href)
-    out = []
-    for href, label in LIST_NAV_ITEMS:
-        cls = "active" if href == active_href else ""
-        out.append(f'        <a href="{href}" class="{cls}">{label}</a>')
-    return "\n".join(out)
 
+def make_list_nav(active_href):
+    return FRAGMENTS.get("list_nav", active_href, lambda: nav_links(LIST_NAV_ITEMS, active_href))
 
+
+def search_box_html(base):
+    return (
+        f'      <form class="search" role="search" data-search data-search-base="{base}">\n'
+        '        <input type="search" placeholder="Search destinations" aria-label="Search destinations" autocomplete="off" />\n'
+        '        <div class="search-results" hidden></div>\n'
+        '      </form>\n'
+        f'      <script src="{base}search/{search_index.SCRIPT_NAME}" defer></script>'
+    )
+
+
+MODE_TAG_LABELS = {
+    "car": ("Drive", "Car"),
+    "train": ("Train",),
+    "plane": ("Fly", "Plane"),
+}
+
+
 def list_items(items):
     return "".join(f"<li>{i}</li>" for i in items)
 
@@ -303,17 +548,47 @@ def filter_tag_for_modes(tag, modes):
     return " / ".join(kept)
 
 
+def travel_minutes(dest, mode=None):
+    tag = dest.get("tag") or ""
+    return FRAGMENTS.get("travel_minutes", (tag, mode), lambda: tag_travel_minutes(tag, mode))
+
+
+def travel_modes(dest):
+    return [(mode, travel_minutes(dest, mode)) for mode in (None, *MODE_TAG_LABELS)]
+
+
+def restore_travel_modes(dest, modes):
+    tag = dest.get("tag") or ""
+    for mode, minutes in modes or ():
+        FRAGMENTS.put("travel_minutes", (tag, mode), minutes)
+
+
+def tag_travel_minutes(tag, mode=None):
+    found = []
+    for key in [mode] if mode else list(MODE_TAG_LABELS):
+        for label in MODE_TAG_LABELS.get(key, ()):
+            minutes = extract_mode_minutes(tag, label)
+            if minutes is not None:
+                found.append(minutes)
+                break
+    return min(found) if found else None
+
+
 def format_travel_tag(tag, modes=None):
+    return FRAGMENTS.get("travel_tag", (tag, tuple(modes or ())), lambda: travel_tag_text(tag, modes))
+
+
+def travel_tag_text(tag, modes=None):
     if not tag:
         return tag
     lower = tag.lower()
-    if "landstuhl" in lower or "frankfurt" in lower:
+    if "landstuhl" in lower or "frankfurt" in lower or "(from " in lower:
         return tag
     mode_list = [m.lower() for m in (modes or [])]
     if "plane" in mode_list or "fly" in lower:
         return f"{tag} (from Frankfurt)"
     if "train" in mode_list or "car" in mode_list or any(word in lower for word in ("train", "drive", "car")):
-        return f"{tag} (from Landstuhl)"
+        return f"{tag} (from {origin_slot('origin')})"
     return tag
 
 
@@ -339,21 +614,74 @@ def itinerary_html(dest):
     return "".join(f'<div class="day"><h3>{title}</h3><p>{text}</p></div>' for title, text in blocks)
 
 
+def format_minutes(minutes):
+    hours, minutes = divmod(int(minutes), 60)
+    return f"{hours}h {minutes}m" if hours else f"{minutes}m"
+
+
+def combine_html(dest, origin):
+    trips = (dest.get("combine") or {}).get(origin.slug)
+    if not trips:
+        return ""
+    items = []
+    for trip in trips:
+        others = [stop for stop in trip["route"] if stop["slug"] != dest["slug"]]
+        links = " + ".join(f'<a href="{stop["slug"]}.html">{stop["title"].split(",")[0]}</a>' for stop in others)
+        path = " &rarr; ".join([origin.name] + [stop["title"].split(",")[0] for stop in trip["route"]] + [origin.name])
+        items.append(f"{links}<br />{path}, about {format_minutes(trip['minutes'])} of driving")
+    return f"""
+      <section class="section">
+        <h2>Combine with</h2>
+        <p class="lede">Nearby stops that fit into the same day from {origin.name}.</p>
+        <ul class="list">{list_items(items)}</ul>
+      </section>
+    """
+
+
+def related_html(dest):
+    related = dest.get("related") or []
+    if not related:
+        return ""
+    items = "".join(
+        f'<li><a href="{other["slug"]}.html"><strong>{other["title"].split(",")[0]}</strong><span>{other["summary"]}</span></a></li>'
+        for other in related
+    )
+    return f"""
+      <section class="section">
+        <h2>You might also like</h2>
+        <ul class="related">{items}</ul>
+      </section>
+    """
+
+
+def placeholder_attrs(entry):
+    """Intrinsic size and a blurred background that shows until the image loads."""
+    if not entry:
+        return ""
+    return (
+        f' width="{entry["width"]}" height="{entry["height"]}"'
+        f' style="background:{entry["color"]} url({entry["uri"]}) center/cover no-repeat"'
+    )
+
+
 def slideshow_html(dest):
     photos = dest.get("photo_deck") or []
     if not photos:
         return ""
     items = []
     for idx, photo in enumerate(photos):
-        cls = "slide active" if idx == 0 else "slide"
         src = normalize_wikimedia_url(photo.get("src"), width=1600)
-        items.append(
-            f'<div class="{cls}"><img src="{src}" alt="{photo.get("alt", "")}" loading="lazy" decoding="async" /></div>'
-        )
+        alt = photo.get("alt", "")
+        size = placeholder_attrs(photo.get("placeholder"))
+        if idx == 0:
+            items.append(f'<div class="slide active"><img src="{src}" alt="{alt}"{size} fetchpriority="high" decoding="async" /></div>')
+        else:
+            # Hidden slides stay unresolved until slideshow_script needs them.
+            items.append(f'<div class="slide"><img data-src="{src}" alt="{alt}"{size} decoding="async" /></div>')
     return f'<div class="slideshow" data-slideshow="1">{"".join(items)}</div>'
 
 
-def map_section(map_cfg, dest_title):
+def map_section(map_cfg, dest_title, maps_key=""):
     if not map_cfg:
         return "", ""
 
@@ -760,7 +1088,7 @@ __GOOGLE_SCRIPT__
     js = js.replace("__CENTER_LAT__", json.dumps(center["lat"], ensure_ascii=True))
     js = js.replace("__CENTER_LON__", json.dumps(center["lon"], ensure_ascii=True))
     js = js.replace("__DEST_TITLE__", json.dumps(dest_title or "", ensure_ascii=True))
-    js = js.replace("__HAS_GOOGLE__", "true" if GOOGLE_MAPS_API_KEY else "false")
+    js = js.replace("__HAS_GOOGLE__", "true" if maps_key else "false")
     js = js.replace("__POI__", js_array(map_cfg.get("poi") or []))
     js = js.replace("__PARKING__", js_array(map_cfg.get("parking") or []))
     js = js.replace("__RESTAURANTS__", js_array(map_cfg.get("restaurants") or []))
@@ -768,9 +1096,9 @@ __GOOGLE_SCRIPT__
     js = js.replace("__INDOOR__", js_array(map_cfg.get("indoor") or []))
     js = js.replace("__PLAYGROUNDS__", js_array(map_cfg.get("playgrounds") or []))
     google_script = ""
-    if GOOGLE_MAPS_API_KEY:
+    if maps_key:
         google_script = (
-            f'\n  <script src="https://maps.googleapis.com/maps/api/js?key={GOOGLE_MAPS_API_KEY}'
+            f'\n  <script src="https://maps.googleapis.com/maps/api/js?key={maps_key}'
             '&libraries=places&callback=initDestMap" async defer onerror="initDestMapFallback()"></script>\n'
         )
     js = js.replace("__GOOGLE_SCRIPT__", google_script)
@@ -788,11 +1116,29 @@ def slideshow_script():
           var slides = wrapper.querySelectorAll(".slide");
           if (!slides.length) return;
           var index = 0;
+          function load(slide){
+            var img = slide.querySelector("img[data-src]");
+            if (!img) return;
+            img.src = img.getAttribute("data-src");
+            img.removeAttribute("data-src");
+          }
+          function canPrefetch(){
+            var conn = navigator.connection;
+            return !(conn && (conn.saveData || /2g/.test(conn.effectiveType || "")));
+          }
+          function prefetchNext(){
+            if (slides.length < 2 || !canPrefetch()) return;
+            var next = slides[(index + 1) % slides.length];
+            var idle = window.requestIdleCallback || function(fn){ return setTimeout(fn, 2000); };
+            idle(function(){ load(next); });
+          }
           function setSlide(next){
             index = (next + slides.length) % slides.length;
+            load(slides[index]);
             for (var j = 0; j < slides.length; j++){
               slides[j].classList.toggle("active", j === index);
             }
+            prefetchNext();
           }
           setSlide(0);
           setInterval(function(){ setSlide(index + 1); }, 10000);
@@ -869,7 +1215,12 @@ def notes_script():
     """
 
 
-def build_page(dest, template, styles):
+def build_page(dest, template, styles, maps_key=None, origin=None):
+    return fill_origin(shared_page(dest, template, styles, maps_key), (origin or HOME_ORIGIN).page_parts(dest))
+
+
+def shared_page(dest, template, styles, maps_key=None):
+    """The destination page with origin-specific parts left as origin slots."""
     nav = make_nav("../" + dest["category_page"])
     groomed = bool(dest.get("groomed", False))
     notice = ""
@@ -900,15 +1251,15 @@ def build_page(dest, template, styles):
     recommended_stops = dest.get("recommended_stops") or []
     lodging = dest.get("lodging") or []
     access_note = dest.get("access_note", "").strip()
-    tag_label = format_travel_tag(dest.get("tag", ""), dest.get("modes", []))
-    tag_lower = tag_label.lower()
-    travel_label = "Travel time" if tag_label else "Travel style"
+    tag_label = origin_slot("travel_tag")
+    travel_label = origin_slot("travel_label")
 
     slideshow = slideshow_html(dest)
     hero_image = ""
     if not slideshow:
         hero_src = normalize_wikimedia_url(dest.get("image"), width=1200)
-        hero_image = f'<img src="{hero_src}" alt="{dest["alt"]}" loading="lazy" decoding="async" />'
+        hero_size = placeholder_attrs(dest.get("placeholder"))
+        hero_image = f'<img src="{hero_src}" alt="{dest["alt"]}"{hero_size} loading="lazy" decoding="async" />'
 
     body = f"""
       <div class="breadcrumb"><a href="../{dest['category_page']}">Back to {dest['category_label']}</a></div>
@@ -936,7 +1287,9 @@ def build_page(dest, template, styles):
       </section>
     """
 
-    map_html, map_scripts = map_section(dest.get("map"), dest.get("title", ""))
+    if maps_key is None:
+        maps_key = google_maps_api_key()
+    map_html, map_scripts = map_section(dest.get("map"), dest.get("title", ""), maps_key)
     if map_html:
         body += map_html
     if indoor_section:
@@ -962,6 +1315,8 @@ def build_page(dest, template, styles):
         <p class="lede">{access_note}</p>
       </section>
         """
+    body += origin_slot("combine")
+    body += related_html(dest)
 
     body += f"""
       <section class="section">
@@ -992,6 +1347,7 @@ def build_page(dest, template, styles):
     page = page.replace("__TITLE__", f"KMC Exploration | {dest['title']}")
     page = page.replace("__STYLES__", styles)
     page = page.replace("__NAV__", nav)
+    page = page.replace("__SEARCH__", search_box_html("../"))
     page = page.replace("__HEADING__", dest["title"])
     page = page.replace("__LEDE__", lede)
     page = page.replace("__BODY__", body)
@@ -1005,17 +1361,31 @@ def build_page(dest, template, styles):
     return page
 
 
-def list_card_html(dest, pill_label):
-    highlights = ", ".join(dest["highlights"][:3])
+def list_card_html(dest, pill_label, attrs=""):
     pill = f'<span class="pill">{pill_label}</span>' if pill_label else ""
+    inputs = tuple(dest.get(key) for key in CARD_FIELDS) + (
+        tuple(dest["highlights"][:3]),
+        tuple(dest.get("modes", [])),
+        placeholder_attrs(dest.get("placeholder")),
+    )
+    body = FRAGMENTS.get("card", inputs, lambda: list_card_body(dest))
+    return f"""
+      <article class="card"{attrs}>{body}{pill}
+          </div>
+        </div>
+      </article>
+    """
+
+
+def list_card_body(dest):
+    highlights = ", ".join(dest["highlights"][:3])
     groomed = bool(dest.get("groomed", False))
     guide_label = "" if groomed else "<span>Guide coming soon</span>"
     img_src = normalize_wikimedia_url(dest.get("image"), width=900)
     tag = format_travel_tag(dest.get("tag", ""), dest.get("modes", []))
     return f"""
-      <article class="card">
         <a href="destinations/{dest['slug']}.html">
-          <img src="{img_src}" alt="{dest['alt']}" loading="lazy" decoding="async" />
+          <img src="{img_src}" alt="{dest['alt']}"{placeholder_attrs(dest.get("placeholder"))} loading="lazy" decoding="async" />
         </a>
         <div class="card-body">
           <div class="tag">{tag}</div>
@@ -1028,13 +1398,24 @@ def list_card_html(dest, pill_label):
           </ul>
           <div class="cta">
             {guide_label}
-            {pill}
-          </div>
-        </div>
-      </article>
-    """
+            """
 
 
+def facet_rows(destinations, mode=None):
+    rows = []
+    for dest in destinations:
+        minutes = travel_minutes(dest, mode)
+        rows.append({"values": facets.facet_values(dest, minutes), "minutes": minutes, "title": dest.get("title", "")})
+    return rows
+
+
+def faceted_cards(destinations, mode, pill):
+    rows = facet_rows(destinations, mode)
+    table, counts = facets.build_facet_table(rows)
+    cards = [list_card_html(dest, pill(dest), facets.card_data_attrs(idx, rows[idx])) for idx, dest in enumerate(destinations)]
+    return cards, facets.facet_controls_html(table, counts)
+
+
 def pill_for_list(dest, mode, day_trip):
     if day_trip:
         return "Day trip"
@@ -1047,8 +1428,29 @@ def pill_for_list(dest, mode, day_trip):
     return ""
 
 
-def build_list_page(destinations, title, lede, active_href, mode, day_trip, styles, groomed_only=True):
-    cards = []
+def build_list_page(
+    destinations,
+    title,
+    lede,
+    active_href,
+    mode,
+    day_trip,
+    styles,
+    groomed_only=True,
+    page_size=None,
+    chunk_size=None,
+    parts=None,
+):
+    selected = select_list_destinations(destinations, mode, day_trip, groomed_only=groomed_only)
+    cards, controls = faceted_cards(selected, mode, lambda dest: pill_for_list(dest, mode, day_trip))
+    footer_origin = "Frankfurt" if mode == "plane" else origin_slot("origin")
+    return list_page_outputs(
+        cards, controls, title, lede, active_href, styles, footer_origin, page_size=page_size, chunk_size=chunk_size, parts=parts
+    )
+
+
+def select_list_destinations(destinations, mode, day_trip, groomed_only=True):
+    selected = []
     seen = set()
     for dest in destinations:
         if groomed_only and not dest.get("groomed"):
@@ -1064,57 +1466,111 @@ def build_list_page(destinations, title, lede, active_href, mode, day_trip, styl
         if not day_trip and dest["length"] == "1 day":
             continue
         seen.add(slug)
-        cards.append(list_card_html(dest, pill_for_list(dest, mode, day_trip)))
-
-    cards_html = "\n".join(cards)
-    nav = make_list_nav(active_href)
-    footer_origin = "Frankfurt" if mode == "plane" else "Landstuhl"
-
-    return f"""<!doctype html>
-<html lang="en">
-<head>
-  <meta charset="utf-8" />
-  <meta name="viewport" content="width=device-width, initial-scale=1" />
-  <title>{title}</title>
-  <style>
-{styles}
-  </style>
-</head>
-<body>
-  <div class="layout">
-    <aside class="sidebar" aria-label="Category navigation">
-      <div class="brand">KMC Exploration</div>
-      <div class="nav">
-{nav}
-      </div>
-      <p class="note">Built for military and support families in the Kaiserslautern Military Community.</p>
-    </aside>
-    <main class="content">
-      <header>
-        <h1>{title.split('|')[-1].strip()}</h1>
-        <p class="lede">{lede}</p>
-      </header>
-      <section class="grid" aria-label="{title}">
-{cards_html}
-      </section>
-      <footer>
-        Photos sourced from Wikimedia Commons. Travel times are approximate from {footer_origin}.
-      </footer>
-    </main>
-  </div>
-</body>
-</html>
-"""
+        selected.append(dest)
+    return selected
 
 
-def build_future_page(destinations, title, lede, active_href, styles):
-    cards = []
-    for dest in destinations:
-        if dest.get("groomed"):
-            continue
-        cards.append(list_card_html(dest, "Research pending"))
+def build_future_page(destinations, title, lede, active_href, styles, page_size=None, chunk_size=None, parts=None):
+    selected = [dest for dest in destinations if not dest.get("groomed")]
+    cards, controls = faceted_cards(selected, None, lambda dest: "Research pending")
+    return list_page_outputs(
+        cards,
+        controls,
+        title,
+        lede,
+        active_href,
+        styles,
+        origin_slot("origin"),
+        page_size=page_size,
+        chunk_size=chunk_size,
+        empty_html='<div class="notice"><strong>All set:</strong> No future destinations queued yet.</div>',
+        parts=parts,
+    )
+
+
+def numbered_page_name(filename, number):
+    if number == 1:
+        return filename
+    stem = filename.rsplit(".", 1)[0]
+    return f"{stem}-{number}.html"
+
 
-    cards_html = "\n".join(cards) if cards else '<div class="notice"><strong>All set:</strong> No future destinations queued yet.</div>'
+def pager_html(filename, total_pages, current):
+    if total_pages < 2:
+        return ""
+    links = []
+    for number in range(1, total_pages + 1):
+        href = numbered_page_name(filename, number)
+        if number == current:
+            links.append(f'<a href="{href}" class="active" aria-current="page">{number}</a>')
+        else:
+            links.append(f'<a href="{href}">{number}</a>')
+    if current > 1:
+        links.insert(0, f'<a href="{numbered_page_name(filename, current - 1)}" rel="prev">Previous</a>')
+    if current < total_pages:
+        links.append(f'<a href="{numbered_page_name(filename, current + 1)}" rel="next">Next</a>')
+    return f'\n      <nav class="pager" aria-label="Pages">{"".join(links)}</nav>'
+
+
+def chunk_files(filename, cards, start, chunk_size):
+    stem = filename.rsplit(".", 1)[0]
+    names = []
+    files = {}
+    for offset in range(start, len(cards), chunk_size):
+        body = json.dumps(
+            {"start": offset, "cards": [card.strip() for card in cards[offset : offset + chunk_size]]},
+            ensure_ascii=True,
+            separators=(",", ":"),
+        )
+        name = f"chunks/{stem}/{len(names)}.{hashlib.sha1(body.encode('utf-8')).hexdigest()[:10]}.json"
+        names.append(name)
+        files[name] = body
+    return names, files
+
+
+def list_page_outputs(
+    cards,
+    controls,
+    title,
+    lede,
+    filename,
+    styles,
+    footer_origin,
+    page_size=None,
+    chunk_size=None,
+    empty_html="",
+    parts=None,
+):
+    # Cards are filled before chunking so chunk names hash the final content.
+    parts = parts or HOME_ORIGIN.parts()
+    cards = [fill_origin(card, parts) for card in cards]
+    if not page_size or len(cards) <= page_size:
+        cards_html = "\n".join(cards) if cards else empty_html
+        scripts = facets.facet_script() if controls else ""
+        html = list_page_html(title, lede, filename, styles, cards_html, footer_origin, controls, scripts)
+        return {filename: fill_origin(html, parts)}
+
+    chunk_size = chunk_size or page_size
+    total_pages = (len(cards) + page_size - 1) // page_size
+    names, outputs = chunk_files(filename, cards, page_size, chunk_size)
+    for number in range(1, total_pages + 1):
+        page_cards = cards[(number - 1) * page_size : number * page_size]
+        cards_html = "\n".join(page_cards)
+        extra = pager_html(filename, total_pages, number)
+        page_controls = ""
+        scripts = ""
+        if number == 1:
+            chunk_list = escape(json.dumps(names, separators=(",", ":")), quote=True)
+            extra = f'\n      <div class="grid-more" data-chunks="{chunk_list}"></div>' + extra
+            page_controls = controls
+            scripts = virtual_grid_script() + (facets.facet_script() if controls else "")
+        page_title = title if number == 1 else f"{title} (page {number})"
+        html = list_page_html(page_title, lede, filename, styles, cards_html, footer_origin, page_controls, scripts, extra)
+        outputs[numbered_page_name(filename, number)] = fill_origin(html, parts)
+    return outputs
+
+
+def list_page_html(title, lede, active_href, styles, cards_html, footer_origin, controls="", scripts="", extra=""):
     nav = make_list_nav(active_href)
 
     return f"""<!doctype html>
@@ -1134,26 +1590,134 @@ def build_future_page(destinations, title, lede, active_href, styles):
       <div class="nav">
 {nav}
       </div>
+{search_box_html("")}
       <p class="note">Built for military and support families in the Kaiserslautern Military Community.</p>
     </aside>
     <main class="content">
       <header>
         <h1>{title.split('|')[-1].strip()}</h1>
         <p class="lede">{lede}</p>
-      </header>
-      <section class="grid" aria-label="{title}">
+      </header>{controls}
+      <section class="grid" data-facet-grid aria-label="{title}">
 {cards_html}
-      </section>
+      </section>{extra}
       <footer>
-        Photos sourced from Wikimedia Commons. Travel times are approximate from Landstuhl.
+        Photos sourced from Wikimedia Commons. Travel times are approximate from {footer_origin}.
       </footer>
     </main>
   </div>
+{scripts}
 </body>
 </html>
 """
 
 
+def virtual_grid_script():
+    return """
+  <script>
+    (function(){
+      var more = document.querySelector("[data-chunks]");
+      var grid = document.querySelector("[data-facet-grid]");
+      if (!more || !grid || !window.fetch) return;
+      var chunks = JSON.parse(more.getAttribute("data-chunks"));
+      var pager = document.querySelector(".pager");
+      if (pager) pager.hidden = true;
+      var next = 0;
+      var loading = null;
+      var blocks = [];
+      var flat = false;
+
+      function blockFor(el){
+        for (var i = 0; i < blocks.length; i++){
+          if (blocks[i].el === el) return blocks[i];
+        }
+        return null;
+      }
+
+      function park(block){
+        if (flat || block.parked) return;
+        block.el.style.height = block.el.offsetHeight + "px";
+        block.el.innerHTML = "";
+        block.parked = true;
+      }
+
+      function unpark(block){
+        if (!block.parked) return;
+        block.el.innerHTML = block.html;
+        block.el.style.height = "";
+        block.parked = false;
+      }
+
+      var viewport = "IntersectionObserver" in window ? new IntersectionObserver(function(entries){
+        entries.forEach(function(entry){
+          var block = blockFor(entry.target);
+          if (!block) return;
+          if (entry.isIntersecting) unpark(block); else park(block);
+        });
+      }, { rootMargin: "1500px 0px" }) : null;
+
+      function addBlock(data){
+        var el = document.createElement("div");
+        el.className = "grid grid-chunk";
+        el.innerHTML = data.cards.join("");
+        more.parentNode.insertBefore(el, more);
+        var block = { el: el, html: el.innerHTML, parked: false };
+        blocks.push(block);
+        if (viewport) viewport.observe(el);
+      }
+
+      function nearEnd(){
+        return more.getBoundingClientRect().top < window.innerHeight + 800;
+      }
+
+      function loadNext(){
+        if (loading) return loading;
+        if (next >= chunks.length) return Promise.resolve();
+        var name = chunks[next++];
+        loading = fetch(name).then(function(r){ return r.json(); }).then(function(data){
+          loading = null;
+          addBlock(data);
+          if (next >= chunks.length){
+            more.hidden = true;
+          } else if (!flat && nearEnd()){
+            loadNext();
+          }
+        }).catch(function(){
+          loading = null;
+          if (pager) pager.hidden = false;
+        });
+        return loading;
+      }
+
+      function loadAll(){
+        flat = true;
+        if (viewport) viewport.disconnect();
+        return (function step(){
+          if (next >= chunks.length && !loading) return Promise.resolve();
+          return Promise.resolve(loading || loadNext()).then(step);
+        })().then(function(){
+          blocks.forEach(function(block){
+            unpark(block);
+            while (block.el.firstChild) grid.appendChild(block.el.firstChild);
+            block.el.parentNode.removeChild(block.el);
+          });
+          blocks = [];
+        });
+      }
+
+      window.kmcGrid = { loadAll: loadAll };
+      if ("IntersectionObserver" in window){
+        new IntersectionObserver(function(entries){
+          if (entries[0].isIntersecting && !flat) loadNext();
+        }, { rootMargin: "800px 0px" }).observe(more);
+      } else {
+        loadAll();
+      }
+    })();
+  </script>
+    """
+
+
 def build_resort_list(destinations, category_page, groomed_only=True):
     cards = []
     for dest in destinations:
@@ -1169,7 +1733,7 @@ def build_resort_list(destinations, category_page, groomed_only=True):
           <img src="{dest['image']}" alt="{dest['alt']}" loading="lazy" decoding="async" />
         </a>
         <div class="card-body">
-          <div class="tag">Travel time from Landstuhl: {format_travel_tag(dest.get("tag", ""), dest.get("modes", []))}</div>
+          <div class="tag">Travel time from {origin_slot("origin")}: {format_travel_tag(dest.get("tag", ""), dest.get("modes", []))}</div>
           <h3><a href="destinations/{dest['slug']}.html">{dest['title']}</a></h3>
           <p class="summary">{dest['summary']}</p>
           <ul class="facts">
@@ -1207,6 +1771,7 @@ def build_category_page(destinations, title, lede, active_href, category_page, s
       <div class="nav">
 {nav}
       </div>
+{search_box_html("")}
       <p class="note">Built for military and support families in the Kaiserslautern Military Community.</p>
     </aside>
     <main class="content">
@@ -1235,13 +1800,13 @@ def build_category_page(destinations, title, lede, active_href, category_page, s
         </ul>
       </section>
       <section class="section">
-        <h2>Resort locations near Landstuhl</h2>
+        <h2>Resort locations near {origin_slot("origin")}</h2>
       </section>
       <section class="grid" aria-label="{title} resort list">
 {resorts_html}
       </section>
       <footer>
-        Photos sourced from Wikimedia Commons. Travel times are approximate from Landstuhl.
+        Photos sourced from Wikimedia Commons. Travel times are approximate from {origin_slot("origin")}.
       </footer>
     </main>
   </div>
@@ -1281,6 +1846,7 @@ def build_category_hub_page(title, lede, active_href, styles, categories):
       <div class="nav">
 {nav}
       </div>
+{search_box_html("")}
       <p class="note">Built for military and support families in the Kaiserslautern Military Community.</p>
     </aside>
     <main class="content">
@@ -1308,7 +1874,7 @@ def build_category_hub_page(title, lede, active_href, styles, categories):
 {cards_html}
       </section>
       <footer>
-        Photos sourced from Wikimedia Commons. Travel times are approximate from Landstuhl.
+        Photos sourced from Wikimedia Commons. Travel times are approximate from {origin_slot("origin")}.
       </footer>
     </main>
   </div>
@@ -1317,141 +1883,1445 @@ def build_category_hub_page(title, lede, active_href, styles, categories):
 """
 
 
-def main():
-    data = json.loads(DATA_PATH.read_text(encoding="utf-8"))
-    template = TEMPLATE_PATH.read_text(encoding="utf-8")
-    styles = (load_base_css() + "\n\n" + EXTRA_CSS).strip()
-
-    for dest in data:
-        modes = dest.get("modes") or []
-        if not modes:
-            tag = (dest.get("tag") or "").lower()
-            if "train" in tag:
-                modes.append("train")
-            if "drive" in tag or "car" in tag:
-                modes.append("car")
-            if "fly" in tag or "plane" in tag:
-                modes.append("plane")
-            dest["modes"] = modes
+LIST_PAGES = [
+    {
+        "filename": "day-trips-car.html",
+        "title": "KMC Exploration | Day Trips by Car",
+        "lede": "Short drives for beaches, parks, and castles you can finish in a single day.",
+        "mode": "car",
+        "day_trip": True,
+    },
+    {
+        "filename": "day-trips-train.html",
+        "title": "KMC Exploration | Day Trips by Train",
+        "lede": "Family-friendly rail outings with walkable centers and easy station access.",
+        "mode": "train",
+        "day_trip": True,
+    },
+    {
+        "filename": "trips-plane.html",
+        "title": "KMC Exploration | Trips by Plane",
+        "lede": "Summer long-weekend trips that are easiest to reach by flight.",
+        "mode": "plane",
+        "day_trip": False,
+    },
+    {
+        "filename": "trips-car.html",
+        "title": "KMC Exploration | Trips by Car",
+        "lede": "Longer drives worth a 4 to 5 day vacation and family-friendly stays.",
+        "mode": "car",
+        "day_trip": False,
+    },
+    {
+        "filename": "trips-train.html",
+        "title": "KMC Exploration | Trips by Train",
+        "lede": "Long-weekend rail journeys with easy station access and walkable centers.",
+        "mode": "train",
+        "day_trip": False,
+    },
+]
 
-        tag = dest.get("tag") or ""
-        drive_minutes = extract_mode_minutes(tag, "Drive") or extract_mode_minutes(tag, "Car")
-        train_minutes = extract_mode_minutes(tag, "Train")
+FUTURE_PAGE = {
+    "filename": "future-destinations.html",
+    "title": "KMC Exploration | Future Destinations",
+    "lede": "Places we want to research next. These cards stay here until we finish field notes.",
+}
+
+KINDER_HOTELS_PAGE = {
+    "filename": "kinder-hotels.html",
+    "title": "KMC Exploration | Kinder Hotels",
+    "lede": "Family-first resort brands with on-site activities, pools, and easy cabin stays.",
+    "categories": [
+        {
+            "title": "Center Parcs",
+            "description": "Forest resort villages with cabins, lakes, indoor water parks, and kid-focused activities.",
+            "href": "center-parcs.html",
+            "link": "Browse Center Parcs ->",
+        }
+    ],
+}
 
-        if train_minutes is not None and train_minutes > 8 * 60:
+CENTER_PARCS_PAGE = {
+    "filename": "center-parcs.html",
+    "title": "KMC Exploration | Center Parcs",
+    "lede": "Resort villages with cottages, aqua domes, and family activities close to Germany.",
+}
+
+LIST_FILENAMES = [page["filename"] for page in LIST_PAGES] + [FUTURE_PAGE["filename"]]
+HUB_FILENAMES = [KINDER_HOTELS_PAGE["filename"], CENTER_PARCS_PAGE["filename"]]
+PAGE_TYPES = ("destinations", "lists", "hubs")
+CARD_FIELDS = ("slug", "title", "summary", "image", "alt", "tag", "length", "best_for", "groomed")
+LIST_SUMMARY_FIELDS = (
+    "slug",
+    "title",
+    "summary",
+    "image",
+    "alt",
+    "tag",
+    "modes",
+    "length",
+    "best_for",
+    "groomed",
+    "category_page",
+    "placeholder",
+)
+LINK_FIELDS = ("slug", "title", "summary", "length", "modes", "tag", "travel", "center")
+
+
+def normalize_destination(dest):
+    modes = dest.get("modes") or []
+    if not modes:
+        tag = (dest.get("tag") or "").lower()
+        if "train" in tag:
+            modes.append("train")
+        if "drive" in tag or "car" in tag:
+            modes.append("car")
+        if "fly" in tag or "plane" in tag:
+            modes.append("plane")
+        dest["modes"] = modes
+
+    tag = dest.get("tag") or ""
+    drive_minutes = extract_mode_minutes(tag, "Drive") or extract_mode_minutes(tag, "Car")
+    train_minutes = extract_mode_minutes(tag, "Train")
+
+    if train_minutes is not None and train_minutes > 8 * 60:
+        dest["modes"] = ["plane"]
+        return
+
+    if drive_minutes is not None and drive_minutes > 8 * 60:
+        if train_minutes is not None and train_minutes <= 8 * 60:
+            dest["modes"] = ["train"]
+        else:
             dest["modes"] = ["plane"]
-            continue
+        return
 
-        if drive_minutes is not None and drive_minutes > 8 * 60:
-            if train_minutes is not None and train_minutes <= 8 * 60:
-                dest["modes"] = ["train"]
-            else:
-                dest["modes"] = ["plane"]
+    if drive_minutes is not None and train_minutes is not None:
+        if abs(drive_minutes - train_minutes) <= 60:
+            dest["modes"] = ["car", "train"]
+
+    filtered_tag = filter_tag_for_modes(dest.get("tag") or "", dest.get("modes", []))
+    dest["tag"] = normalize_tag_order(filtered_tag)
+
+
+def map_stage(records, overlay):
+    """Fill map layers imported from OpenStreetMap (see import-osm) where none are curated."""
+    if not overlay:
+        yield from records
+        return
+    import osm_import
+
+    for dest in records:
+        yield osm_import.apply_overlay(dest, overlay.get(dest["slug"]))
+
+
+def destination_centre(dest):
+    return dest.get("center") or (dest.get("map") or {}).get("center")
+
+
+def drive_minutes_in(tag):
+    return extract_mode_minutes(tag, "Drive") or extract_mode_minutes(tag, "Car")
+
+
+class Origin:
+    """A home base that travel times are quoted from.
+
+    The home origin, Landstuhl, is built at the site root from each
+    destination's own tag. Other origins are built under their slug and take
+    travel times from the destination's "travel" entry for them, or estimate
+    the drive from the home drive time and the difference in distance to the
+    destination centre.
+    """
+
+    def __init__(self, slug, name, lat, lon, home=None):
+        self.slug = slug
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+        self.home = home or self
+        self.prefix = "" if self.home is self else f"{slug}/"
+
+    def parts(self):
+        return {"origin": self.name, "root": "../" if self.prefix else ""}
+
+    def travel_tag(self, dest):
+        tag = dest.get("tag") or ""
+        if self.home is self:
+            return tag
+        curated = (dest.get("travel") or {}).get(self.slug)
+        if curated:
+            return normalize_tag_order(filter_tag_for_modes(curated, dest.get("modes", [])))
+        return self.estimated_tag(dest, tag)
+
+    def estimated_tag(self, dest, tag):
+        centre = destination_centre(dest)
+        minutes = drive_minutes_in(tag)
+        if not centre or minutes is None:
+            return tag
+        import trip_planner
+
+        shift = trip_planner.haversine_km(self.lat, self.lon, centre["lat"], centre["lon"]) - trip_planner.haversine_km(
+            self.home.lat, self.home.lon, centre["lat"], centre["lon"]
+        )
+        minutes = max(MIN_ESTIMATED_DRIVE_MINUTES, round(minutes + trip_planner.drive_minutes(shift)))
+        drive = f"Drive | about {format_minutes(minutes)} (from {self.name})"
+        parts = [part.strip() for part in tag.split("/") if part.strip()]
+        return " / ".join(drive if part.lower().startswith(("drive", "car")) else part for part in parts)
+
+    def localize(self, dest):
+        return dest if self.home is self else dict(dest, tag=self.travel_tag(dest))
+
+    def page_parts(self, dest):
+        tag_label = fill_origin(format_travel_tag(self.travel_tag(dest), dest.get("modes", [])), self.parts())
+        return dict(
+            self.parts(),
+            travel_label="Travel time" if tag_label else "Travel style",
+            travel_tag=tag_label,
+            combine=combine_html(dest, self),
+        )
+
+
+HOME_ORIGIN = Origin("landstuhl", "Landstuhl", 49.4139, 7.5703)
+
+
+def parse_origins(text):
+    """The home origin plus the extra origins listed in data/origins.json."""
+    extra = [
+        Origin(entry["slug"], entry["name"], entry["lat"], entry["lon"], HOME_ORIGIN)
+        for entry in json.loads(text)
+        if entry["slug"] != HOME_ORIGIN.slug
+    ]
+    return [HOME_ORIGIN] + extra
+
+
+def link_row(dest, terms=None):
+    """The fields trip planning and related links read, kept per destination.
+
+    Rows go in the build cache header, so neither needs a pass over the
+    records. With terms (a related.TermCache), the term counts of the text
+    are added to it on the way.
+    """
+    import related
+
+    row = {key: dest[key] for key in LINK_FIELDS if key in dest}
+    if dest.get("map"):
+        row["map"] = {"center": dest["map"].get("center")}
+    text = related.record_text(dest)
+    row["text"] = terms.term_counts(text)[0] if terms is not None else related.text_digest(text)
+    return row
+
+
+def trip_stops(records, origins=(HOME_ORIGIN,)):
+    """Day-trip destinations with a known centre, as trip_planner stops per origin."""
+    stops = {origin.slug: [] for origin in origins}
+    for dest in records:
+        centre = destination_centre(dest)
+        if not centre or dest.get("length") != "1 day" or "plane" in dest.get("modes", []):
             continue
+        for origin in origins:
+            stops[origin.slug].append(
+                {
+                    "slug": dest["slug"],
+                    "title": dest["title"],
+                    "lat": centre["lat"],
+                    "lon": centre["lon"],
+                    "minutes": drive_minutes_in(origin.travel_tag(dest)),
+                }
+            )
+    return stops
 
-        if drive_minutes is not None and train_minutes is not None:
-            if abs(drive_minutes - train_minutes) <= 60:
-                dest["modes"] = ["car", "train"]
 
-        filtered_tag = filter_tag_for_modes(dest.get("tag") or "", dest.get("modes", []))
-        dest["tag"] = normalize_tag_order(filtered_tag)
+def trip_plans(records, cache_path=DISTANCE_CACHE_PATH, budget=DAILY_DRIVE_MINUTES, stats=None, origins=(HOME_ORIGIN,)):
+    """Multi-stop day trips by origin slug, then destination slug (see trip_planner)."""
+    import trip_planner
 
-    dest_dir = ROOT / "destinations"
-    dest_dir.mkdir(parents=True, exist_ok=True)
-
+    started = time.perf_counter()
+    stops = trip_stops(records, origins)
+    # Stops are the same places for every origin, so one matrix serves all.
+    matrix = trip_planner.distance_matrix(stops[origins[0].slug], cache_path)
+    plans = {
+        origin.slug: trip_planner.plan_trips(stops[origin.slug], matrix, budget, origin={"lat": origin.lat, "lon": origin.lon})
+        for origin in origins
+    }
+    if stats is not None:
+        planned = set().union(*plans.values())
+        stats.update(
+            stops=len(stops[origins[0].slug]),
+            plans=len(planned),
+            origins=len(origins),
+            computed=matrix.computed,
+            elapsed=time.perf_counter() - started,
+        )
+    return plans
+
+
+def combine_stage(records, plans):
+    """Attach the day trips each destination can be combined into, by origin."""
+    for dest in records:
+        trips = {origin: by_slug[dest["slug"]] for origin, by_slug in plans.items() if dest["slug"] in by_slug}
+        yield dict(dest, combine=trips) if trips else dest
+
+
+def related_links(records, cache_path=RELATED_CACHE_PATH, limit=RELATED_LIMIT, stats=None):
+    """You might also like links by destination slug, from text similarity (see related)."""
+    import related
+
+    started = time.perf_counter()
+    records = list(records)
+    cache = related.TermCache(cache_path).load()
+    before = cache.corpus
+    links = related.related_destinations(records, cache, limit)
+    if stats is not None:
+        stats.update(
+            destinations=len(records),
+            linked=len(links),
+            reused=cache.reused,
+            computed=cache.corpus != before,
+            elapsed=time.perf_counter() - started,
+        )
+    return links
+
+
+def related_stage(records, links):
+    """Attach the destinations whose text is most like each one's."""
+    for dest in records:
+        others = links.get(dest["slug"])
+        yield dict(dest, related=others) if others else dest
+
+
+def read_records(path):
+    """Raw records from a destinations JSON array or a SQLite store (see destination_store)."""
+    import destination_store
+
+    if destination_store.is_store(path):
+        return destination_store.read_records(path)
+    return json_stream.iter_json_array(path)
+
+
+def store_travel(record):
+    """Travel minutes by mode for the store's travel_times table, as normalised for the list pages."""
+    dest = dict(record, modes=list(record.get("modes") or []))
+    normalize_destination(dest)
+    tag = dest.get("tag") or ""
+    return {mode: tag_travel_minutes(tag, mode) for mode in dest["modes"]}
+
+
+def normalize_stage(records):
+    for dest in records:
+        normalize_destination(dest)
+        yield dest
+
+
+def photo_stage(
+    records,
+    photo_cache=None,
+    photo_misses=None,
+    photo_budget=PHOTO_PHASE_BUDGET,
+    overlay_path=None,
+    refresh_photos=False,
+    discovered=None,
+    photo_slugs=None,
+    client=None,
+):
+    overlay = load_photo_overlay(overlay_path)
+    budget_started = False
+    try:
+        for dest in records:
+            slug = dest["slug"]
+            previous = None
+            if refresh_photos and dest.get("auto_photos"):
+                previous = photo_fields(dest)
+                dest.pop("photo_deck", None)
+            elif refresh_photos and slug in overlay:
+                previous = overlay[slug]
+            elif not dest.get("photo_deck") and slug in overlay:
+                dest.update(overlay[slug])
+
+            if photo_slugs is None or slug in photo_slugs:
+                if not budget_started:
+                    client = client or default_http_client()
+                    client.start_budget(photo_budget)
+                    budget_started = True
+                if apply_auto_photos(dest, cache=photo_cache, client=client, misses=photo_misses) and discovered is not None:
+                    discovered[slug] = photo_fields(dest)
+
+            if not dest.get("photo_deck") and previous:
+                dest.update(previous)
+            yield dest
+    finally:
+        if budget_started:
+            client.start_budget(None)
+
+
+def placeholder_stage(records, cache):
+    for dest in records:
+        entry = cache.get(dest.get("image"))
+        if entry:
+            dest["placeholder"] = entry
+        for photo in dest.get("photo_deck") or []:
+            entry = cache.get(photo.get("src"))
+            if entry:
+                photo["placeholder"] = entry
+        yield dest
+
+
+def list_summary(dest):
+    summary = {key: dest[key] for key in LIST_SUMMARY_FIELDS if key in dest}
+    summary["highlights"] = list(dest.get("highlights", [])[:3])
+    summary["indoor_attractions"] = bool(dest.get("indoor_attractions"))
+    return summary
+
+
+def destination_outputs(data, template, styles, slugs=None, maps_key=None, origin=None):
+    outputs = {}
     for dest in data:
-        apply_auto_photos(dest)
-        html = build_page(dest, template, styles)
-        (dest_dir / f"{dest['slug']}.html").write_text(html, encoding="utf-8")
-
-    list_pages = [
-        {
-            "filename": "day-trips-car.html",
-            "title": "KMC Exploration | Day Trips by Car",
-            "lede": "Short drives for beaches, parks, and castles you can finish in a single day.",
-            "mode": "car",
-            "day_trip": True,
-        },
-        {
-            "filename": "day-trips-train.html",
-            "title": "KMC Exploration | Day Trips by Train",
-            "lede": "Family-friendly rail outings with walkable centers and easy station access.",
-            "mode": "train",
-            "day_trip": True,
-        },
-        {
-            "filename": "trips-plane.html",
-            "title": "KMC Exploration | Trips by Plane",
-            "lede": "Summer long-weekend trips that are easiest to reach by flight.",
-            "mode": "plane",
-            "day_trip": False,
-        },
-        {
-            "filename": "trips-car.html",
-            "title": "KMC Exploration | Trips by Car",
-            "lede": "Longer drives worth a 4 to 5 day vacation and family-friendly stays.",
-            "mode": "car",
-            "day_trip": False,
-        },
-        {
-            "filename": "trips-train.html",
-            "title": "KMC Exploration | Trips by Train",
-            "lede": "Long-weekend rail journeys with easy station access and walkable centers.",
-            "mode": "train",
-            "day_trip": False,
-        },
-    ]
+        if slugs is not None and dest["slug"] not in slugs:
+            continue
+        outputs[f"destinations/{dest['slug']}.html"] = build_page(dest, template, styles, maps_key, origin)
+    return outputs
 
-    for page in list_pages:
-        html = build_list_page(
-            data,
-            page["title"],
-            page["lede"],
-            page["filename"],
-            page["mode"],
-            page["day_trip"],
+
+def page_picker(data, selections=None):
+    """The records each page draws from, by filename.
+
+    That is all of data, or with selections (filename -> slugs in order, see
+    SiteBuilder.list_selections) just the page's own members.
+    """
+    if selections is None:
+        return lambda filename: data
+    by_slug = {dest["slug"]: dest for dest in data}
+    return lambda filename: [by_slug[slug] for slug in selections.get(filename, ()) if slug in by_slug]
+
+
+def list_outputs(
+    data, styles, filenames=None, origin=None, selections=None, page_size=LIST_PAGE_SIZE, chunk_size=LIST_CHUNK_SIZE
+):
+    parts = (origin or HOME_ORIGIN).parts()
+    pick = page_picker(data, selections)
+    outputs = {}
+    for page in LIST_PAGES:
+        if filenames is not None and page["filename"] not in filenames:
+            continue
+        outputs.update(
+            build_list_page(
+                pick(page["filename"]),
+                page["title"],
+                page["lede"],
+                page["filename"],
+                page["mode"],
+                page["day_trip"],
+                styles,
+                groomed_only=True,
+                page_size=page_size,
+                chunk_size=chunk_size,
+                parts=parts,
+            )
+        )
+    if filenames is None or FUTURE_PAGE["filename"] in filenames:
+        outputs.update(
+            build_future_page(
+                pick(FUTURE_PAGE["filename"]),
+                FUTURE_PAGE["title"],
+                FUTURE_PAGE["lede"],
+                FUTURE_PAGE["filename"],
+                styles,
+                page_size=page_size,
+                chunk_size=chunk_size,
+                parts=parts,
+            )
+        )
+    return outputs
+
+
+def hub_outputs(data, styles, filenames=None, origin=None, selections=None):
+    parts = (origin or HOME_ORIGIN).parts()
+    pick = page_picker(data, selections)
+    outputs = {}
+    if filenames is None or KINDER_HOTELS_PAGE["filename"] in filenames:
+        outputs[KINDER_HOTELS_PAGE["filename"]] = build_category_hub_page(
+            KINDER_HOTELS_PAGE["title"],
+            KINDER_HOTELS_PAGE["lede"],
+            KINDER_HOTELS_PAGE["filename"],
+            styles,
+            KINDER_HOTELS_PAGE["categories"],
+        )
+    if filenames is None or CENTER_PARCS_PAGE["filename"] in filenames:
+        outputs[CENTER_PARCS_PAGE["filename"]] = build_category_page(
+            pick(CENTER_PARCS_PAGE["filename"]),
+            CENTER_PARCS_PAGE["title"],
+            CENTER_PARCS_PAGE["lede"],
+            CENTER_PARCS_PAGE["filename"],
+            CENTER_PARCS_PAGE["filename"],
             styles,
             groomed_only=True,
         )
-        (ROOT / page["filename"]).write_text(html, encoding="utf-8")
+    return {name: fill_origin(html, parts) for name, html in outputs.items()}
+
+
+def page_members(data, filename, selections=None):
+    if selections is not None and filename in selections:
+        return selections[filename]
+    for page in LIST_PAGES:
+        if page["filename"] == filename:
+            return [dest["slug"] for dest in select_list_destinations(data, page["mode"], page["day_trip"])]
+    if filename == FUTURE_PAGE["filename"]:
+        return [dest["slug"] for dest in data if not dest.get("groomed")]
+    if filename == CENTER_PARCS_PAGE["filename"]:
+        return [dest["slug"] for dest in data if dest.get("groomed") and dest.get("category_page") == filename]
+    return []
+
+
+def page_filters(filename):
+    """destination_store.select_slugs() filters matching page_members() for a page."""
+    for page in LIST_PAGES:
+        if page["filename"] == filename:
+            return {"mode": page["mode"], "day_trip": page["day_trip"], "groomed": True}
+    if filename == FUTURE_PAGE["filename"]:
+        return {"groomed": False}
+    if filename == CENTER_PARCS_PAGE["filename"]:
+        return {"groomed": True, "category_page": filename}
+    return None
+
+
+def targeted_outputs(
+    data,
+    template,
+    styles,
+    pages=PAGE_TYPES,
+    only=None,
+    maps_key=None,
+    origin=None,
+    members=None,
+    selections=None,
+    page_size=LIST_PAGE_SIZE,
+    chunk_size=LIST_CHUNK_SIZE,
+):
+    """Pages of the given types; with only, just those showing one of those slugs.
+
+    members, when given, maps list and hub filenames to the slugs they showed
+    last time and is updated in place, so a page a slug has just left is
+    rebuilt as well. selections is passed on to page_picker, page_size and
+    chunk_size to list_outputs.
+    """
+    outputs = {}
+    if "destinations" in pages:
+        outputs.update(destination_outputs(data, template, styles, only, maps_key, origin))
+    filenames = {
+        "lists": LIST_FILENAMES,
+        "hubs": HUB_FILENAMES,
+    }
+    paging = {"page_size": page_size, "chunk_size": chunk_size}
+    for kind, build, options in (("lists", list_outputs, paging), ("hubs", hub_outputs, {})):
+        if kind not in pages:
+            continue
+        names = filenames[kind]
+        if only is not None or members is not None:
+            now = {name: set(page_members(data, name, selections)) for name in names}
+        if only is not None:
+            before = members or {}
+            names = [name for name in names if only & (now[name] | before.get(name, set()))]
+        if members is not None:
+            members.update(now)
+        if names:
+            outputs.update(build(data, styles, names, origin, selections, **options))
+    return outputs
 
-    kinder_hotels_page = build_category_hub_page(
-        "KMC Exploration | Kinder Hotels",
-        "Family-first resort brands with on-site activities, pools, and easy cabin stays.",
-        "kinder-hotels.html",
-        styles,
-        [
-            {
-                "title": "Center Parcs",
-                "description": "Forest resort villages with cabins, lakes, indoor water parks, and kid-focused activities.",
-                "href": "center-parcs.html",
-                "link": "Browse Center Parcs ->",
-            }
-        ],
+
+def is_destination_page(name):
+    return name.startswith("destinations/") or "/destinations/" in name
+
+
+def page_type(name, content):
+    if not name.endswith(".html"):
+        return None
+    if is_destination_page(name):
+        return "destination-map" if 'id="trierMap"' in content else "destination"
+    return "hub" if name.rsplit("/", 1)[-1] in HUB_FILENAMES else "list"
+
+
+CHUNK_LIST = re.compile(r'data-chunks="([^"]*)"')
+
+
+def prune_stage(outputs, pruner):
+    # Chunk files come before the page that fetches them; their cards count
+    # as part of that page so lazily loaded markup keeps its rules.
+    chunks = {}
+    for name, content in outputs:
+        if name.startswith("chunks/") or "/chunks/" in name:
+            chunks[name] = "\n".join(json.loads(content)["cards"])
+        elif name.endswith(".html"):
+            match = CHUNK_LIST.search(content)
+            names = json.loads(unescape(match.group(1))) if match else []
+            base = name[: name.rfind("/") + 1]
+            content = pruner.apply(content, "\n".join(chunks.pop(base + chunk, "") for chunk in names))
+        yield name, content
+
+
+def hint_stage(outputs):
+    """Add preconnect and prefetch hints for the hosts and links each page uses (see resource_hints)."""
+    import resource_hints
+
+    for name, content in outputs:
+        if name.endswith(".html"):
+            content = resource_hints.add_hints(content)
+        yield name, content
+
+
+def weigh_stage(outputs, report):
+    for name, content in outputs:
+        kind = page_type(name, content)
+        if kind:
+            report.add(name, kind, content)
+        yield name, content
+
+
+def write_outputs(outputs, root, written=None):
+    items = outputs.items() if isinstance(outputs, dict) else outputs
+    chunk_dirs = {}
+    changed = []
+    for name, content in items:
+        if {"chunks", "search"}.intersection(Path(name).parts[:-1]):
+            chunk_dirs.setdefault(root / Path(name).parent, set()).add(Path(name).name)
+        if written is not None:
+            digest = hashlib.sha1(content.encode("utf-8")).hexdigest()
+            if written.get(name) == digest:
+                continue
+            written[name] = digest
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+        changed.append(name)
+    for chunk_dir, keep in chunk_dirs.items():
+        for stale in chunk_dir.glob("*.json"):
+            if stale.name not in keep:
+                stale.unlink()
+    return changed
+
+
+def source_key(path):
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class SiteBuilder:
+    """Render the site in memory from explicit paths.
+
+    A builder can be reused within one process: the template, base CSS and
+    Commons photo lookups are cached between calls and only re-read when the
+    source files change. With a shared_cache (see shared_cache), photo lookups
+    and placeholder thumbnails are also shared with concurrent builds.
+    """
+
+    def __init__(
+        self,
+        root=ROOT,
+        data_path=None,
+        overlay_path=None,
+        template_path=None,
+        index_path=None,
+        maps_key=None,
+        client=None,
+        photo_budget=PHOTO_PHASE_BUDGET,
+        fetch_photos=True,
+        cache_path=None,
+        prune_css=True,
+        placeholder_path=None,
+        fetch_placeholders=False,
+        map_overlay_path=None,
+        distance_path=None,
+        drive_budget=DAILY_DRIVE_MINUTES,
+        origins_path=None,
+        origins=None,
+        shared_cache=None,
+        related_path=None,
+        related_limit=RELATED_LIMIT,
+        resource_hints=True,
+        page_size=LIST_PAGE_SIZE,
+        chunk_size=LIST_CHUNK_SIZE,
+    ):
+        self.root = Path(root)
+        self.data_path = Path(data_path) if data_path else self.root / "data" / "destinations.json"
+        self.overlay_path = Path(overlay_path) if overlay_path else self.root / "data" / "photo-overlay.json"
+        self.map_overlay_path = Path(map_overlay_path) if map_overlay_path else self.root / "data" / "map-overlay.json"
+        self.template_path = Path(template_path) if template_path else self.root / "templates" / "destination.html"
+        self.index_path = Path(index_path) if index_path else self.root / "index.html"
+        self.maps_key = google_maps_api_key() if maps_key is None else maps_key
+        self.client = client
+        self.photo_budget = photo_budget
+        self.fetch_photos = fetch_photos
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.build_cache = None
+        self.prepared = None
+        self.rows = None
+        self.prune_css = prune_css
+        self.pruner = None
+        self.placeholder_path = Path(placeholder_path) if placeholder_path else None
+        self.fetch_placeholders = fetch_placeholders
+        self.placeholders = None
+        self.distance_path = Path(distance_path) if distance_path else None
+        self.drive_budget = drive_budget
+        self.trips = None
+        self.related_path = Path(related_path) if related_path else None
+        self.related_limit = related_limit
+        self.related = None
+        self.terms = None
+        self.tokenized = 0
+        self.resource_hints = resource_hints
+        self.page_size = page_size
+        self.chunk_size = chunk_size
+        self.origins_path = Path(origins_path) if origins_path else self.root / "data" / "origins.json"
+        self.origin_slugs = set(origins) if origins else None
+        self.shared_cache = shared_cache
+        self.photo_cache = shared_cache.namespace(COMMONS_PHOTO_NAMESPACE) if shared_cache else {}
+        self.photo_misses = set()
+        self.sources = {}
+
+    def read_source(self, path, parse=None):
+        key = source_key(path)
+        if key is None:
+            return None
+        cached = self.sources.get(path)
+        if cached is None or cached[0] != key:
+            text = path.read_text(encoding="utf-8")
+            cached = (key, parse(text) if parse else text)
+            self.sources[path] = cached
+        return cached[1]
+
+    def template(self):
+        return self.read_source(self.template_path)
+
+    def styles(self):
+        self.prepare()
+        if self.build_cache is not None and self.build_cache.warm and self.index_path not in self.sources:
+            self.sources[self.index_path] = (source_key(self.index_path), self.build_cache.header.get("base_css"))
+        base = self.read_source(self.index_path, base_css_from_html) or ""
+        return (base + "\n\n" + EXTRA_CSS).strip()
+
+    def destinations(self, only=None, refresh_photos=False, discovered=None):
+        return list(self.iter_destinations(only, refresh_photos, discovered))
+
+    def iter_destinations(self, only=None, refresh_photos=False, discovered=None):
+        records = photo_stage(
+            self.normalized_records(),
+            photo_cache=self.photo_cache,
+            photo_misses=self.photo_misses,
+            photo_budget=self.photo_budget,
+            overlay_path=self.overlay_path,
+            refresh_photos=refresh_photos,
+            discovered=discovered,
+            photo_slugs=only if self.fetch_photos else set(),
+            client=self.client,
+        )
+        map_overlay = self.read_source(self.map_overlay_path, json.loads)
+        records = map_stage(records, map_overlay)
+        if self.drive_budget:
+            records = combine_stage(records, self.trip_plans(map_overlay))
+        if self.related_limit:
+            records = related_stage(records, self.related_links())
+        if self.placeholder_path is None:
+            return records
+        return placeholder_stage(records, self.placeholder_cache())
+
+    def trip_plans(self, map_overlay):
+        """Plan day trips from the link rows, before any record streams."""
+        self.trips = {}
+        rows = map_stage(self.link_rows(), map_overlay)
+        return trip_plans(rows, self.distance_path, self.drive_budget, self.trips, self.origins())
+
+    def related_links(self):
+        """Match destinations by text from the link rows and the term counts cached by digest."""
+        import related
+
+        started = time.perf_counter()
+        rows = self.link_rows()
+        terms = self.term_cache()
+        before = terms.corpus
+        entries = [(row["slug"], row.get("title", ""), row.get("summary", ""), row["text"]) for row in rows]
+        links = related.related_entries(entries, terms, self.related_limit, fill=self.normalized_records)
+        tokenized, self.tokenized = terms.tokenized - self.tokenized, terms.tokenized
+        self.related = dict(
+            destinations=len(rows),
+            linked=len(links),
+            reused=len(rows) - tokenized,
+            computed=terms.corpus != before,
+            elapsed=time.perf_counter() - started,
+        )
+        return links
+
+    def term_cache(self):
+        if self.terms is None:
+            import related
+
+            self.terms = related.TermCache(self.related_path).load()
+        return self.terms
+
+    def link_row(self, dest):
+        return link_row(dest, self.term_cache() if self.related_limit else None)
+
+    def origins(self):
+        """The home origin plus the extra origins, limited to origin_slugs when given."""
+        origins = self.read_source(self.origins_path, parse_origins) or [HOME_ORIGIN]
+        if self.origin_slugs is None:
+            return origins
+        return [origin for origin in origins if origin is HOME_ORIGIN or origin.slug in self.origin_slugs]
+
+    def placeholder_cache(self):
+        if self.placeholders is None:
+            import placeholders
+
+            fetch = self.fetch_thumbnail if self.fetch_placeholders else None
+            image_dir = self.placeholder_path.parent / IMAGE_CACHE_DIR.name
+            self.placeholders = placeholders.PlaceholderCache(self.placeholder_path, image_dir, fetch, self.shared_cache)
+            self.placeholders.load()
+        return self.placeholders
+
+    def fetch_thumbnail(self, url):
+        import placeholders
+
+        filename = wikimedia_filename(url)
+        if not filename:
+            return None
+        return (self.client or default_http_client()).get(placeholders.commons_thumb_url(urllib.parse.unquote(filename)))
+
+    def prepare(self):
+        """Settle the build cache before anything streams, once per change to the sources."""
+        key = self.source_keys()
+        if self.cache_path is None or self.prepared == key:
+            return
+        self.build_cache = build_cache.BuildCache(
+            self.cache_path,
+            {"data": self.data_path, "index": self.index_path},
+            salt=source_fingerprint(),
+        )
+        self.build_cache.load(
+            self.parse_records,
+            header=lambda: {"base_css": self.read_source(self.index_path, base_css_from_html)},
+            derive=travel_modes,
+            index=self.link_row,
+        )
+        self.prepared = key
+
+    def source_keys(self):
+        return tuple(source_key(path) for path in (self.data_path, self.index_path))
+
+    def link_rows(self):
+        """Compact rows for every destination: the build cache index, or one pass when uncached."""
+        self.prepare()
+        if self.build_cache is not None:
+            return self.build_cache.index
+        key = self.source_keys()
+        if self.rows is None or self.rows[0] != key:
+            self.rows = (key, [self.link_row(dest) for dest in self.parse_records()])
+        return self.rows[1]
+
+    def parse_records(self):
+        return normalize_stage(read_records(self.data_path))
+
+    def normalized_records(self):
+        if self.cache_path is None:
+            return self.parse_records()
+        self.prepare()
+        return self.build_cache.cached_records(restore=restore_travel_modes)
+
+    def render(self, data=None, pages=PAGE_TYPES, only=None):
+        return dict(self.stream(data, pages, only))
+
+    def stream(self, records=None, pages=PAGE_TYPES, only=None, members=None):
+        """Yield (name, content) pairs, rendering one destination at a time.
+
+        Destination pages are produced as records arrive; list and hub pages
+        and the search index are built at the end from compact summaries.
+        only is read as each record arrives, so it may be filled while the
+        records stream (see Rebuilder); members is passed to targeted_outputs
+        per origin.
+        """
+        outputs = self.render_pages(records, pages, only, members)
+        if self.prune_css:
+            outputs = prune_stage(outputs, self.css_pruner())
+        if self.resource_hints:
+            outputs = hint_stage(outputs)
+        return outputs
+
+    def css_pruner(self):
+        import css_prune
+
+        styles = self.styles()
+        if self.pruner is None or self.pruner.css != styles:
+            self.pruner = css_prune.CssPruner(styles, extra_scripts=(search_index.search_script(),))
+        return self.pruner
+
+    def render_pages(self, records=None, pages=PAGE_TYPES, only=None, members=None):
+        """Render every origin in one pass over the records.
+
+        Destination pages are rendered once with origin slots and filled in
+        per origin; list and hub pages are rebuilt per origin from summaries
+        carrying that origin's travel times.
+        """
+        if records is None:
+            records = self.iter_destinations(only)
+        template = self.template()
+        styles = self.styles()
+        origins = self.origins()
+        summaries = {origin.slug: [] for origin in origins}
+        docs, postings, forms = [], {}, {}
+        for dest in records:
+            for origin in origins:
+                summaries[origin.slug].append(list_summary(origin.localize(dest)))
+            if "destinations" not in pages:
+                continue
+            search_index.index_document(docs, postings, dest, forms)
+            if only is None or dest["slug"] in only:
+                shared = shared_page(dest, template, styles, self.maps_key)
+                for origin in origins:
+                    yield f"{origin.prefix}destinations/{dest['slug']}.html", fill_origin(shared, origin.page_parts(dest))
+        kinds = [kind for kind in pages if kind != "destinations"]
+        selections = self.list_selections() if kinds else None
+        for origin in origins:
+            seen = None if members is None else members.setdefault(origin.slug, {})
+            outputs = targeted_outputs(
+                summaries[origin.slug],
+                template,
+                styles,
+                kinds,
+                only,
+                origin=origin,
+                members=seen,
+                selections=selections,
+                page_size=self.page_size,
+                chunk_size=self.chunk_size,
+            )
+            for name, body in outputs.items():
+                yield origin.prefix + name, body
+        if "destinations" in pages:
+            files = search_index.render_search_files(docs, postings, forms)
+            for origin in origins:
+                for name, body in files.items():
+                    yield f"{origin.prefix}search/{name}", body
+
+    def list_selections(self):
+        """List and hub page members from the store's indexes when the data is a store, else None."""
+        import destination_store
+
+        if not destination_store.is_store(self.data_path):
+            return None
+        filters = {filename: page_filters(filename) for filename in LIST_FILENAMES + HUB_FILENAMES}
+        with destination_store.reading(self.data_path) as conn:
+            return {filename: destination_store.select_slugs(conn, **found) for filename, found in filters.items() if found}
+
+    def write(self, outputs, out=None, written=None):
+        return write_outputs(outputs, Path(out) if out else self.root, written)
+
+
+def fingerprint_stage(records, fingerprints, changed):
+    """Pass records through, adding to changed the slug of each whose content moved since last time.
+
+    fingerprints maps slug to a digest of the fully staged record and is
+    updated in place; slugs no longer in the data count as changed too.
+    """
+    seen = set()
+    for dest in records:
+        slug = dest["slug"]
+        seen.add(slug)
+        digest = hashlib.sha1(json.dumps(dest, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        if fingerprints.get(slug) != digest:
+            fingerprints[slug] = digest
+            changed.add(slug)
+        yield dest
+    for slug in set(fingerprints) - seen:
+        del fingerprints[slug]
+        changed.add(slug)
+
+
+class Rebuilder:
+    """Incremental rebuilds through a SiteBuilder's own pipeline, for watch and serve.
+
+    Every rebuild streams the records through iter_destinations and stream
+    exactly as a build does. Records are fingerprinted as they arrive, so only
+    destinations whose staged record changed, day trips and related links
+    included, are re-rendered, with the list and hub pages they are or were
+    on. A change to the template, index.html or the origins re-renders
+    everything. Files under prompts/ are watched too, but only noticed: no
+    page is rendered from them.
+    """
+
+    def __init__(self, builder, pages=PAGE_TYPES):
+        self.builder = builder
+        self.pages = pages
+        self.fingerprints = {}
+        self.members = {}
+        self.snapshot = None
+        self.layout = None
+        self.changed = set()
+        self.noticed = []
+
+    def paths(self):
+        return self.input_paths() + self.prompt_paths()
+
+    def input_paths(self):
+        builder = self.builder
+        return [builder.data_path, builder.overlay_path, builder.map_overlay_path, *self.layout_paths()]
+
+    def layout_paths(self):
+        return [self.builder.template_path, self.builder.index_path, self.builder.origins_path]
+
+    def prompt_paths(self):
+        return sorted((self.builder.root / "prompts").glob("*"))
+
+    def sources(self):
+        return [source_key(path) for path in self.input_paths()], {path: source_key(path) for path in self.prompt_paths()}
+
+    def stale(self):
+        return self.sources() != self.snapshot
+
+    def outputs(self):
+        """Yield (name, content) for every file whose inputs changed since the last rebuild."""
+        previous, self.snapshot = self.snapshot, self.sources()
+        inputs, prompts = self.snapshot
+        before = previous[1] if previous else prompts
+        self.noticed = sorted(path for path in set(prompts) | set(before) if prompts.get(path) != before.get(path))
+        self.changed = set()
+        if previous and previous[0] == inputs:
+            return
+        layout = [source_key(path) for path in self.layout_paths()]
+        only = self.changed if layout == self.layout else None
+        self.layout = layout
+        records = fingerprint_stage(self.builder.iter_destinations(), self.fingerprints, self.changed)
+        try:
+            yield from self.builder.stream(records, self.pages, only, self.members)
+        except BaseException:
+            # A rebuild cut short leaves pages behind their fingerprints; start over next time.
+            self.layout = None
+            raise
+
+
+def watch(builder, out=None, interval=0.25, pages=PAGE_TYPES):
+    """Build into out, then rebuild whatever changed each time a source file does (see Rebuilder)."""
+    rebuilder = Rebuilder(builder, pages)
+    written = {}
+    builder.write(rebuilder.outputs(), out, written)
+    print(f"Watching {len(rebuilder.paths())} files for changes (Ctrl+C to stop)")
+
+    try:
+        while True:
+            time.sleep(interval)
+            if not rebuilder.stale():
+                continue
+            started = time.perf_counter()
+            try:
+                rebuilt = builder.write(rebuilder.outputs(), out, written)
+            except (OSError, ValueError) as exc:
+                print(f"Skipping rebuild, could not read {builder.data_path.name}: {exc}")
+                continue
+            elapsed = (time.perf_counter() - started) * 1000
+            for path in rebuilder.noticed:
+                print(f"{path.relative_to(builder.root)} changed; no generated pages depend on it")
+            if rebuilt:
+                print(f"Rebuilt {len(rebuilt)} file(s) in {elapsed:.0f} ms: {', '.join(rebuilt[:6])}{' ...' if len(rebuilt) > 6 else ''}")
+    except KeyboardInterrupt:
+        print("Stopped watching")
+
+
+def preview_request(name):
+    """The stream arguments rendering the generated file name with its siblings, or None if it is not generated."""
+    base = name.rsplit("/", 1)[-1]
+    if is_destination_page(name) and base.endswith(".html"):
+        return {"pages": ("destinations",), "only": {base[: -len(".html")]}}
+    if name.startswith("search/") or "/search/" in name:
+        return {"pages": ("destinations",), "only": set()}
+    listed = {filename.rsplit(".", 1)[0] for filename in LIST_FILENAMES + HUB_FILENAMES}
+    if name.startswith("chunks/") or "/chunks/" in name or re.sub(r"-\d+\.html$", ".html", base)[: -len(".html")] in listed:
+        return {"pages": ("lists", "hubs")}
+    return None
+
+
+def preview_resolver(builder):
+    """A preview_server resolve function rendering builder's pages on demand, then files under its root.
+
+    A requested page is rendered on its own (see preview_request) and kept,
+    with whatever else that pass produced, under a hash of its name and the
+    source keys of the files a rebuild renders from, so it is rendered again only
+    once one of those changes.
+    """
+    import threading
+
+    import preview_server
+
+    paths = Rebuilder(builder).input_paths()
+    pages = preview_server.RenderCache()
+    files = preview_server.RenderCache()
+    lock = threading.Lock()
+    root = builder.root.resolve()
+
+    def render(name, request, stamp):
+        with lock:
+            outputs = dict(builder.stream(**request))
+        requested = None
+        for output, content in outputs.items():
+            found = preview_server.response(output, content.encode("utf-8"))
+            pages.put(preview_server.input_hash(output, stamp), found)
+            if output == name:
+                requested = found
+        return requested
+
+    def resolve(path):
+        name = path.lstrip("/") or "index.html"
+        request = preview_request(name)
+        if request is not None:
+            stamp = repr([source_key(source) for source in paths])
+            found = pages.get(preview_server.input_hash(name, stamp), lambda: render(name, request, stamp))
+            if found is not None:
+                return found
+        path = (root / name).resolve()
+        if root not in path.parents or not path.is_file():
+            return None
+        stat = path.stat()
+        return files.get((str(path), stat.st_mtime_ns, stat.st_size), lambda: preview_server.response(name, path.read_bytes()))
+
+    return resolve
+
+
+def serve_preview(builder, host="127.0.0.1", port=8000):
+    import preview_server
+
+    preview_server.serve(preview_resolver(builder), host, port)
+
+
+COMMANDS = ("build", "serve", "check-images", "import-osm", "store", "cache")
+
+
+def parse_size(value):
+    import argparse
+
+    import shared_cache
+
+    try:
+        return shared_cache.parse_size(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from None
+
+
+def comma_list(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def page_types(value):
+    import argparse
+
+    kinds = comma_list(value)
+    unknown = [kind for kind in kinds if kind not in PAGE_TYPES]
+    if unknown or not kinds:
+        raise argparse.ArgumentTypeError(f"choose from {', '.join(PAGE_TYPES)} (got {value!r})")
+    return kinds
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate KMC Exploration destination and list pages.")
+    commands = parser.add_subparsers(dest="command")
+    build = commands.add_parser("build", help="write the site to disk (default)")
+    build.add_argument("--watch", action="store_true", help="keep running and rebuild affected pages when sources change")
+    build.add_argument("--interval", type=float, default=0.25, help="seconds between change checks in watch mode")
+    build.add_argument("--photo-budget", type=float, default=PHOTO_PHASE_BUDGET, help="total seconds allowed for Commons photo lookups")
+    build.add_argument(
+        "--write-photos",
+        choices=("overlay", "data"),
+        help="save auto-discovered photo decks to data/photo-overlay.json or back into the data file",
     )
-    (ROOT / "kinder-hotels.html").write_text(kinder_hotels_page, encoding="utf-8")
-
-    center_parcs_page = build_category_page(
-        data,
-        "KMC Exploration | Center Parcs",
-        "Resort villages with cottages, aqua domes, and family activities close to Germany.",
-        "center-parcs.html",
-        "center-parcs.html",
-        styles,
-        groomed_only=True,
+    build.add_argument("--refresh-photos", action="store_true", help="re-discover previously saved auto photo decks")
+    build.add_argument("--only", type=comma_list, metavar="SLUG[,SLUG...]", help="build these destinations and the list pages they appear on")
+    build.add_argument("--pages", type=page_types, default=list(PAGE_TYPES), metavar="TYPE[,TYPE...]", help="page types to build: destinations, lists, hubs")
+    build.add_argument("--skip-photos", action="store_true", help="do not look up missing photo decks on Commons")
+    build.add_argument("--data", type=Path, default=DATA_PATH, help="destinations JSON or SQLite store (.sqlite) to build from")
+    build.add_argument("--out", type=Path, default=ROOT, help="directory to write the site into")
+    build.add_argument("--dry-run", action="store_true", help="list the files that would be written without writing them")
+    build.add_argument(
+        "--page-size",
+        type=int,
+        default=LIST_PAGE_SIZE,
+        metavar="N",
+        help="cards per numbered list page (0 keeps every card on one page)",
     )
-    (ROOT / "center-parcs.html").write_text(center_parcs_page, encoding="utf-8")
+    build.add_argument(
+        "--chunk-size",
+        type=int,
+        default=LIST_CHUNK_SIZE,
+        metavar="N",
+        help="cards per lazily loaded chunk after the first list page",
+    )
+    build.add_argument("--keep-fragments", action="store_true", help="reuse rendered HTML fragments from the previous build")
+    build.add_argument("--no-build-cache", action="store_true", help="always parse and normalise the data file from scratch")
+    build.add_argument("--budgets", type=Path, help="JSON file overriding the per-page-type weight budgets")
+    build.add_argument("--weight-report", type=Path, default=WEIGHT_REPORT_PATH, help="where to write the page-weight report")
+    build.add_argument("--no-weight-check", action="store_true", help="skip the page-weight analysis and budgets")
+    build.add_argument("--no-css-prune", action="store_true", help="send the full stylesheet to every page")
+    build.add_argument("--no-resource-hints", action="store_true", help="skip the preconnect and prefetch hints")
+    build.add_argument("--no-placeholders", action="store_true", help="skip the low-quality image placeholders")
+    build.add_argument(
+        "--fetch-placeholders",
+        action="store_true",
+        help="download small Commons thumbnails missing from .cache/images to build placeholders",
+    )
+    build.add_argument("--no-shared-cache", action="store_true", help=f"do not read or write the shared cache (${SHARED_CACHE_ENV})")
+    build.add_argument(
+        "--cache-max-size",
+        type=parse_size,
+        default="512M",
+        metavar="SIZE",
+        help="trim the shared cache to this size after the build (default 512M)",
+    )
+    build.add_argument(
+        "--origins",
+        type=comma_list,
+        metavar="SLUG[,SLUG...]",
+        help="only build these extra origins from data/origins.json (Landstuhl is always built at the site root)",
+    )
+    build.add_argument(
+        "--drive-budget",
+        type=int,
+        default=DAILY_DRIVE_MINUTES,
+        metavar="MINUTES",
+        help="daily driving time for the Combine with day trips from Landstuhl (0 turns them off)",
+    )
+    build.add_argument(
+        "--related",
+        type=int,
+        default=RELATED_LIMIT,
+        metavar="N",
+        help="You might also like links per destination page (0 turns them off)",
+    )
+    serve = commands.add_parser("serve", help="render pages on demand for local preview")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument(
+        "--fetch-photos", action="store_true", help="look up missing photo decks on Commons while rendering (off by default)"
+    )
+    check = commands.add_parser("check-images", help="verify every image and photo_deck URL against Wikimedia Commons")
+    check.add_argument("--api", default=COMMONS_API, help="Commons API endpoint")
+    check.add_argument("--workers", type=int, default=4)
+    check.add_argument("--ttl-hours", type=float, default=7 * 24, help="reuse cached results younger than this")
+    check.add_argument("--cache", type=Path, default=IMAGE_CHECK_CACHE)
+    osm = commands.add_parser("import-osm", help="fill map layers from a local OpenStreetMap extract")
+    osm.add_argument("extract", type=Path, help=".osm.pbf, .osm, .osm.gz or .osm.bz2 file")
+    osm.add_argument("--radius-km", type=float, default=5.0, help="search radius around each destination centre")
+    osm.add_argument("--categories", type=Path, help="JSON file mapping layers to lists of tag conditions")
+    osm.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes decoding .pbf blocks")
+    osm.add_argument("--only", type=comma_list, metavar="SLUG[,SLUG...]", help="only import these destinations")
+    osm.add_argument("--overlay", type=Path, default=MAP_OVERLAY_PATH)
+    cache = commands.add_parser("cache", help="inspect, trim or empty the shared build cache")
+    cache.add_argument("action", choices=("stats", "gc", "clear"))
+    cache.add_argument("--dir", type=Path, default=shared_cache_dir(), help=f"cache directory (default ${SHARED_CACHE_ENV} or .cache/shared)")
+    cache.add_argument("--max-size", type=parse_size, default="512M", metavar="SIZE", help="size to trim to with gc (default 512M)")
+    store = commands.add_parser("store", help="import, export or search the SQLite destination store")
+    store.add_argument("action", choices=("import", "export", "search"))
+    store.add_argument("query", nargs="?", default="", help="words to look for (search only)")
+    store.add_argument("--store", type=Path, default=STORE_PATH, help="SQLite store file")
+    store.add_argument("--data", type=Path, default=DATA_PATH, help="JSON file to import from or export to")
+    store.add_argument("--merge", action="store_true", help="add and update records without removing those missing from the JSON")
+
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in COMMANDS and argv[0] not in ("-h", "--help"):
+        argv.insert(0, "build")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        default_http_client().cooldown = 300
+        builder = SiteBuilder(
+            fetch_photos=args.fetch_photos,
+            cache_path=BUILD_CACHE_PATH,
+            placeholder_path=PLACEHOLDER_CACHE_PATH,
+            distance_path=DISTANCE_CACHE_PATH,
+            related_path=RELATED_CACHE_PATH,
+        )
+        serve_preview(builder, args.host, args.port)
+        return
 
-    future_page = build_future_page(
-        data,
-        "KMC Exploration | Future Destinations",
-        "Places we want to research next. These cards stay here until we finish field notes.",
-        "future-destinations.html",
-        styles,
+    if args.command == "check-images":
+        import image_check
+
+        data = json.loads(DATA_PATH.read_text(encoding="utf-8"))
+        report = image_check.check_destinations(
+            data,
+            wikimedia_filename,
+            args.cache,
+            api_url=args.api,
+            workers=args.workers,
+            ttl=args.ttl_hours * 3600,
+            fetch=default_http_client().get_json,
+        )
+        print(image_check.format_report(report))
+        if report["failures"] or report["errors"]:
+            sys.exit(1)
+        return
+
+    if args.command == "import-osm":
+        import osm_import
+
+        destinations = list(normalize_stage(read_records(DATA_PATH)))
+        if args.only:
+            destinations = [dest for dest in destinations if dest["slug"] in set(args.only)]
+        categories = json.loads(args.categories.read_text(encoding="utf-8")) if args.categories else None
+        report = osm_import.import_extract(
+            destinations,
+            args.extract,
+            args.overlay,
+            CACHE_DIR,
+            radius_km=args.radius_km,
+            categories=categories,
+            workers=args.workers,
+        )
+        print(osm_import.format_report(report))
+        return
+
+    if args.command == "store":
+        run_store(args)
+        return
+
+    if args.command == "cache":
+        import shared_cache
+
+        cache = shared_cache.SharedCache(args.dir, args.max_size)
+        if args.action == "stats":
+            print(shared_cache.format_report(cache.stats(), cache.max_bytes))
+        elif args.action == "gc":
+            print(shared_cache.format_gc(cache.gc()))
+        else:
+            cache.clear()
+            print(f"Cleared {os.path.relpath(cache.base)}")
+        return
+
+    if args.keep_fragments:
+        FRAGMENTS.salt = source_fingerprint()
+        FRAGMENTS.load(FRAGMENT_CACHE_PATH)
+    shared = None
+    if not args.no_shared_cache:
+        import shared_cache
+
+        shared = shared_cache.SharedCache(shared_cache_dir(), args.cache_max_size)
+    only = set(args.only) if args.only else None
+    builder = SiteBuilder(
+        data_path=args.data,
+        photo_budget=args.photo_budget,
+        fetch_photos=not args.skip_photos,
+        cache_path=None if args.no_build_cache else BUILD_CACHE_PATH,
+        prune_css=not args.no_css_prune,
+        placeholder_path=None if args.no_placeholders else PLACEHOLDER_CACHE_PATH,
+        fetch_placeholders=args.fetch_placeholders,
+        distance_path=DISTANCE_CACHE_PATH,
+        drive_budget=args.drive_budget,
+        origins=args.origins,
+        shared_cache=shared,
+        related_path=RELATED_CACHE_PATH,
+        related_limit=args.related,
+        resource_hints=not args.no_resource_hints,
+        page_size=args.page_size,
+        chunk_size=args.chunk_size,
     )
-    (ROOT / "future-destinations.html").write_text(future_page, encoding="utf-8")
+    if args.watch:
+        default_http_client().cooldown = 300
+        watch(builder, args.out, args.interval, args.pages)
+        return
+
+    discovered = {}
+    records = builder.iter_destinations(only, refresh_photos=args.refresh_photos, discovered=discovered)
+    if only is not None:
+        records = list(records)
+        unknown = sorted(only - {dest["slug"] for dest in records})
+        if unknown:
+            build.error(f"unknown slug(s) for --only: {', '.join(unknown)}")
+    outputs = builder.stream(records, args.pages, only)
+    weights = None
+    if not args.no_weight_check:
+        import page_weight
+
+        weights = page_weight.WeightReport(page_weight.load_budgets(args.budgets))
+        outputs = weigh_stage(outputs, weights)
+
+    if args.dry_run:
+        selected = unchanged = 0
+        for name, content in outputs:
+            selected += 1
+            path = args.out / name
+            if path.exists() and path.read_text(encoding="utf-8") == content:
+                unchanged += 1
+            else:
+                print(f"would write {name}")
+        print(f"{selected} files selected, {selected - unchanged} would change ({unchanged} already up to date)")
+        report_weights(weights, args.weight_report)
+        return
 
-    print(f"Generated {len(data)} destination pages and {len(list_pages) + 3} list pages")
+    names = builder.write(outputs, args.out)
+
+    pages = sum(1 for name in names if name.endswith(".html"))
+    destinations = sum(1 for name in names if is_destination_page(name))
+    print(f"Generated {destinations} destination pages and {pages - destinations} list pages")
+    print(FRAGMENTS.format_stats())
+    if builder.pruner is not None:
+        print(builder.pruner.format_stats())
+    if builder.build_cache is not None:
+        print(builder.build_cache.describe())
+    if builder.placeholders is not None:
+        builder.placeholders.save()
+        print(builder.placeholders.format_stats())
+    if builder.trips:
+        import trip_planner
+
+        print(trip_planner.format_stats(builder.trips))
+    if builder.related:
+        import related
+
+        print(related.format_stats(builder.related))
+    if args.keep_fragments:
+        import shared_cache
+
+        # Merge in fragments a concurrent build saved since this one loaded.
+        with shared_cache.FileLock(FRAGMENT_CACHE_PATH.with_name(FRAGMENT_CACHE_PATH.name + ".lock")):
+            FRAGMENTS.load(FRAGMENT_CACHE_PATH)
+            FRAGMENTS.save(FRAGMENT_CACHE_PATH)
+    if shared is not None:
+        print(shared.format_stats())
+        if shared.size() > shared.max_bytes:
+            print(shared_cache.format_gc(shared.gc()))
+    if HTTP_CLIENT is not None and HTTP_CLIENT.requests:
+        print(HTTP_CLIENT.format_stats())
+    if args.write_photos:
+        saved = save_discovered_photos(discovered, args.write_photos, data_path=args.data)
+        target = PHOTO_OVERLAY_PATH if args.write_photos == "overlay" else args.data
+        print(f"Saved {saved} discovered photo decks to {os.path.relpath(target)}")
+    report_weights(weights, args.weight_report)
+
+
+def run_store(args):
+    import destination_store
+
+    conn = destination_store.connect(args.store)
+    try:
+        if args.action == "import":
+            report = destination_store.import_records(
+                conn, json_stream.iter_json_array(args.data), store_travel, merge=args.merge, salt=source_fingerprint()
+            )
+            print(destination_store.format_import(report, os.path.relpath(args.store)))
+        elif args.action == "export":
+            records = destination_store.export_records(conn)
+            write_json_atomic(args.data, records, newline=dominant_newline(args.data) if args.data.exists() else "\n")
+            print(f"Exported {len(records)} destinations to {os.path.relpath(args.data)}")
+        else:
+            for slug, title, snippet in destination_store.search(conn, args.query):
+                print(f"{slug}: {title}\n    {' '.join(snippet.split())}")
+    finally:
+        conn.close()
+
+
+def report_weights(weights, path):
+    if weights is None:
+        return
+    weights.save(path)
+    print(weights.format_summary())
+    if weights.violations:
+        print(f"{len(weights.violations)} page-weight budget(s) exceeded; see {os.path.relpath(path)}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
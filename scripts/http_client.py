@@ -0,0 +1,273 @@
+import email.utils
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+MAX_REDIRECTS = 5
+
+
+class HttpError(Exception):
+    def __init__(self, status, url):
+        super().__init__(f"HTTP {status} for {url}")
+        self.status = status
+        self.url = url
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def parse_retry_after(value, now=None):
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, when.timestamp() - now)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total_ms = 0.0
+
+    def add(self, ms):
+        self.total_ms += ms
+        for idx, limit in enumerate(self.buckets):
+            if ms <= limit:
+                self.counts[idx] += 1
+                return
+        self.counts[-1] += 1
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def percentile(self, pct):
+        if not self.count:
+            return None
+        target = pct / 100 * self.count
+        running = 0
+        for idx, count in enumerate(self.counts):
+            running += count
+            if running >= target:
+                return self.buckets[idx] if idx < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def as_dict(self):
+        labels = [f"<={limit}ms" for limit in self.buckets] + [f">{self.buckets[-1]}ms"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 1) if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class HttpClient:
+    def __init__(
+        self,
+        user_agent="KMC-Exploration/1.0",
+        timeout=10.0,
+        retries=2,
+        backoff=0.5,
+        max_backoff=8.0,
+        failure_threshold=5,
+        cooldown=None,
+        budget=None,
+        sleep=time.sleep,
+    ):
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.sleep = sleep
+        self.deadline = None
+        self.consecutive_failures = 0
+        self.offline = False
+        self.opened_at = None
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+        self.histograms = {}
+        self.idle = {}
+        self.lock = threading.Lock()
+        if budget is not None:
+            self.start_budget(budget)
+
+    def start_budget(self, seconds):
+        self.deadline = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self):
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def get_json(self, url):
+        return json.loads(self.get(url))
+
+    def get(self, url, headers=None):
+        """The response body for url, following up to MAX_REDIRECTS redirects."""
+        for _ in range(MAX_REDIRECTS + 1):
+            status, response_headers, body = self.fetch(url, headers)
+            if status not in REDIRECT_STATUSES:
+                return body
+            location = response_headers.get("Location")
+            if not location:
+                raise HttpError(status, url)
+            url = urljoin(url, location)
+        raise HttpError(status, url)
+
+    def fetch(self, url, headers=None):
+        """(status, headers, body) for one request to url, retrying transient failures."""
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        request_headers = {"User-Agent": self.user_agent, "Accept-Encoding": "identity"}
+        request_headers.update(headers or {})
+
+        attempt = 0
+        while True:
+            self.check_available()
+            timeout = self.attempt_timeout()
+            started = time.monotonic()
+            retry_after = None
+            try:
+                status, response_headers, body = self.send(key, target, request_headers, timeout)
+            except (OSError, http.client.HTTPException) as exc:
+                self.record(parts.netloc, started, ok=False)
+                error = exc
+            else:
+                ok = status < 400
+                self.record(parts.netloc, started, ok=ok or status == 404)
+                if ok:
+                    return status, response_headers, body
+                error = HttpError(status, url)
+                if status not in RETRY_STATUSES:
+                    raise error
+                retry_after = parse_retry_after(response_headers.get("Retry-After"))
+
+            if attempt >= self.retries:
+                raise error
+            delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            remaining = self.remaining()
+            if remaining is not None and delay >= remaining:
+                raise DeadlineExceeded(f"no time left to retry {url}") from error
+            attempt += 1
+            self.retried += 1
+            self.sleep(delay)
+
+    def check_available(self):
+        if self.offline and self.cooldown is not None and time.monotonic() - self.opened_at >= self.cooldown:
+            with self.lock:
+                self.offline = False
+                self.consecutive_failures = max(0, self.failure_threshold - 1)
+        if self.offline:
+            raise CircuitOpen("too many consecutive failures; running offline")
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded("time budget exhausted")
+
+    def attempt_timeout(self):
+        remaining = self.remaining()
+        if remaining is None:
+            return self.timeout
+        return max(0.1, min(self.timeout, remaining))
+
+    def send(self, key, target, headers, timeout):
+        conn = self.checkout(key, timeout)
+        try:
+            conn.request("GET", target, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+        except Exception:
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            self.checkin(key, conn)
+        return response.status, response.headers, body
+
+    def checkout(self, key, timeout):
+        with self.lock:
+            pool = self.idle.get(key) or []
+            conn = pool.pop() if pool else None
+        if conn is None:
+            scheme, netloc = key
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            conn = cls(netloc, timeout=timeout)
+        else:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+        return conn
+
+    def checkin(self, key, conn):
+        with self.lock:
+            self.idle.setdefault(key, []).append(conn)
+
+    def record(self, host, started, ok):
+        elapsed = (time.monotonic() - started) * 1000
+        with self.lock:
+            self.requests += 1
+            self.histograms.setdefault(host, LatencyHistogram()).add(elapsed)
+            if ok:
+                self.consecutive_failures = 0
+                return
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.failure_threshold and self.consecutive_failures >= self.failure_threshold and not self.offline:
+                self.offline = True
+                self.opened_at = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            pools = list(self.idle.values())
+            self.idle = {}
+        for pool in pools:
+            for conn in pool:
+                conn.close()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retried,
+            "failures": self.failures,
+            "offline": self.offline,
+            "hosts": {host: hist.as_dict() for host, hist in sorted(self.histograms.items())},
+        }
+
+    def format_stats(self):
+        stats = self.stats()
+        lines = [
+            f"HTTP: {stats['requests']} requests, {stats['retries']} retries, {stats['failures']} failures"
+            + (" (switched to offline mode)" if stats["offline"] else "")
+        ]
+        for host, hist in stats["hosts"].items():
+            lines.append(f"  {host}: mean {hist['mean_ms']} ms, p50 <= {hist['p50_ms']} ms, p95 <= {hist['p95_ms']} ms")
+        return "\n".join(lines)
@@ -0,0 +1,165 @@
+import json
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
+
+import shared_cache
+
+
+COMMONS_API = "https://commons.wikimedia.org/w/api.php"
+BATCH_SIZE = 50
+DEFAULT_WORKERS = 4
+DEFAULT_TTL = 7 * 24 * 3600
+ALLOWED_MIME = {"image/jpeg", "image/png", "image/webp"}
+MIN_WIDTH = 800
+
+
+def image_refs(destinations, filename_for):
+    refs = {}
+    unchecked = []
+    for dest in destinations:
+        slug = dest.get("slug", "")
+        urls = [("image", dest.get("image"))]
+        urls += [(f"photo_deck[{idx}]", photo.get("src")) for idx, photo in enumerate(dest.get("photo_deck") or [])]
+        for field, url in urls:
+            if not url:
+                continue
+            filename = commons_filename(url, filename_for)
+            if filename:
+                refs.setdefault(filename, []).append((slug, field, url))
+            else:
+                unchecked.append((slug, field, url))
+    return refs, unchecked
+
+
+def commons_filename(url, filename_for):
+    filename = filename_for(url)
+    if not filename:
+        parsed = urlparse(url)
+        if "wikimedia.org" in parsed.netloc and "/Special:FilePath/" in parsed.path:
+            filename = parsed.path.split("/Special:FilePath/", 1)[1]
+    if not filename:
+        return None
+    return unquote(filename).replace(" ", "_")
+
+
+def file_title(filename):
+    return "File:" + filename.replace("_", " ")
+
+
+def fetch_json(url, timeout=20):
+    req = urllib.request.Request(url, headers={"User-Agent": "KMC-Exploration/1.0"})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.load(resp)
+
+
+def query_batch(filenames, api_url=COMMONS_API, fetch=fetch_json):
+    params = {
+        "action": "query",
+        "format": "json",
+        "formatversion": 2,
+        "prop": "imageinfo",
+        "iiprop": "url|mime|size",
+        "titles": "|".join(file_title(name) for name in filenames),
+    }
+    data = fetch(api_url + "?" + urllib.parse.urlencode(params))
+    query = data.get("query", {})
+    aliases = {item["to"]: item["from"] for item in query.get("normalized", [])}
+    by_title = {file_title(name): name for name in filenames}
+    results = {}
+    for page in query.get("pages", []):
+        title = page.get("title", "")
+        name = by_title.get(aliases.get(title, title)) or by_title.get(title)
+        if name is None:
+            continue
+        if page.get("missing") or page.get("invalid"):
+            results[name] = {"error": "file does not exist"}
+            continue
+        info = (page.get("imageinfo") or [{}])[0]
+        results[name] = {"mime": info.get("mime"), "width": info.get("width"), "height": info.get("height")}
+    return results
+
+
+def problem_for(result, min_width=MIN_WIDTH):
+    if result.get("error"):
+        return result["error"]
+    if result.get("mime") not in ALLOWED_MIME:
+        return f"unsupported type {result.get('mime')}"
+    if (result.get("width") or 0) < min_width:
+        return f"too small ({result.get('width')}x{result.get('height')})"
+    return None
+
+
+def load_cache(path):
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(path, cache):
+    shared_cache.write_atomic(path, json.dumps(cache, indent=2, sort_keys=True).encode("utf-8"))
+
+
+def check_files(filenames, cache, api_url=COMMONS_API, workers=DEFAULT_WORKERS, ttl=DEFAULT_TTL, fetch=fetch_json, now=None):
+    now = time.time() if now is None else now
+    stale = [name for name in sorted(filenames) if now - cache.get(name, {}).get("checked", 0) > ttl]
+    batches = [stale[i : i + BATCH_SIZE] for i in range(0, len(stale), BATCH_SIZE)]
+
+    def run(batch):
+        try:
+            return query_batch(batch, api_url, fetch=fetch), None
+        except Exception as exc:
+            return {}, f"{type(exc).__name__}: {exc}"
+
+    errors = []
+    unanswered = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for batch, (results, error) in zip(batches, pool.map(run, batches)):
+            if error:
+                errors.append(error)
+                continue
+            for name, result in results.items():
+                result["checked"] = now
+                cache[name] = result
+            # Only real answers are cached; a file the API left out is asked about again next run.
+            unanswered.update((name, {"error": "not returned by API"}) for name in batch if name not in results)
+    found = {name: cache[name] for name in filenames if name in cache}
+    found.update(unanswered)
+    return found, len(stale), errors
+
+
+def check_destinations(destinations, filename_for, cache_path, api_url=COMMONS_API, workers=DEFAULT_WORKERS, ttl=DEFAULT_TTL, fetch=fetch_json):
+    refs, unchecked = image_refs(destinations, filename_for)
+    cache = load_cache(cache_path)
+    results, queried, errors = check_files(list(refs), cache, api_url=api_url, workers=workers, ttl=ttl, fetch=fetch)
+    save_cache(cache_path, cache)
+    failures = []
+    for name, uses in sorted(refs.items()):
+        result = results.get(name)
+        problem = problem_for(result) if result else "lookup failed"
+        if problem:
+            for slug, field, url in uses:
+                failures.append({"slug": slug, "field": field, "file": name, "url": url, "problem": problem})
+    return {
+        "files": len(refs),
+        "queried": queried,
+        "failures": failures,
+        "unchecked": [{"slug": slug, "field": field, "url": url} for slug, field, url in unchecked],
+        "errors": errors,
+    }
+
+
+def format_report(report):
+    lines = [f"Checked {report['files']} Commons files ({report['queried']} queried, {report['files'] - report['queried']} from cache)"]
+    for error in report["errors"]:
+        lines.append(f"  API error: {error}")
+    for item in report["unchecked"]:
+        lines.append(f"  SKIP {item['slug']} {item['field']}: not a Commons URL ({item['url']})")
+    for item in report["failures"]:
+        lines.append(f"  FAIL {item['slug']} {item['field']}: {item['problem']} ({item['file']})")
+    if not report["failures"] and not report["errors"]:
+        lines.append("All referenced images look good")
+    return "\n".join(lines)
@@ -0,0 +1,68 @@
+import json
+
+
+CHUNK_SIZE = 1 << 16
+WHITESPACE = " \t\r\n"
+
+
+def iter_json_array(path, chunk_size=CHUNK_SIZE):
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8-sig") as handle:
+        buf = ""
+        pos = 0
+        eof = False
+
+        def fill():
+            nonlocal buf, pos, eof
+            chunk = handle.read(chunk_size)
+            if not chunk:
+                eof = True
+            buf = buf[pos:] + chunk
+            pos = 0
+
+        def skip_space():
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in WHITESPACE:
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return
+                fill()
+
+        def expect(chars):
+            nonlocal pos
+            skip_space()
+            if pos >= len(buf) or buf[pos] not in chars:
+                found = buf[pos : pos + 20] if pos < len(buf) else "end of file"
+                raise ValueError(f"{path}: expected one of {chars!r} in JSON array, found {found!r}")
+            pos += 1
+            return buf[pos - 1]
+
+        expect("[")
+        skip_space()
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        while True:
+            skip_space()
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    fill()
+                    continue
+                after = end
+                while after < len(buf) and buf[after] in WHITESPACE:
+                    after += 1
+                if not eof and (after == len(buf) or buf[after] not in ",]"):
+                    fill()
+                    continue
+                break
+            pos = end
+            yield item
+            if expect(",]") == "]":
+                return
+            if pos > chunk_size:
+                buf = buf[pos:]
+                pos = 0
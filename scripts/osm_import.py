@@ -0,0 +1,546 @@
+import bz2
+import gzip
+import hashlib
+import json
+import math
+import os
+import pickle
+import struct
+import time
+import unicodedata
+import zlib
+from pathlib import Path
+
+import shared_cache
+
+
+FORMAT_VERSION = 2
+DEFAULT_RADIUS_KM = 5.0
+DEFAULT_WORKERS = os.cpu_count() or 1
+CELL_DEGREES = 0.05
+EARTH_RADIUS_KM = 6371.0088
+SOURCE_LABEL = "OpenStreetMap contributors"
+SOURCE_URL = "https://www.openstreetmap.org/copyright"
+NAME_KEYS = ("name", "name:en", "int_name")
+PLACE_RANKS = {"city": 0, "town": 1, "village": 2, "suburb": 3, "hamlet": 3, "locality": 4}
+OTHER_RANK = 5
+NOTABLE_KEYS = ("wikidata", "wikipedia")
+
+# Each layer lists tag conditions; a node joins the layer when every tag in
+# one condition matches ("*" accepts any value).
+DEFAULT_CATEGORIES = {
+    "poi": [
+        {"tourism": "attraction"},
+        {"tourism": "viewpoint"},
+        {"tourism": "zoo"},
+        {"tourism": "theme_park"},
+        {"historic": "castle"},
+        {"historic": "monument"},
+    ],
+    "parking": [{"amenity": "parking"}],
+    "restaurants": [{"amenity": "restaurant"}],
+    "family_restaurants": [
+        {"amenity": "restaurant", "kids_area": "yes"},
+        {"amenity": "cafe", "kids_area": "yes"},
+        {"amenity": "restaurant", "highchair": "yes"},
+        {"amenity": "ice_cream"},
+    ],
+    "indoor": [
+        {"tourism": "museum"},
+        {"tourism": "aquarium"},
+        {"amenity": "planetarium"},
+        {"leisure": "water_park"},
+        {"leisure": "indoor_play"},
+    ],
+    "playgrounds": [{"leisure": "playground"}],
+}
+LAYER_LIMITS = {"poi": 8, "parking": 6, "restaurants": 6, "family_restaurants": 5, "indoor": 6, "playgrounds": 10}
+UNNAMED_LABELS = {"parking": "Parking", "playgrounds": "Playground"}
+
+
+class UnsupportedExtract(ValueError):
+    pass
+
+
+def normalize_name(name):
+    decomposed = unicodedata.normalize("NFKD", name)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold().strip()
+
+
+def destination_name(dest):
+    """The place name to geocode: the title before the country, without asides."""
+    head = dest.get("title", "").split(",")[0]
+    return normalize_name(head.split("(")[0])
+
+
+class Selector:
+    """Decides which OSM nodes are worth keeping; picklable for worker processes.
+
+    Only the layer categories decide, never the destinations being imported,
+    so the node index it builds serves any set of destinations.
+    """
+
+    def __init__(self, categories):
+        self.categories = categories
+        self.keys = frozenset(key for conditions in categories.values() for condition in conditions for key in condition)
+        self.keys |= {"place"}
+
+    def wants(self, tags):
+        return not self.keys.isdisjoint(tags)
+
+    def layers(self, tags):
+        found = []
+        for layer, conditions in self.categories.items():
+            for condition in conditions:
+                if all(tags.get(key) == value or (value == "*" and key in tags) for key, value in condition.items()):
+                    found.append(layer)
+                    break
+        return found
+
+    def digest(self):
+        text = json.dumps(self.categories, sort_keys=True)
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def open_extract(path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    if path.suffix == ".bz2":
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_xml_nodes(path, selector):
+    """Stream (lat, lon, tags) for wanted nodes of an .osm XML extract."""
+    from xml.etree import ElementTree
+
+    with open_extract(path) as handle:
+        context = ElementTree.iterparse(handle, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event != "end":
+                continue
+            if elem.tag == "node":
+                tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+                if tags and selector.wants(tags):
+                    yield float(elem.get("lat")), float(elem.get("lon")), tags
+                root.clear()
+            elif elem.tag in ("way", "relation"):
+                root.clear()
+
+
+def read_varint(buf, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def proto_fields(buf):
+    """Yield (field number, value) for a protobuf message; length-delimited values are bytes."""
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        key, pos = read_varint(buf, pos)
+        wire = key & 7
+        if wire == 0:
+            value, pos = read_varint(buf, pos)
+        elif wire == 2:
+            length, pos = read_varint(buf, pos)
+            value = buf[pos : pos + length]
+            pos += length
+        elif wire == 1:
+            value = buf[pos : pos + 8]
+            pos += 8
+        elif wire == 5:
+            value = buf[pos : pos + 4]
+            pos += 4
+        else:
+            raise UnsupportedExtract(f"protobuf wire type {wire}")
+        yield key >> 3, value
+
+
+def packed_varints(buf, limit=None):
+    values = []
+    append = values.append
+    pos = 0
+    end = len(buf)
+    if limit is None:
+        limit = end
+    while pos < end and len(values) < limit:
+        byte = buf[pos]
+        pos += 1
+        if byte < 0x80:
+            append(byte)
+            continue
+        result = byte & 0x7F
+        shift = 7
+        while True:
+            byte = buf[pos]
+            pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        append(result)
+    return values
+
+
+def zigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def delta_decode(values):
+    out = []
+    total = 0
+    for value in values:
+        total += (value >> 1) ^ -(value & 1)
+        out.append(total)
+    return out
+
+
+def iter_pbf_blobs(path):
+    """Yield the raw Blob message of every OSMData block, reading one block at a time."""
+    with open(path, "rb") as handle:
+        while True:
+            size = handle.read(4)
+            if not size:
+                return
+            if len(size) < 4:
+                raise UnsupportedExtract("truncated blob header")
+            header = dict(proto_fields(handle.read(struct.unpack(">I", size)[0])))
+            blob = handle.read(header.get(3, 0))
+            if header.get(1) == b"OSMData":
+                yield blob
+
+
+def blob_data(blob):
+    fields = dict(proto_fields(blob))
+    if 1 in fields:
+        return fields[1]
+    if 3 in fields:
+        return zlib.decompress(fields[3])
+    raise UnsupportedExtract("only raw and zlib PBF blobs are supported")
+
+
+def decode_block(blob, selector):
+    """Decode one OSMData blob into (lat, lon, tags) for the nodes selector wants."""
+    block = blob_data(blob)
+    strings = []
+    groups = []
+    granularity = 100
+    lat_offset = lon_offset = 0
+    for number, value in proto_fields(block):
+        if number == 1:
+            strings = [item for field, item in proto_fields(value) if field == 1]
+        elif number == 2:
+            groups.append(value)
+        elif number == 17:
+            granularity = value
+        elif number == 19:
+            lat_offset = zigzag(value)
+        elif number == 20:
+            lon_offset = zigzag(value)
+    table = [item.decode("utf-8", "replace") for item in strings]
+    scale = granularity / 1e9
+    nodes = []
+    for group in groups:
+        for number, value in proto_fields(group):
+            if number == 2:
+                nodes.extend(dense_nodes(value, table, selector, scale, lat_offset / 1e9, lon_offset / 1e9))
+            elif number == 1:
+                node = plain_node(value, table, selector, scale, lat_offset / 1e9, lon_offset / 1e9)
+                if node:
+                    nodes.append(node)
+    return nodes
+
+
+def dense_nodes(message, table, selector, scale, lat_offset, lon_offset):
+    fields = {}
+    for number, value in proto_fields(message):
+        if number in (8, 9, 10):
+            fields[number] = value
+    # A zero byte in keys_vals can only be the varint 0 that ends a node's
+    # tags (continuation bytes have the high bit set), so splitting on it
+    # skips the untagged majority without decoding them.
+    wanted = []
+    for index, chunk in enumerate(fields.get(10, b"").split(b"\x00")):
+        if not chunk:
+            continue
+        pairs = packed_varints(chunk)
+        tags = {table[pairs[pos]]: table[pairs[pos + 1]] for pos in range(0, len(pairs) - 1, 2)}
+        if selector.wants(tags):
+            wanted.append((index, tags))
+    if not wanted:
+        return []
+    last = wanted[-1][0] + 1
+    lats = delta_decode(packed_varints(fields.get(8, b""), last))
+    lons = delta_decode(packed_varints(fields.get(9, b""), last))
+    return [(lat_offset + lats[idx] * scale, lon_offset + lons[idx] * scale, tags) for idx, tags in wanted]
+
+
+def plain_node(message, table, selector, scale, lat_offset, lon_offset):
+    fields = dict(proto_fields(message))
+    keys = packed_varints(fields.get(2, b""))
+    vals = packed_varints(fields.get(3, b""))
+    tags = {table[key]: table[val] for key, val in zip(keys, vals)}
+    if not tags or not selector.wants(tags):
+        return None
+    return lat_offset + zigzag(fields.get(8, 0)) * scale, lon_offset + zigzag(fields.get(9, 0)) * scale, tags
+
+
+def iter_pbf_nodes(path, selector, workers=DEFAULT_WORKERS):
+    """Stream wanted nodes of an .osm.pbf extract, decoding blocks in parallel.
+
+    At most a few blocks per worker are in flight, so memory stays flat no
+    matter how large the extract is.
+    """
+    if workers <= 1:
+        for blob in iter_pbf_blobs(path):
+            yield from decode_block(blob, selector)
+        return
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for blob in iter_pbf_blobs(path):
+            pending.append(pool.submit(decode_block, blob, selector))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def iter_osmium_nodes(path, selector):
+    import osmium
+
+    for node in osmium.FileProcessor(str(path), osmium.osm.NODE):
+        if not node.tags or not node.location.valid():
+            continue
+        tags = {tag.k: tag.v for tag in node.tags}
+        if selector.wants(tags):
+            yield node.location.lat, node.location.lon, tags
+
+
+def iter_nodes(path, selector, workers=DEFAULT_WORKERS):
+    """Wanted nodes of an extract; .pbf files use pyosmium when it is installed."""
+    name = path.name.lower()
+    if name.endswith(".pbf"):
+        try:
+            import osmium  # noqa: F401
+        except ImportError:
+            return iter_pbf_nodes(path, selector, workers)
+        return iter_osmium_nodes(path, selector)
+    if name.endswith((".osm", ".osm.gz", ".osm.bz2", ".xml")):
+        return iter_xml_nodes(path, selector)
+    raise UnsupportedExtract(f"unknown extract format: {path.name}")
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class NodeIndex:
+    """Grid of layer points plus candidate centres for every named node, by normalised name."""
+
+    def __init__(self, cell=CELL_DEGREES):
+        self.cell = cell
+        self.cells = {}
+        self.places = {}
+        self.nodes = 0
+
+    def key(self, lat, lon):
+        return int(math.floor(lat / self.cell)), int(math.floor(lon / self.cell))
+
+    def add(self, lat, lon, tags, selector):
+        self.nodes += 1
+        rank = PLACE_RANKS.get(tags.get("place"), OTHER_RANK)
+        population = int(tags["population"]) if tags.get("population", "").isdigit() else 0
+        for name in {normalize_name(tags[key]) for key in NAME_KEYS if key in tags}:
+            self.places.setdefault(name, []).append((rank, -population, round(lat, 6), round(lon, 6)))
+        layers = selector.layers(tags)
+        if not layers:
+            return
+        notable = any(key in tags for key in NOTABLE_KEYS)
+        point = (round(lat, 6), round(lon, 6), tags.get("name", ""), notable)
+        bucket = self.cells.setdefault(self.key(lat, lon), {})
+        for layer in layers:
+            bucket.setdefault(layer, []).append(point)
+
+    def centre(self, name):
+        candidates = self.places.get(name)
+        if not candidates:
+            return None
+        rank, _, lat, lon = min(candidates)
+        return {"lat": lat, "lon": lon}
+
+    def query(self, lat, lon, radius_km, limits=LAYER_LIMITS):
+        dlat = radius_km / 111.32
+        dlon = radius_km / max(1e-6, 111.32 * math.cos(math.radians(lat)))
+        (row0, col0), (row1, col1) = self.key(lat - dlat, lon - dlon), self.key(lat + dlat, lon + dlon)
+        found = {}
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                for layer, points in self.cells.get((row, col), {}).items():
+                    for plat, plon, name, notable in points:
+                        distance = haversine_km(lat, lon, plat, plon)
+                        if distance <= radius_km:
+                            found.setdefault(layer, []).append((not notable, not name, distance, name, plat, plon))
+        layers = {}
+        for layer, candidates in found.items():
+            candidates.sort()
+            picked = []
+            seen = set()
+            for _, _, _, name, plat, plon in candidates:
+                label = name or UNNAMED_LABELS.get(layer)
+                if not label or (name and name in seen):
+                    continue
+                seen.add(name)
+                picked.append({"name": label, "lat": round(plat, 4), "lon": round(plon, 4)})
+                if len(picked) >= limits.get(layer, 8):
+                    break
+            if picked:
+                layers[layer] = picked
+        return layers
+
+
+def extract_fingerprint(path):
+    stat = path.stat()
+    return f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def load_index(cache_path, fingerprint, selector):
+    try:
+        with open(cache_path, "rb") as handle:
+            stored = pickle.load(handle)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+        return None
+    if (
+        not isinstance(stored, dict)
+        or stored.get("version") != FORMAT_VERSION
+        or stored.get("extract") != fingerprint
+        or stored.get("selector") != selector.digest()
+    ):
+        return None
+    return stored["index"]
+
+
+def save_index(cache_path, fingerprint, selector, index):
+    meta = {"version": FORMAT_VERSION, "extract": fingerprint, "selector": selector.digest(), "index": index}
+    with shared_cache.atomic_file(cache_path) as handle:
+        pickle.dump(meta, handle, pickle.HIGHEST_PROTOCOL)
+
+
+def build_index(path, selector, workers=DEFAULT_WORKERS):
+    index = NodeIndex()
+    for lat, lon, tags in iter_nodes(path, selector, workers):
+        index.add(lat, lon, tags, selector)
+    return index
+
+
+def load_overlay(path):
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+def save_overlay(path, overlay):
+    text = json.dumps(overlay, indent=2, ensure_ascii=True, sort_keys=True) + "\n"
+    shared_cache.write_atomic(path, text.encode("utf-8"))
+
+
+def import_extract(
+    destinations,
+    extract,
+    overlay_path,
+    cache_dir,
+    radius_km=DEFAULT_RADIUS_KM,
+    categories=None,
+    workers=DEFAULT_WORKERS,
+):
+    """Fill overlay_path with map layers for destinations found in extract.
+
+    Each destination is stamped with the extract, radius, layer categories
+    and its own name, and skipped while those are unchanged. The parsed node
+    index is cached per extract and categories, so re-running on the same
+    file does not read it again, whichever destinations are imported.
+    """
+    started = time.perf_counter()
+    extract = Path(extract)
+    fingerprint = extract_fingerprint(extract)
+    overlay = load_overlay(overlay_path)
+    selector = Selector(categories or DEFAULT_CATEGORIES)
+    shared = {"extract": fingerprint, "radius_km": radius_km, "categories": selector.digest()}
+    report = {"unchanged": 0, "updated": [], "not_found": [], "parsed": False, "nodes": 0, "elapsed": 0.0}
+    pending = []
+    for dest in destinations:
+        stamp = dict(shared, name=destination_name(dest))
+        entry = overlay.get(dest["slug"])
+        if entry and all(entry.get(key) == value for key, value in stamp.items()):
+            report["unchanged"] += 1
+        else:
+            pending.append((dest, stamp))
+    if not pending:
+        report["elapsed"] = time.perf_counter() - started
+        return report
+
+    cache_path = Path(cache_dir) / f"osm-{hashlib.sha1(str(extract.resolve()).encode('utf-8')).hexdigest()[:12]}.pickle"
+    index = load_index(cache_path, fingerprint, selector)
+    if index is None:
+        index = build_index(extract, selector, workers)
+        save_index(cache_path, fingerprint, selector, index)
+        report["parsed"] = True
+    report["nodes"] = index.nodes
+
+    for dest, stamp in pending:
+        centre = (dest.get("map") or {}).get("center") or dest.get("center") or index.centre(stamp["name"])
+        layers = index.query(centre["lat"], centre["lon"], radius_km) if centre else {}
+        if not layers:
+            report["not_found"].append(dest["slug"])
+            continue
+        overlay[dest["slug"]] = dict(stamp, center=centre, layers=layers)
+        report["updated"].append(dest["slug"])
+    save_overlay(overlay_path, overlay)
+    report["elapsed"] = time.perf_counter() - started
+    return report
+
+
+def format_report(report):
+    parsed = "parsed extract" if report["parsed"] else "reused cached node index"
+    lines = [
+        f"OSM import: {len(report['updated'])} destinations updated, {report['unchanged']} unchanged,"
+        f" {len(report['not_found'])} not found ({parsed}, {report['nodes']} tagged nodes) in {report['elapsed']:.1f} s"
+    ]
+    if report["not_found"]:
+        lines.append("  not in extract: " + ", ".join(report["not_found"]))
+    return "\n".join(lines)
+
+
+def apply_overlay(dest, entry):
+    """A copy of dest with imported layers filled in where none are curated."""
+    if not entry:
+        return dest
+    map_cfg = dict(dest.get("map") or {})
+    if not map_cfg:
+        map_cfg = {
+            "center": entry["center"],
+            "legend": "Points from OpenStreetMap around the town centre. Toggle layers to focus the map.",
+            "source_label": SOURCE_LABEL,
+            "source_url": SOURCE_URL,
+        }
+    for layer, points in entry.get("layers", {}).items():
+        if not map_cfg.get(layer):
+            map_cfg[layer] = points
+    return dict(dest, map=map_cfg)
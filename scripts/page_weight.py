@@ -0,0 +1,150 @@
+import gzip
+import json
+import re
+from html.parser import HTMLParser
+
+
+CATEGORIES = ("markup", "css", "js", "data", "inline_images")
+REQUEST_KINDS = ("scripts", "stylesheets", "images", "tiles")
+TILE_TEMPLATE = re.compile(r"\{z\}/\{x\}/\{y\}")
+TILES_PER_VIEW = 12
+DATA_LITERAL = re.compile(r"=\s*(\[[^\n]*\]|\{[^\n]*\});")
+DEFAULT_BUDGETS = {
+    "destination-map": {"bytes": 50000, "gzip": 12000, "requests": 30},
+    "destination": {"bytes": 24000, "gzip": 6500, "requests": 8},
+    "list": {"bytes": 64000, "gzip": 14000, "requests": 60},
+    "hub": {"bytes": 20000, "gzip": 5000, "requests": 12},
+}
+
+
+class PageParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.bytes = dict.fromkeys(CATEGORIES, 0)
+        self.requests = dict.fromkeys(REQUEST_KINDS, 0)
+        self.deferred_images = 0
+        self.block = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        for value in attrs.values():
+            if value and value.startswith("data:image/"):
+                self.bytes["inline_images"] += len(value.encode("utf-8"))
+        if tag == "style":
+            self.block = "css"
+        elif tag == "script":
+            if attrs.get("src"):
+                self.requests["scripts"] += 1
+            kind = attrs.get("type") or ""
+            self.block = "data" if kind.endswith("json") or kind == "speculationrules" else "js"
+        elif tag == "link" and "stylesheet" in (attrs.get("rel") or "").split():
+            self.requests["stylesheets"] += 1
+        elif tag == "img":
+            if not (attrs.get("src") or "data:").startswith("data:"):
+                self.requests["images"] += 1
+            elif attrs.get("data-src"):
+                self.deferred_images += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in ("style", "script"):
+            self.block = None
+
+    def handle_endtag(self, tag):
+        if tag in ("style", "script"):
+            self.block = None
+
+    def handle_data(self, data):
+        if self.block == "css":
+            self.bytes["css"] += len(data.encode("utf-8"))
+        elif self.block == "data":
+            self.bytes["data"] += len(data.encode("utf-8"))
+        elif self.block == "js":
+            size = len(data.encode("utf-8"))
+            literals = sum(len(match.group(1).encode("utf-8")) for match in DATA_LITERAL.finditer(data))
+            self.bytes["data"] += literals
+            self.bytes["js"] += size - literals
+            self.requests["tiles"] += TILES_PER_VIEW * len(TILE_TEMPLATE.findall(data))
+
+
+def analyze_page(html):
+    parser = PageParser()
+    parser.feed(html)
+    parser.close()
+    raw = html.encode("utf-8")
+    breakdown = dict(parser.bytes)
+    breakdown["markup"] = len(raw) - sum(breakdown[name] for name in CATEGORIES if name != "markup")
+    return {
+        "bytes": len(raw),
+        "gzip": len(gzip.compress(raw, 6)),
+        "breakdown": breakdown,
+        "requests": dict(parser.requests, total=sum(parser.requests.values())),
+        "deferred_images": parser.deferred_images,
+    }
+
+
+def load_budgets(path=None):
+    budgets = {kind: dict(limits) for kind, limits in DEFAULT_BUDGETS.items()}
+    if path is not None:
+        for kind, limits in json.loads(path.read_text(encoding="utf-8")).items():
+            budgets.setdefault(kind, {}).update(limits)
+    return budgets
+
+
+def check_budget(name, page_type, result, budgets):
+    limits = budgets.get(page_type) or {}
+    measured = {"bytes": result["bytes"], "gzip": result["gzip"], "requests": result["requests"]["total"]}
+    return [
+        {"page": name, "type": page_type, "metric": metric, "value": measured[metric], "budget": limit}
+        for metric, limit in sorted(limits.items())
+        if metric in measured and measured[metric] > limit
+    ]
+
+
+class WeightReport:
+    def __init__(self, budgets=None):
+        self.budgets = budgets if budgets is not None else load_budgets()
+        self.pages = {}
+        self.violations = []
+
+    def add(self, name, page_type, html):
+        result = analyze_page(html)
+        result["type"] = page_type
+        self.pages[name] = result
+        self.violations.extend(check_budget(name, page_type, result, self.budgets))
+        return result
+
+    def summary(self):
+        out = {}
+        for result in self.pages.values():
+            entry = out.setdefault(result["type"], {"pages": 0, "bytes": [], "gzip": [], "requests": [], "deferred_images": []})
+            entry["pages"] += 1
+            entry["bytes"].append(result["bytes"])
+            entry["gzip"].append(result["gzip"])
+            entry["requests"].append(result["requests"]["total"])
+            entry["deferred_images"].append(result.get("deferred_images", 0))
+        for entry in out.values():
+            for metric in ("bytes", "gzip", "requests", "deferred_images"):
+                values = entry[metric]
+                entry[metric] = {"min": min(values), "max": max(values), "mean": round(sum(values) / len(values))}
+        return dict(sorted(out.items()))
+
+    def as_dict(self):
+        return {"budgets": self.budgets, "summary": self.summary(), "violations": self.violations, "pages": self.pages}
+
+    def save(self, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.as_dict(), indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+    def format_summary(self):
+        lines = []
+        for page_type, entry in self.summary().items():
+            lines.append(
+                f"  {page_type}: {entry['pages']} pages, {entry['bytes']['mean'] / 1024:.1f} KB mean"
+                f" ({entry['gzip']['mean'] / 1024:.1f} KB gzip), max {entry['bytes']['max'] / 1024:.1f} KB,"
+                f" up to {entry['requests']['max']} requests"
+                + (f" (+{entry['deferred_images']['max']} deferred images)" if entry["deferred_images"]["max"] else "")
+            )
+        for item in self.violations:
+            lines.append(f"  OVER BUDGET {item['page']}: {item['metric']} {item['value']} > {item['budget']} ({item['type']})")
+        return "\n".join(["Page weight:"] + lines)
@@ -0,0 +1,482 @@
+import base64
+import hashlib
+import json
+import struct
+import zlib
+
+import shared_cache
+
+
+FORMAT_VERSION = 1
+THUMBNAIL_NAMESPACE = "thumbnails"
+GRID_WIDTH = 8
+THUMB_WIDTH = 120
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_BASELINE = (0xC0, 0xC1)
+JPEG_UNSUPPORTED = (0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF)
+
+
+class UnsupportedImage(ValueError):
+    pass
+
+
+class BitReader:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self.bits = 0
+        self.count = 0
+
+    def bit(self):
+        if not self.count:
+            if self.pos >= len(self.data):
+                raise UnsupportedImage("truncated scan")
+            self.bits = self.data[self.pos]
+            self.pos += 1
+            self.count = 8
+        self.count -= 1
+        return (self.bits >> self.count) & 1
+
+    def receive(self, length):
+        value = 0
+        for _ in range(length):
+            value = (value << 1) | self.bit()
+        return value
+
+    def decode(self, table):
+        code = 0
+        for length in range(1, 17):
+            code = (code << 1) | self.bit()
+            symbol = table.get((length, code))
+            if symbol is not None:
+                return symbol
+        raise UnsupportedImage("bad Huffman code")
+
+
+def extend(value, length):
+    return value - (1 << length) + 1 if length and value < (1 << (length - 1)) else value
+
+
+def huffman_table(counts, symbols):
+    table = {}
+    code = 0
+    index = 0
+    for length, count in enumerate(counts, start=1):
+        for _ in range(count):
+            table[(length, code)] = symbols[index]
+            code += 1
+            index += 1
+        code <<= 1
+    return table
+
+
+def scan_intervals(data, start):
+    """Split entropy-coded data into restart intervals with byte stuffing removed."""
+    intervals = []
+    current = bytearray()
+    pos = start
+    length = len(data)
+    while pos < length:
+        byte = data[pos]
+        if byte != 0xFF:
+            current.append(byte)
+            pos += 1
+            continue
+        marker = data[pos + 1] if pos + 1 < length else 0xD9
+        if marker == 0x00:
+            current.append(0xFF)
+            pos += 2
+        elif 0xD0 <= marker <= 0xD7:
+            intervals.append(bytes(current))
+            current = bytearray()
+            pos += 2
+        elif marker == 0xFF:
+            pos += 1
+        else:
+            break
+    intervals.append(bytes(current))
+    return intervals
+
+
+def jpeg_blocks(data):
+    """Average colour of every 8x8 luma block of a baseline JPEG.
+
+    Only the DC coefficient of each block is kept, which is the block mean, so
+    no inverse DCT is needed. Returns (columns, rows, pixels) with pixels as
+    (r, g, b) tuples in row order.
+    """
+    if data[:2] != b"\xff\xd8":
+        raise UnsupportedImage("not a JPEG")
+    quant = {}
+    dc_tables = {}
+    ac_tables = {}
+    components = []
+    restart = 0
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            raise UnsupportedImage("bad marker")
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        size = struct.unpack(">H", data[pos + 2 : pos + 4])[0]
+        segment = data[pos + 4 : pos + 2 + size]
+        pos += 2 + size
+        if marker == 0xDB:
+            offset = 0
+            while offset < len(segment):
+                precision, table_id = segment[offset] >> 4, segment[offset] & 15
+                quant[table_id] = segment[offset + 1] if precision == 0 else struct.unpack(">H", segment[offset + 1 : offset + 3])[0]
+                offset += 65 if precision == 0 else 129
+        elif marker == 0xC4:
+            offset = 0
+            while offset < len(segment):
+                table_class, table_id = segment[offset] >> 4, segment[offset] & 15
+                counts = list(segment[offset + 1 : offset + 17])
+                symbols = list(segment[offset + 17 : offset + 17 + sum(counts)])
+                (ac_tables if table_class else dc_tables)[table_id] = huffman_table(counts, symbols)
+                offset += 17 + sum(counts)
+        elif marker in JPEG_BASELINE:
+            height, width, count = struct.unpack(">HHB", segment[1:6])
+            for idx in range(count):
+                comp_id, sampling, table_id = segment[6 + idx * 3 : 9 + idx * 3]
+                components.append({"id": comp_id, "h": sampling >> 4, "v": sampling & 15, "q": table_id})
+            if count not in (1, 3):
+                raise UnsupportedImage(f"{count} colour components")
+        elif marker in JPEG_UNSUPPORTED:
+            raise UnsupportedImage("progressive or arithmetic JPEG")
+        elif marker == 0xDD:
+            restart = struct.unpack(">H", segment[:2])[0]
+        elif marker == 0xDA:
+            if not components:
+                raise UnsupportedImage("scan before frame header")
+            by_id = {comp["id"]: comp for comp in components}
+            for idx in range(segment[0]):
+                comp_id, tables = segment[1 + idx * 2 : 3 + idx * 2]
+                by_id[comp_id]["dc"] = dc_tables[tables >> 4]
+                by_id[comp_id]["ac"] = ac_tables[tables & 15]
+            return decode_dc(width, height, components, quant, restart, scan_intervals(data, pos))
+    raise UnsupportedImage("no scan found")
+
+
+def decode_dc(width, height, components, quant, restart, intervals):
+    h_max = max(comp["h"] for comp in components)
+    v_max = max(comp["v"] for comp in components)
+    mcu_cols = -(-width // (8 * h_max))
+    mcu_rows = -(-height // (8 * v_max))
+    for comp in components:
+        comp["cols"] = mcu_cols * comp["h"]
+        comp["means"] = [0.0] * (comp["cols"] * mcu_rows * comp["v"])
+    total = mcu_cols * mcu_rows
+    mcu = 0
+    for interval in intervals:
+        reader = BitReader(interval)
+        for comp in components:
+            comp["pred"] = 0
+        limit = min(total, mcu + restart) if restart else total
+        while mcu < limit:
+            row, col = divmod(mcu, mcu_cols)
+            for comp in components:
+                for by in range(comp["v"]):
+                    for bx in range(comp["h"]):
+                        length = reader.decode(comp["dc"])
+                        comp["pred"] += extend(reader.receive(length), length)
+                        skip_ac(reader, comp["ac"])
+                        index = (row * comp["v"] + by) * comp["cols"] + col * comp["h"] + bx
+                        comp["means"][index] = comp["pred"] * quant[comp["q"]] / 8 + 128
+            mcu += 1
+        if mcu >= total:
+            break
+    cols = -(-width // (8 * h_max // components[0]["h"]))
+    rows = -(-height // (8 * v_max // components[0]["v"]))
+    pixels = []
+    for y in range(rows):
+        for x in range(cols):
+            values = []
+            for comp in components:
+                cx = x * comp["h"] // components[0]["h"]
+                cy = y * comp["v"] // components[0]["v"]
+                values.append(comp["means"][cy * comp["cols"] + cx])
+            pixels.append(ycc_to_rgb(*values) if len(values) == 3 else (clamp(values[0]),) * 3)
+    return cols, rows, pixels
+
+
+def skip_ac(reader, table):
+    k = 1
+    while k < 64:
+        symbol = reader.decode(table)
+        run, length = symbol >> 4, symbol & 15
+        if not length:
+            if run != 15:
+                return
+            k += 16
+            continue
+        reader.receive(length)
+        k += run + 1
+
+
+def clamp(value):
+    return max(0, min(255, int(round(value))))
+
+
+def ycc_to_rgb(y, cb, cr):
+    return (
+        clamp(y + 1.402 * (cr - 128)),
+        clamp(y - 0.344136 * (cb - 128) - 0.714136 * (cr - 128)),
+        clamp(y + 1.772 * (cb - 128)),
+    )
+
+
+def png_pixels(data):
+    """Decode an 8-bit, non-interlaced PNG into (width, height, pixels)."""
+    if not data.startswith(PNG_SIGNATURE):
+        raise UnsupportedImage("not a PNG")
+    pos = len(PNG_SIGNATURE)
+    idat = bytearray()
+    palette = None
+    header = None
+    while pos + 8 <= len(data):
+        length, kind = struct.unpack(">I4s", data[pos : pos + 8])
+        chunk = data[pos + 8 : pos + 8 + length]
+        pos += 12 + length
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", chunk)
+        elif kind == b"PLTE":
+            palette = [tuple(chunk[idx : idx + 3]) for idx in range(0, len(chunk), 3)]
+        elif kind == b"IDAT":
+            idat += chunk
+        elif kind == b"IEND":
+            break
+    if header is None:
+        raise UnsupportedImage("missing IHDR")
+    width, height, depth, colour, _, _, interlace = header
+    channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}.get(colour)
+    if depth != 8 or interlace or channels is None or (colour == 3 and not palette):
+        raise UnsupportedImage(f"PNG depth {depth}, colour type {colour}, interlace {interlace}")
+    raw = zlib.decompress(bytes(idat))
+    stride = width * channels
+    previous = bytearray(stride)
+    pixels = []
+    for row in range(height):
+        start = row * (stride + 1)
+        line = unfilter(raw[start], bytearray(raw[start + 1 : start + 1 + stride]), previous, channels)
+        for offset in range(0, stride, channels):
+            if colour == 3:
+                pixels.append(palette[line[offset]])
+            elif channels <= 2:
+                pixels.append((line[offset],) * 3)
+            else:
+                pixels.append(tuple(line[offset : offset + 3]))
+        previous = line
+    return width, height, pixels
+
+
+def unfilter(kind, line, previous, bpp):
+    for idx in range(len(line)):
+        left = line[idx - bpp] if idx >= bpp else 0
+        up = previous[idx]
+        if kind == 1:
+            line[idx] = (line[idx] + left) & 0xFF
+        elif kind == 2:
+            line[idx] = (line[idx] + up) & 0xFF
+        elif kind == 3:
+            line[idx] = (line[idx] + ((left + up) >> 1)) & 0xFF
+        elif kind == 4:
+            corner = previous[idx - bpp] if idx >= bpp else 0
+            estimate = left + up - corner
+            pa, pb, pc = abs(estimate - left), abs(estimate - up), abs(estimate - corner)
+            line[idx] = (line[idx] + (left if pa <= pb and pa <= pc else up if pb <= pc else corner)) & 0xFF
+    return line
+
+
+def pillow_pixels(data):
+    try:
+        from PIL import Image
+    except ImportError:
+        raise UnsupportedImage("format needs Pillow, which is not installed") from None
+    import io
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+            small = image.convert("RGB")
+    except (OSError, ValueError) as exc:
+        raise UnsupportedImage(str(exc)) from None
+    small.thumbnail((GRID_WIDTH * 8, GRID_WIDTH * 8))
+    return width, height, small.size[0], small.size[1], list(small.getdata())
+
+
+def image_pixels(data):
+    """Return (width, height, columns, rows, pixels) for a low-resolution view of data."""
+    if data.startswith(PNG_SIGNATURE):
+        width, height, pixels = png_pixels(data)
+        return width, height, width, height, pixels
+    if data[:2] == b"\xff\xd8":
+        try:
+            width, height = jpeg_size(data)
+            cols, rows, pixels = jpeg_blocks(data)
+            return width, height, cols, rows, pixels
+        except (UnsupportedImage, KeyError, IndexError, struct.error):
+            pass
+    return pillow_pixels(data)
+
+
+def jpeg_size(data):
+    pos = 2
+    while pos + 9 <= len(data):
+        marker = data[pos + 1]
+        size = struct.unpack(">H", data[pos + 2 : pos + 4])[0]
+        if marker in JPEG_BASELINE or marker in JPEG_UNSUPPORTED:
+            height, width = struct.unpack(">HH", data[pos + 5 : pos + 9])
+            return width, height
+        pos += 2 + size
+    raise UnsupportedImage("no frame header")
+
+
+def downsample(cols, rows, pixels, grid_width=GRID_WIDTH):
+    out_cols = max(1, min(grid_width, cols))
+    out_rows = max(1, round(rows * out_cols / cols))
+    grid = []
+    for gy in range(out_rows):
+        y0, y1 = gy * rows // out_rows, max(gy * rows // out_rows + 1, (gy + 1) * rows // out_rows)
+        for gx in range(out_cols):
+            x0, x1 = gx * cols // out_cols, max(gx * cols // out_cols + 1, (gx + 1) * cols // out_cols)
+            cell = [pixels[y * cols + x] for y in range(y0, y1) for x in range(x0, x1)]
+            grid.append(tuple(sum(channel) // len(cell) for channel in zip(*cell)))
+    return out_cols, out_rows, grid
+
+
+def dominant_colour(pixels):
+    buckets = {}
+    for pixel in pixels:
+        key = (pixel[0] >> 5, pixel[1] >> 5, pixel[2] >> 5)
+        buckets.setdefault(key, []).append(pixel)
+    members = max(buckets.values(), key=len)
+    return "#" + "".join(f"{sum(channel) // len(members):02x}" for channel in zip(*members))
+
+
+def png_data_uri(cols, rows, pixels):
+    raw = b"".join(b"\x00" + bytes(value for pixel in pixels[row * cols : (row + 1) * cols] for value in pixel) for row in range(rows))
+
+    def chunk(kind, body):
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+    png = PNG_SIGNATURE + chunk(b"IHDR", struct.pack(">IIBBBBB", cols, rows, 8, 2, 0, 0, 0))
+    png += chunk(b"IDAT", zlib.compress(raw, 9)) + chunk(b"IEND", b"")
+    return "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+
+def make_placeholder(data):
+    width, height, cols, rows, pixels = image_pixels(data)
+    grid_cols, grid_rows, grid = downsample(cols, rows, pixels)
+    return {"width": width, "height": height, "color": dominant_colour(pixels), "uri": png_data_uri(grid_cols, grid_rows, grid)}
+
+
+def commons_thumb_url(filename, width=THUMB_WIDTH):
+    """Direct upload.wikimedia.org thumbnail URL for a Commons file name."""
+    from urllib.parse import quote
+
+    name = filename.replace(" ", "_")
+    digest = hashlib.md5(name.encode("utf-8")).hexdigest()
+    quoted = quote(name)
+    return f"https://upload.wikimedia.org/wikipedia/commons/thumb/{digest[0]}/{digest[:2]}/{quoted}/{width}px-{quoted}"
+
+
+class PlaceholderCache:
+    """Placeholders keyed by image URL, computed once from a local image cache.
+
+    Source images live in image_dir under the SHA-1 of their URL; fetch, when
+    given, downloads a missing one. With a shared cache (see shared_cache),
+    downloads are kept there instead, so concurrent builds fetch each image
+    once. An image is only decoded when its URL has no stored entry, so
+    repeat builds never reprocess images; entries for images that cannot be
+    decoded are kept too.
+    """
+
+    def __init__(self, path, image_dir, fetch=None, shared=None):
+        self.path = path
+        self.image_dir = image_dir
+        self.fetch = fetch
+        self.shared = shared
+        self.entries = {}
+        self.dirty = False
+        self.computed = 0
+        self.reused = 0
+        self.fetched = 0
+        self.missing = set()
+
+    def load(self):
+        try:
+            stored = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return 0
+        if stored.get("version") == FORMAT_VERSION:
+            self.entries = stored.get("entries", {})
+        return len(self.entries)
+
+    def save(self):
+        """Write the entries, merged with those another build saved meanwhile."""
+        if not self.dirty:
+            return
+        with shared_cache.FileLock(self.path.with_name(self.path.name + ".lock")):
+            entries = dict(self.entries)
+            self.load()
+            self.entries.update(entries)
+            text = json.dumps({"version": FORMAT_VERSION, "entries": self.entries}, indent=2, sort_keys=True)
+            shared_cache.write_atomic(self.path, text.encode("utf-8"))
+        self.dirty = False
+
+    def image_path(self, url):
+        return self.image_dir / hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def get(self, url):
+        if not url:
+            return None
+        entry = self.entries.get(url)
+        if entry is not None:
+            self.reused += 1
+            return entry if "uri" in entry else None
+        data = self.local_image(url)
+        if data is None:
+            self.missing.add(url)
+            return None
+        try:
+            entry = make_placeholder(data)
+        except (UnsupportedImage, zlib.error, struct.error, IndexError, KeyError) as exc:
+            entry = {"error": str(exc) or type(exc).__name__}
+        self.entries[url] = entry
+        self.dirty = True
+        self.computed += 1
+        return entry if "uri" in entry else None
+
+    def local_image(self, url):
+        path = self.image_path(url)
+        try:
+            return path.read_bytes()
+        except OSError:
+            pass
+        if self.shared is not None:
+            return self.shared.get_or_compute(THUMBNAIL_NAMESPACE, url, lambda: self.download(url))
+        data = self.download(url)
+        if data:
+            shared_cache.write_atomic(path, data)
+        return data
+
+    def download(self, url):
+        if self.fetch is None:
+            return None
+        try:
+            data = self.fetch(url)
+        except Exception:
+            return None
+        if not data:
+            return None
+        self.fetched += 1
+        return data
+
+    def format_stats(self):
+        return (
+            f"Placeholders: {self.computed} computed ({self.fetched} thumbnails fetched), {self.reused} reused,"
+            f" {len(self.missing)} images not cached locally"
+        )
@@ -0,0 +1,139 @@
+import hashlib
+import mimetypes
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+FINGERPRINT = re.compile(r"\.([0-9a-f]{10})\.[a-z]+$")
+
+
+class RenderCache:
+    """Rendered responses by input hash, evicting the least recently used."""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, render):
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                value = self.entries[key] = self.entries.pop(key)
+                return value
+        value = render()
+        with self.lock:
+            self.misses += 1
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            if len(self.entries) >= self.max_entries:
+                self.entries.pop(next(iter(self.entries)))
+            self.entries[key] = value
+
+
+def input_hash(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8") if isinstance(part, str) else part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def strong_etag(body):
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def content_type(path):
+    guessed = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if guessed.startswith("text/") or guessed in ("application/json", "application/javascript"):
+        guessed += "; charset=utf-8"
+    return guessed
+
+
+def content_addressed(path, body):
+    """Whether path carries the generator's fingerprint (sha1 prefix) of body, so it can never change."""
+    match = FINGERPRINT.search(path)
+    return match is not None and hashlib.sha1(body).hexdigest()[:10] == match.group(1)
+
+
+def cache_control(path, body):
+    return IMMUTABLE if content_addressed(path, body) else REVALIDATE
+
+
+def response(path, body):
+    return {"body": body, "etag": strong_etag(body), "type": content_type(path), "cache": cache_control(path, body)}
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in [tag.strip() for tag in header.split(",")]
+
+
+def make_handler(resolve):
+    class PreviewHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self.respond(send_body=True)
+
+        def do_HEAD(self):
+            self.respond(send_body=False)
+
+        def respond(self, send_body):
+            path = unquote(urlparse(self.path).path)
+            try:
+                result = resolve(path)
+            except Exception as exc:
+                self.send_error(500, str(exc))
+                return
+            if result is None:
+                self.send_error(404)
+                return
+            if etag_matches(self.headers.get("If-None-Match"), result["etag"]):
+                self.send_response(304)
+                self.send_header("ETag", result["etag"])
+                self.send_header("Cache-Control", result["cache"])
+                self.end_headers()
+                self.log_message('"%s %s" 304 0', self.command, path)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", result["type"])
+            self.send_header("Content-Length", str(len(result["body"])))
+            self.send_header("ETag", result["etag"])
+            self.send_header("Cache-Control", result["cache"])
+            self.end_headers()
+            if send_body:
+                self.wfile.write(result["body"])
+            self.log_message('"%s %s" 200 %d', self.command, path, len(result["body"]))
+
+        def log_request(self, code="-", size="-"):
+            pass
+
+        def log_message(self, fmt, *args):
+            print(f"{self.address_string()} {fmt % args}")
+
+    return PreviewHandler
+
+
+def serve(resolve, host="127.0.0.1", port=8000):
+    server = ThreadingHTTPServer((host, port), make_handler(resolve))
+    print(f"Serving preview on http://{host}:{server.server_address[1]}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopped preview server")
+    finally:
+        server.server_close()
@@ -0,0 +1,221 @@
+import hashlib
+import heapq
+import json
+import math
+import pickle
+import re
+
+import shared_cache
+
+
+FORMAT_VERSION = 1
+TEXT_FIELDS = ("summary", "description", "highlights", "best_for", "recommended_stops")
+RELATED_LIMIT = 4
+# Each term keeps only its heaviest destinations, and each destination is
+# matched on its heaviest terms until MAX_SCORED postings have been read, so
+# the work per destination stays bounded however large the site grows.
+MAX_POSTINGS = 32
+MAX_SCORED = 256
+MIN_SCORE = 0.05
+WORD = re.compile(r"[^\W\d_]+")
+STOPWORDS = frozenset(
+    """
+    about after all also and any are around back best but can day days easy for from full good great has have
+    into its just kid kids more most near not off one only our out over plus some than that the their them then
+    there these this those too two very was way well were what when where which while who with you your
+    """.split()
+)
+
+
+def terms(text):
+    """Lower-case word terms of three or more letters, with plural s dropped."""
+    found = []
+    for word in WORD.findall(text.lower()):
+        if len(word) < 3 or word in STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        found.append(word)
+    return found
+
+
+def field_text(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return " ".join(field_text(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return " ".join(field_text(item) for item in value)
+    return ""
+
+
+def record_text(dest):
+    return "\n".join(field_text(dest.get(field)) for field in TEXT_FIELDS)
+
+
+def text_digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def term_counts(text):
+    counts = {}
+    for term in terms(text):
+        counts[term] = counts.get(term, 0) + 1
+    return counts
+
+
+class TermCache:
+    """Term counts per destination text, kept between builds in a pickle.
+
+    Entries are keyed by the SHA-1 of the text fields, so an edited record
+    is re-tokenized and the rest are reused. The last related lists are kept
+    with a digest of every input, so an unchanged site skips scoring too.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.counts = {}
+        self.related = None
+        self.corpus = None
+        self.reused = 0
+        self.tokenized = 0
+        self.dirty = False
+
+    def load(self):
+        if self.path is None:
+            return self
+        try:
+            with open(self.path, "rb") as handle:
+                stored = pickle.load(handle)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+            return self
+        if isinstance(stored, dict) and stored.get("version") == FORMAT_VERSION:
+            self.counts = stored["counts"]
+            self.corpus = stored["corpus"]
+            self.related = stored["related"]
+        return self
+
+    def term_counts(self, text):
+        digest = text_digest(text)
+        counts = self.counts.get(digest)
+        if counts is None:
+            counts = self.counts[digest] = term_counts(text)
+            self.tokenized += 1
+            self.dirty = True
+        else:
+            self.reused += 1
+        return digest, counts
+
+    def save(self, keep):
+        """Write the cache, dropping entries for texts no longer in the data."""
+        if self.path is None or not (self.dirty or set(self.counts) - keep):
+            return
+        stored = {
+            "version": FORMAT_VERSION,
+            "counts": {digest: counts for digest, counts in self.counts.items() if digest in keep},
+            "corpus": self.corpus,
+            "related": self.related,
+        }
+        shared_cache.write_atomic(self.path, pickle.dumps(stored, pickle.HIGHEST_PROTOCOL))
+
+
+def tfidf_vectors(documents):
+    """Unit-length {term: weight} vectors with sublinear term frequency and smoothed IDF."""
+    frequency = {}
+    for counts in documents:
+        for term in counts:
+            frequency[term] = frequency.get(term, 0) + 1
+    total = len(documents)
+    idf = {term: math.log((1 + total) / (1 + df)) + 1 for term, df in frequency.items()}
+    vectors = []
+    for counts in documents:
+        vector = {term: (1 + math.log(count)) * idf[term] for term, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        vectors.append({term: weight / norm for term, weight in vector.items()})
+    return vectors
+
+
+def inverted_index(vectors, max_postings=MAX_POSTINGS):
+    """term -> [(index, weight), ...] for at most the max_postings heaviest documents."""
+    postings = {}
+    for index, vector in enumerate(vectors):
+        for term, weight in vector.items():
+            postings.setdefault(term, []).append((index, weight))
+    for term, entries in postings.items():
+        if len(entries) > max_postings:
+            postings[term] = heapq.nlargest(max_postings, entries, key=lambda entry: entry[1])
+    return postings
+
+
+def top_related(vectors, limit=RELATED_LIMIT, max_postings=MAX_POSTINGS, max_scored=MAX_SCORED, min_score=MIN_SCORE):
+    """The limit most similar other documents for each vector, as index lists.
+
+    Scores are the sparse dot product of a document's heaviest terms with the
+    inverted index, so only documents sharing a distinctive term are ever
+    scored.
+    """
+    postings = inverted_index(vectors, max_postings)
+    related = []
+    for index, vector in enumerate(vectors):
+        scores = {}
+        get = scores.get
+        budget = max_scored
+        for term, weight in sorted(vector.items(), key=lambda item: (-item[1], item[0])):
+            entries = postings[term]
+            for other, other_weight in entries:
+                scores[other] = get(other, 0.0) + weight * other_weight
+            budget -= len(entries)
+            if budget <= 0:
+                break
+        scores.pop(index, None)
+        best = heapq.nlargest(limit, scores, key=scores.__getitem__)
+        related.append([other for other in best if scores[other] >= min_score])
+    return related
+
+
+def related_entry(dest, cache):
+    """(slug, title, summary, text digest) for dest, with its term counts added to cache."""
+    digest, _ = cache.term_counts(record_text(dest))
+    return (dest["slug"], dest.get("title", ""), dest.get("summary", ""), digest)
+
+
+def related_destinations(records, cache=None, limit=RELATED_LIMIT):
+    """{slug: [{"slug", "title", "summary"}, ...]} for every destination with related ones."""
+    cache = cache or TermCache()
+    return related_entries([related_entry(dest, cache) for dest in records], cache, limit)
+
+
+def related_entries(entries, cache, limit=RELATED_LIMIT, fill=None):
+    """related_destinations from compact related_entry tuples.
+
+    Term counts are read from cache by digest. Scoring only runs when the
+    corpus changed; any counts it lacks are taken from the records fill
+    yields, so callers need not keep the text of every destination.
+    """
+    digests = [entry[3] for entry in entries]
+    corpus = text_digest(json.dumps([FORMAT_VERSION, limit, [list(entry[:3]) for entry in entries], digests]))
+    if cache.related is None or cache.corpus != corpus:
+        missing = set(digests) - set(cache.counts)
+        if missing and fill is not None:
+            for dest in fill():
+                text = record_text(dest)
+                if text_digest(text) in missing:
+                    cache.term_counts(text)
+        indices = top_related(tfidf_vectors([cache.counts[digest] for digest in digests]), limit)
+        cache.related = {
+            entry[0]: [{"slug": entries[other][0], "title": entries[other][1], "summary": entries[other][2]} for other in others]
+            for entry, others in zip(entries, indices)
+            if others
+        }
+        cache.corpus = corpus
+        cache.dirty = True
+    cache.save(set(digests))
+    return cache.related
+
+
+def format_stats(stats):
+    scored = "scored" if stats["computed"] else "reused cached"
+    return (
+        f"Related destinations: {stats['destinations']} destinations, {stats['linked']} with links"
+        f" ({scored} matches, {stats['reused']} cached term vectors) in {stats['elapsed'] * 1000:.0f} ms"
+    )
@@ -0,0 +1,72 @@
+import json
+import re
+
+
+MAX_PRECONNECT = 4
+MAX_PREFETCH = 2
+# Commons file links redirect to the upload host, which serves the bytes.
+REDIRECT_HOSTS = {"https://commons.wikimedia.org": "https://upload.wikimedia.org"}
+# Leaflet's default subdomains for {s} in a tile URL template.
+TILE_SUBDOMAINS = ("a", "b", "c")
+RESOURCE_TAG = re.compile(r"<(?:img|script|link)\b[^>]*>")
+RESOURCE_URL = re.compile(r'\s(?:src|data-src|href)="(https://[^"/]+)[^"]*"')
+STYLESHEET = re.compile(r'\srel="stylesheet"')
+TILE_LAYER = re.compile(r'tileLayer\("(https://[^"/]+)')
+BREADCRUMB = re.compile(r'<div class="breadcrumb"><a href="([^"]+)"')
+CARD_LINK = re.compile(r'<article class="card"[^>]*>\s*<a href="([^"#]+)"')
+HEAD_END = "</head>"
+SPECULATION_RULES = {"prefetch": [{"source": "document", "where": {"href_matches": "destinations/*"}, "eagerness": "moderate"}]}
+
+
+def used_origins(html):
+    """(origin, crossorigin) for each external host the page loads from, in document order."""
+    found = {}
+    for match in RESOURCE_TAG.finditer(html):
+        tag = match.group(0)
+        url = RESOURCE_URL.search(tag)
+        if not url or (tag.startswith("<link") and not STYLESHEET.search(tag)):
+            continue
+        origin = url.group(1)
+        cors = "crossorigin" in tag
+        found[origin] = found.get(origin, False) or cors
+        if origin in REDIRECT_HOSTS:
+            found.setdefault(REDIRECT_HOSTS[origin], False)
+    for match in TILE_LAYER.finditer(html):
+        for subdomain in TILE_SUBDOMAINS:
+            found.setdefault(match.group(1).replace("{s}", subdomain), False)
+    return list(found.items())
+
+
+def prefetch_targets(html):
+    """Pages a visitor is likely to open next: the breadcrumb target, or the top cards of a list."""
+    targets = []
+    breadcrumb = BREADCRUMB.search(html)
+    if breadcrumb:
+        targets.append(breadcrumb.group(1))
+    for match in CARD_LINK.finditer(html):
+        if len(targets) >= MAX_PREFETCH:
+            break
+        if match.group(1) not in targets:
+            targets.append(match.group(1))
+    return targets[:MAX_PREFETCH]
+
+
+def hints_html(html):
+    lines = []
+    for origin, cors in used_origins(html)[:MAX_PRECONNECT]:
+        lines.append(f'  <link rel="preconnect" href="{origin}"{" crossorigin" if cors else ""} />')
+    for href in prefetch_targets(html):
+        lines.append(f'  <link rel="prefetch" href="{href}" />')
+    if CARD_LINK.search(html):
+        # Browsers with speculation rules also fetch a card's page once the pointer rests on it.
+        rules = json.dumps(SPECULATION_RULES, separators=(",", ":"))
+        lines.append(f'  <script type="speculationrules">{rules}</script>')
+    return "\n".join(lines)
+
+
+def add_hints(html):
+    """The page with preconnect, prefetch and speculation rule hints added to its head."""
+    hints = hints_html(html)
+    if not hints or HEAD_END not in html:
+        return html
+    return html.replace(HEAD_END, hints + "\n" + HEAD_END, 1)
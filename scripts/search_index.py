@@ -0,0 +1,321 @@
+import hashlib
+import json
+import re
+import unicodedata
+
+
+SEARCH_FIELDS = ("title", "summary", "highlights", "recommended_stops", "indoor_attractions", "tips")
+SHARD_PREFIX_LEN = 2
+MIN_TERM_LEN = 2
+MIN_STEM_LEN = 3
+DOC_CHUNK_SIZE = 256
+STEM_RULES = [
+    ("sses", "ss"),
+    ("ies", "y"),
+    ("ss", "ss"),
+    ("us", "us"),
+    ("is", "is"),
+    ("ing", ""),
+    ("ed", ""),
+    ("s", ""),
+]
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "into", "is", "it",
+    "its", "of", "on", "or", "the", "to", "with", "your", "you",
+}
+
+
+def normalize_text(text):
+    folded = unicodedata.normalize("NFKD", text or "")
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return folded.lower()
+
+
+def stem(term):
+    for suffix, replacement in STEM_RULES:
+        if term.endswith(suffix) and len(term) - len(suffix) >= MIN_STEM_LEN:
+            return term[: len(term) - len(suffix)] + replacement
+    return term
+
+
+def words(text):
+    out = []
+    for token in re.split(r"[^a-z0-9]+", normalize_text(text)):
+        if len(token) < MIN_TERM_LEN or token in STOPWORDS:
+            continue
+        out.append(token)
+    return out
+
+
+def tokenize(text):
+    return [stem(word) for word in words(text)]
+
+
+def field_text(value):
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value)
+    return str(value or "")
+
+
+def index_document(docs, postings, dest, forms=None):
+    """Add dest to docs and its stemmed terms to postings.
+
+    forms, when given, collects each word that stems to something else, so
+    a partly typed word can be matched before it stems the same way.
+    """
+    doc_id = len(docs)
+    docs.append([dest["slug"], dest.get("title", ""), dest.get("summary", "")])
+    terms = set()
+    for field in SEARCH_FIELDS:
+        for word in words(field_text(dest.get(field))):
+            term = stem(word)
+            terms.add(term)
+            if forms is not None and term != word:
+                forms[word] = term
+    for term in terms:
+        postings.setdefault(term, []).append(doc_id)
+
+
+def shard_postings(postings, forms=None):
+    """Group terms into shards by prefix.
+
+    Each shard lists its terms ("t") with delta-coded postings ("p") and, from
+    forms, the words stemming to them ("w") with their term's position ("s").
+    """
+    shards = {}
+    for term in sorted(postings):
+        shard = shards.setdefault(term[:SHARD_PREFIX_LEN], {"t": [], "p": []})
+        ids = postings[term]
+        deltas = [ids[0]] + [ids[i] - ids[i - 1] for i in range(1, len(ids))]
+        shard["t"].append(term)
+        shard["p"].append(deltas)
+    for word in sorted(forms or ()):
+        # Stemming keeps at least MIN_STEM_LEN leading characters, so a word shares its term's shard.
+        shard = shards[word[:SHARD_PREFIX_LEN]]
+        shard.setdefault("w", []).append(word)
+        shard.setdefault("s", []).append(shard["t"].index(forms[word]))
+    return shards
+
+
+def compact_json(value):
+    return json.dumps(value, ensure_ascii=True, separators=(",", ":"))
+
+
+def fingerprint(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:10]
+
+
+def search_script():
+    return SEARCH_SCRIPT.replace("__STEM_RULES__", compact_json(STEM_RULES)).replace(
+        "__STOPWORDS__", compact_json(sorted(STOPWORDS))
+    ).replace("__MIN_TERM_LEN__", str(MIN_TERM_LEN)).replace(
+        "__MIN_STEM_LEN__", str(MIN_STEM_LEN)
+    ).replace("__PREFIX_LEN__", str(SHARD_PREFIX_LEN)).replace("__DOC_CHUNK__", str(DOC_CHUNK_SIZE))
+
+
+def render_search_files(docs, postings, forms=None):
+    files = {}
+    manifest = {"terms": {}, "docs": [], "count": len(docs)}
+    for prefix, shard in sorted(shard_postings(postings, forms).items()):
+        body = compact_json(shard)
+        name = f"terms-{prefix}.{fingerprint(body)}.json"
+        manifest["terms"][prefix] = name
+        files[name] = body
+    for start in range(0, len(docs), DOC_CHUNK_SIZE):
+        body = compact_json(docs[start : start + DOC_CHUNK_SIZE])
+        name = f"docs-{start // DOC_CHUNK_SIZE}.{fingerprint(body)}.json"
+        manifest["docs"].append(name)
+        files[name] = body
+    files["manifest.json"] = compact_json(manifest)
+    files["search.js"] = files[SCRIPT_NAME] = search_script()
+    return files
+
+
+SEARCH_SCRIPT = """
+(function(){
+  var rules = __STEM_RULES__;
+  var stopList = __STOPWORDS__;
+  var minTerm = __MIN_TERM_LEN__;
+  var minStem = __MIN_STEM_LEN__;
+  var prefixLen = __PREFIX_LEN__;
+  var docChunk = __DOC_CHUNK__;
+  var stop = {};
+  stopList.forEach(function(w){ stop[w] = true; });
+  if (typeof module === "object" && module.exports){
+    module.exports = {words: words, stem: stem, tokens: tokens, lookup: lookup};
+    return;
+  }
+  var form = document.querySelector("[data-search]");
+  if (!form) return;
+  var base = (form.getAttribute("data-search-base") || "") + "search/";
+  var siteBase = form.getAttribute("data-search-base") || "";
+  var input = form.querySelector("input");
+  var panel = form.querySelector(".search-results");
+  var manifest = null;
+  var cache = {};
+  var timer = null;
+  var seq = 0;
+
+  function getJson(name){
+    if (!cache[name]){
+      cache[name] = fetch(base + name).then(function(r){ return r.ok ? r.json() : null; }).catch(function(){ return null; });
+    }
+    return cache[name];
+  }
+
+  function loadManifest(){
+    if (manifest) return Promise.resolve(manifest);
+    return getJson("manifest.json").then(function(m){ manifest = m; return m; });
+  }
+
+  function normalize(text){
+    var out = String(text || "");
+    if (out.normalize) out = out.normalize("NFKD").replace(/[\\u0300-\\u036f]/g, "");
+    return out.toLowerCase();
+  }
+
+  function stem(term){
+    for (var i = 0; i < rules.length; i++){
+      var suffix = rules[i][0];
+      if (term.length - suffix.length >= minStem && term.slice(-suffix.length) === suffix){
+        return term.slice(0, term.length - suffix.length) + rules[i][1];
+      }
+    }
+    return term;
+  }
+
+  function words(text){
+    return normalize(text).split(/[^a-z0-9]+/).filter(function(t){
+      return t.length >= minTerm && !stop[t];
+    });
+  }
+
+  function tokens(text){
+    return words(text).map(stem);
+  }
+
+  function lowerBound(list, target){
+    var lo = 0, hi = list.length;
+    while (lo < hi){
+      var mid = (lo + hi) >> 1;
+      if (list[mid] < target) lo = mid + 1; else hi = mid;
+    }
+    return lo;
+  }
+
+  function decode(deltas, into){
+    var id = 0;
+    for (var i = 0; i < deltas.length; i++){
+      id += deltas[i];
+      into[id] = true;
+    }
+  }
+
+  function scan(list, prefix, each){
+    for (var i = lowerBound(list, prefix); i < list.length && list[i].indexOf(prefix) === 0; i++) each(i);
+  }
+
+  // With partial (the word as typed so far), match terms starting with the
+  // term or the word, and terms of indexed words starting with the word.
+  function lookup(shard, term, partial){
+    var hits = {};
+    if (!shard) return hits;
+    if (!partial){
+      var i = lowerBound(shard.t, term);
+      if (shard.t[i] === term) decode(shard.p[i], hits);
+      return hits;
+    }
+    var add = function(i){ decode(shard.p[i], hits); };
+    scan(shard.t, term, add);
+    scan(shard.t, partial, add);
+    scan(shard.w || [], partial, function(i){ add(shard.s[i]); });
+    return hits;
+  }
+
+  function intersect(sets){
+    var out = sets[0];
+    for (var i = 1; i < sets.length; i++){
+      var next = {};
+      for (var id in out){ if (sets[i][id]) next[id] = true; }
+      out = next;
+    }
+    return Object.keys(out).map(Number).sort(function(a, b){ return a - b; });
+  }
+
+  function render(rows, query){
+    panel.innerHTML = "";
+    if (!query){
+      panel.hidden = true;
+      return;
+    }
+    if (!rows.length){
+      panel.innerHTML = '<div class="search-empty">No matches yet.</div>';
+      panel.hidden = false;
+      return;
+    }
+    rows.forEach(function(doc){
+      var link = document.createElement("a");
+      link.href = siteBase + "destinations/" + doc[0] + ".html";
+      var title = document.createElement("strong");
+      title.textContent = doc[1];
+      var summary = document.createElement("span");
+      summary.textContent = doc[2];
+      link.appendChild(title);
+      link.appendChild(summary);
+      panel.appendChild(link);
+    });
+    panel.hidden = false;
+  }
+
+  function run(query){
+    var typed = words(query);
+    var terms = typed.map(stem);
+    var mine = ++seq;
+    if (!terms.length){
+      render([], "");
+      return;
+    }
+    loadManifest().then(function(m){
+      if (!m) return;
+      var names = terms.map(function(t){ return m.terms[t.slice(0, prefixLen)]; });
+      return Promise.all(names.map(function(n){ return n ? getJson(n) : null; })).then(function(shards){
+        var sets = terms.map(function(t, i){ return lookup(shards[i], t, i === terms.length - 1 ? typed[i] : null); });
+        var ids = intersect(sets);
+        var title = normalize(query);
+        var chunks = {};
+        ids.forEach(function(id){ chunks[Math.floor(id / docChunk)] = true; });
+        return Promise.all(Object.keys(chunks).map(function(c){ return getJson(m.docs[c]); })).then(function(){
+          return Promise.all(ids.map(function(id){ return getJson(m.docs[Math.floor(id / docChunk)]).then(function(d){ return d ? d[id % docChunk] : null; }); }));
+        }).then(function(rows){
+          if (mine !== seq) return;
+          rows = rows.filter(Boolean);
+          rows.sort(function(a, b){
+            var at = normalize(a[1]).indexOf(title) === -1 ? 1 : 0;
+            var bt = normalize(b[1]).indexOf(title) === -1 ? 1 : 0;
+            return at - bt;
+          });
+          render(rows.slice(0, 8), query);
+        });
+      });
+    });
+  }
+
+  form.addEventListener("submit", function(e){
+    e.preventDefault();
+    var first = panel.querySelector("a");
+    if (first) window.location.href = first.href;
+  });
+  input.addEventListener("focus", loadManifest);
+  input.addEventListener("input", function(){
+    if (timer) clearTimeout(timer);
+    timer = setTimeout(function(){ run(input.value); }, 80);
+  });
+  document.addEventListener("keydown", function(e){
+    if (e.key === "Escape"){ panel.hidden = true; }
+  });
+})();
+""".lstrip()
+
+
+# Generated pages load the script by this name; search.js stays for hand-written pages.
+SCRIPT_NAME = f"search.{fingerprint(search_script())}.js"
@@ -0,0 +1,308 @@
+import contextlib
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+FORMAT_VERSION = 1
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+LOCK_STRIPES = 256
+SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+MISSING = object()
+
+
+def parse_size(text):
+    """Bytes for a size such as 4096, 300K, 512M or 2G."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMG]?)B?\s*", str(text), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"invalid size {text!r}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def format_size(size):
+    for unit in ("G", "M", "K"):
+        if size >= SIZE_UNITS[unit]:
+            return f"{size / SIZE_UNITS[unit]:.1f} {unit}B"
+    return f"{size} B"
+
+
+@contextlib.contextmanager
+def atomic_file(path):
+    """A binary file that replaces path when the block completes, and is removed if it fails."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            yield handle
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def write_atomic(path, data):
+    """Write bytes to path through a temporary file, so readers never see a partial file."""
+    with atomic_file(path) as handle:
+        handle.write(data)
+
+
+class FileLock:
+    """An advisory lock on path, held across processes for the with block.
+
+    shared locks exclude only exclusive ones; on Windows every lock is
+    exclusive.
+    """
+
+    def __init__(self, path, shared=False):
+        self.path = Path(path)
+        self.shared = shared
+        self.handle = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.handle = open(self.path, "a+b")
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.handle.fileno(), fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+            else:
+                self.handle.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self.handle.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:  # LK_LOCK gives up after about 10 seconds
+                        continue
+        except BaseException:
+            self.handle.close()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.handle.fileno(), fcntl.LOCK_UN)
+            else:
+                self.handle.seek(0)
+                msvcrt.locking(self.handle.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.handle.close()
+            self.handle = None
+
+
+class SharedCache:
+    """A cache directory that concurrent builds can read and write safely.
+
+    Values are stored once under the SHA-256 of their content in objects/,
+    and each namespace maps key hashes to content hashes in refs/. Both are
+    written through a temporary file and os.replace, so a reader sees either
+    the old entry or the new one. Writers hold a shared lock on the cache and
+    gc() an exclusive one, so collection never removes an object between its
+    write and its ref. get_or_compute() also locks the key, so when parallel
+    builds miss the same entry one computes it and the others reuse it. gc()
+    drops the least recently used objects, by mtime, down to max_bytes.
+    """
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES):
+        self.base = Path(root)
+        self.root = self.base / f"v{FORMAT_VERSION}"
+        self.max_bytes = max_bytes
+        self.hits = {}
+        self.misses = {}
+        self.writes = {}
+
+    def lock(self, shared=True):
+        return FileLock(self.root / "lock", shared=shared)
+
+    def key_digest(self, namespace, key):
+        return hashlib.sha256(f"{namespace}\0{key}".encode("utf-8")).hexdigest()
+
+    def ref_path(self, namespace, digest):
+        return self.root / "refs" / namespace / digest[:2] / digest
+
+    def object_path(self, digest):
+        return self.root / "objects" / digest[:2] / digest
+
+    def get(self, namespace, key):
+        """The bytes stored for key, or None."""
+        data = self.read(namespace, self.key_digest(namespace, key))
+        counts = self.misses if data is None else self.hits
+        counts[namespace] = counts.get(namespace, 0) + 1
+        return data
+
+    def read(self, namespace, key_digest):
+        try:
+            digest = self.ref_path(namespace, key_digest).read_text(encoding="ascii").strip()
+            path = self.object_path(digest)
+            data = path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        if hashlib.sha256(data).hexdigest() != digest:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, namespace, key, data):
+        digest = hashlib.sha256(data).hexdigest()
+        with self.lock():
+            path = self.object_path(digest)
+            if path.exists():
+                os.utime(path)
+            else:
+                write_atomic(path, data)
+            write_atomic(self.ref_path(namespace, self.key_digest(namespace, key)), digest.encode("ascii"))
+        self.writes[namespace] = self.writes.get(namespace, 0) + 1
+
+    def get_or_compute(self, namespace, key, compute):
+        """The stored bytes for key, else compute() stored; None results are not kept."""
+        data = self.get(namespace, key)
+        if data is not None:
+            return data
+        key_digest = self.key_digest(namespace, key)
+        stripe = int(key_digest[:4], 16) % LOCK_STRIPES
+        with FileLock(self.root / "locks" / f"{stripe:03d}.lock"):
+            # Another build may have stored it while this one waited.
+            data = self.read(namespace, key_digest)
+            if data is None:
+                data = compute()
+                if data is not None:
+                    self.put(namespace, key, data)
+        return data
+
+    def get_json(self, namespace, key):
+        data = self.get(namespace, key)
+        return None if data is None else json.loads(data)
+
+    def put_json(self, namespace, key, value):
+        self.put(namespace, key, json.dumps(value, sort_keys=True).encode("utf-8"))
+
+    def namespace(self, name):
+        return Namespace(self, name)
+
+    def objects(self):
+        found = []
+        for path in (self.root / "objects").glob("*/[0-9a-f]*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            found.append((stat.st_mtime, stat.st_size, path))
+        return found
+
+    def size(self):
+        return sum(size for _, size, _ in self.objects())
+
+    def stats(self):
+        objects = self.objects()
+        refs = {}
+        for namespace in sorted((self.root / "refs").glob("*")):
+            refs[namespace.name] = sum(1 for _ in namespace.glob("*/[0-9a-f]*"))
+        return {"objects": len(objects), "bytes": sum(size for _, size, _ in objects), "refs": refs}
+
+    def gc(self, max_bytes=None):
+        """Remove least recently used objects until the cache fits in max_bytes."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        removed = freed = 0
+        with self.lock(shared=False):
+            objects = sorted(self.objects())
+            total = sum(size for _, size, _ in objects)
+            for _, size, path in objects:
+                if total <= max_bytes:
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+                freed += size
+            dangling = 0
+            for ref in (self.root / "refs").glob("*/*/[0-9a-f]*"):
+                try:
+                    digest = ref.read_text(encoding="ascii").strip()
+                except OSError:
+                    continue
+                if not self.object_path(digest).exists():
+                    ref.unlink()
+                    dangling += 1
+            # No writer holds the lock now, so any temporary file was left
+            # behind by one that was killed.
+            for tmp in self.root.glob("**/.*.tmp"):
+                try:
+                    tmp.unlink()
+                except OSError:
+                    pass
+        return {"removed": removed, "freed": freed, "dangling": dangling, "bytes": total}
+
+    def clear(self):
+        with self.lock(shared=False):
+            for name in ("objects", "refs"):
+                shutil.rmtree(self.root / name, ignore_errors=True)
+
+    def format_stats(self):
+        namespaces = sorted(set(self.hits) | set(self.misses) | set(self.writes))
+        parts = [
+            f"{name} {self.hits.get(name, 0)} hit(s), {self.misses.get(name, 0)} miss(es), {self.writes.get(name, 0)} written"
+            for name in namespaces
+        ]
+        return "Shared cache: " + ("; ".join(parts) if parts else "unused")
+
+
+def format_report(stats, max_bytes):
+    lines = [f"{stats['objects']} objects, {format_size(stats['bytes'])} of {format_size(max_bytes)}"]
+    lines += [f"  {name}: {count} entries" for name, count in stats["refs"].items()]
+    return "\n".join(lines)
+
+
+def format_gc(report):
+    return (
+        f"Removed {report['removed']} objects ({format_size(report['freed'])}) and {report['dangling']} dangling refs;"
+        f" {format_size(report['bytes'])} left"
+    )
+
+
+class Namespace:
+    """A dict-like view of one namespace holding JSON values, memoised in memory."""
+
+    def __init__(self, cache, name):
+        self.cache = cache
+        self.name = name
+        self.memo = {}
+
+    def get(self, key, default=None):
+        if key not in self.memo:
+            value = self.cache.get_json(self.name, key)
+            if value is None:
+                return default
+            self.memo[key] = value
+        return self.memo[key]
+
+    def __contains__(self, key):
+        return self.get(key, MISSING) is not MISSING
+
+    def __getitem__(self, key):
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.memo[key] = value
+        self.cache.put_json(self.name, key, value)
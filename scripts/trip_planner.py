@@ -0,0 +1,206 @@
+import hashlib
+import heapq
+import math
+import pickle
+from array import array
+
+import shared_cache
+
+
+FORMAT_VERSION = 1
+EARTH_RADIUS_KM = 6371.0088
+ORIGIN = {"name": "Landstuhl", "lat": 49.4139, "lon": 7.5703}
+# The curated drive times from Landstuhl work out to about one straight-line
+# kilometre per minute, which covers detours, towns and parking.
+STRAIGHT_LINE_KMH = 60.0
+DAILY_DRIVE_MINUTES = 300
+MAX_LEG_MINUTES = 75
+MIN_STOPS = 2
+MAX_STOPS = 4
+MAX_COMBINATIONS = 3
+MAX_NEIGHBOURS = 32
+
+
+def unit_vector(lat, lon):
+    lat, lon = math.radians(lat), math.radians(lon)
+    return math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def drive_minutes(km):
+    return km / STRAIGHT_LINE_KMH * 60
+
+
+def max_leg_km(minutes=MAX_LEG_MINUTES):
+    return minutes / 60 * STRAIGHT_LINE_KMH
+
+
+class DistanceMatrix:
+    """Great-circle distances between points, stored for nearby pairs.
+
+    Row i lists up to limit points within max_km of point i, nearest first, as
+    parallel arrays of indices and kilometres. Points are bucketed on a 3D grid
+    of unit vectors sized to max_km, so building the rows compares each point
+    only with its 27 neighbouring cells instead of with every other point.
+    Other pairs are computed on demand by distance().
+    """
+
+    def __init__(self, points, max_km, limit=MAX_NEIGHBOURS):
+        self.points = [(round(lat, 6), round(lon, 6)) for lat, lon in points]
+        self.max_km = max_km
+        self.limit = limit
+        self.rows = None
+        self.computed = False
+
+    def digest(self):
+        payload = repr((FORMAT_VERSION, self.max_km, self.limit, self.points)).encode("utf-8")
+        return hashlib.sha1(payload).hexdigest()
+
+    def compute(self):
+        angle = min(self.max_km / EARTH_RADIUS_KM, math.pi)
+        size = 2 * math.sin(angle / 2) or 1e-9
+        cells = {}
+        for index, (lat, lon) in enumerate(self.points):
+            x, y, z = unit_vector(lat, lon)
+            cell = cells.setdefault((math.floor(x / size), math.floor(y / size), math.floor(z / size)), ([], [], [], []))
+            for column, value in zip(cell, (index, x, y, z)):
+                column.append(value)
+        threshold = math.cos(angle)
+        acos = math.acos
+        rows = [None] * len(self.points)
+        for (cx, cy, cz), (indices, xs, ys, zs) in cells.items():
+            # Every point in a cell shares the same 27-cell neighbourhood, so
+            # gather it once and compare the whole cell against it.
+            near = ([], [], [], [])
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for dz in (-1, 0, 1):
+                        other = cells.get((cx + dx, cy + dy, cz + dz))
+                        if other:
+                            for column, values in zip(near, other):
+                                column.extend(values)
+            near_indices, near_x, near_y, near_z = near
+            for index, x, y, z in zip(indices, xs, ys, zs):
+                dots = [x * a + y * b + z * c for a, b, c in zip(near_x, near_y, near_z)]
+                found = [(dot, other) for dot, other in zip(dots, near_indices) if dot >= threshold and other != index]
+                found = heapq.nlargest(self.limit, found) if len(found) > self.limit else sorted(found, reverse=True)
+                rows[index] = (
+                    array("I", [other for _, other in found]),
+                    array("f", [EARTH_RADIUS_KM * acos(min(1.0, dot)) for dot, _ in found]),
+                )
+        self.rows = rows
+        self.computed = True
+        return self
+
+    def row(self, index):
+        """(index, km) pairs within max_km of point index, nearest first."""
+        indices, distances = self.rows[index]
+        return zip(indices, distances)
+
+    def distance(self, i, j):
+        if i == j:
+            return 0.0
+        (lat1, lon1), (lat2, lon2) = self.points[i], self.points[j]
+        return haversine_km(lat1, lon1, lat2, lon2)
+
+    def load(self, path):
+        try:
+            with open(path, "rb") as handle:
+                stored = pickle.load(handle)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+            return False
+        if not isinstance(stored, dict) or stored.get("digest") != self.digest():
+            return False
+        self.rows = stored["rows"]
+        return True
+
+    def save(self, path):
+        shared_cache.write_atomic(path, pickle.dumps({"digest": self.digest(), "rows": self.rows}, pickle.HIGHEST_PROTOCOL))
+
+
+def distance_matrix(stops, cache_path=None, max_km=None):
+    """The matrix for stops, reusing cache_path when the coordinates are unchanged."""
+    matrix = DistanceMatrix([(stop["lat"], stop["lon"]) for stop in stops], max_km or max_leg_km())
+    if cache_path is not None and matrix.load(cache_path):
+        return matrix
+    matrix.compute()
+    if cache_path is not None:
+        matrix.save(cache_path)
+    return matrix
+
+
+def origin_minutes(stop, origin=ORIGIN):
+    """Drive time from the origin: the curated figure when known, else estimated."""
+    if stop.get("minutes"):
+        return stop["minutes"]
+    return drive_minutes(haversine_km(origin["lat"], origin["lon"], stop["lat"], stop["lon"]))
+
+
+def tour_minutes(route, stops, matrix, origin=ORIGIN):
+    total = origin_minutes(stops[route[0]], origin) + origin_minutes(stops[route[-1]], origin)
+    for a, b in zip(route, route[1:]):
+        total += drive_minutes(matrix.distance(a, b))
+    return total
+
+
+def two_opt(route, stops, matrix, origin=ORIGIN):
+    """Reverse segments of an origin-to-origin tour while that shortens it."""
+    best = list(route)
+    best_minutes = tour_minutes(best, stops, matrix, origin)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(best) - 1):
+            for j in range(i + 1, len(best)):
+                candidate = best[:i] + best[i : j + 1][::-1] + best[j + 1 :]
+                minutes = tour_minutes(candidate, stops, matrix, origin)
+                if minutes < best_minutes - 1e-9:
+                    best, best_minutes, improved = candidate, minutes, True
+    return best, best_minutes
+
+
+def plan_trips(stops, matrix, budget=DAILY_DRIVE_MINUTES, max_stops=MAX_STOPS, limit=MAX_COMBINATIONS, origin=ORIGIN):
+    """Day trips of MIN_STOPS to max_stops stops that include each stop.
+
+    Each destination grows a route by nearest neighbour among the stops
+    within one leg of it, re-ordering with 2-opt after every addition and
+    dropping candidates that push the round trip from the origin over the
+    budget. Returns {slug: [{"route": [{"slug", "title"}, ...], "minutes": int}]},
+    longest trip first.
+    """
+    plans = {}
+    leg_km = max_leg_km()
+    for index, stop in enumerate(stops):
+        if 2 * origin_minutes(stop, origin) > budget:
+            continue
+        candidates = {other for other, km in matrix.row(index) if km <= leg_km}
+        route = [index]
+        last = index
+        trips = []
+        while candidates and len(route) < max_stops:
+            nearest = next((other for other, _ in matrix.row(last) if other in candidates), None)
+            if nearest is None:
+                nearest = min(candidates, key=lambda other: matrix.distance(last, other))
+            candidates.discard(nearest)
+            ordered, minutes = two_opt(route + [nearest], stops, matrix, origin)
+            if minutes > budget:
+                continue
+            route, last = ordered, ordered[-1]
+            trips.append({"route": [{"slug": stops[i]["slug"], "title": stops[i]["title"]} for i in route], "minutes": round(minutes)})
+        if trips:
+            plans[stop["slug"]] = trips[-limit:][::-1]
+    return plans
+
+
+def format_stats(stats):
+    matrix = "computed distance matrix" if stats["computed"] else "reused cached distance matrix"
+    return (
+        f"Trip planner: {stats['stops']} day-trip stops, {stats['plans']} with combinations"
+        f" from {stats['origins']} origin(s) ({matrix}) in {stats['elapsed'] * 1000:.0f} ms"
+    )
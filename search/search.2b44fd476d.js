@@ -0,0 +1,182 @@
+(function(){
+  var rules = [["sses","ss"],["ies","y"],["ss","ss"],["us","us"],["is","is"],["ing",""],["ed",""],["s",""]];
+  var stopList = ["a","an","and","are","as","at","be","by","for","from","in","into","is","it","its","of","on","or","the","to","with","you","your"];
+  var minTerm = 2;
+  var minStem = 3;
+  var prefixLen = 2;
+  var docChunk = 256;
+  var stop = {};
+  stopList.forEach(function(w){ stop[w] = true; });
+  if (typeof module === "object" && module.exports){
+    module.exports = {words: words, stem: stem, tokens: tokens, lookup: lookup};
+    return;
+  }
+  var form = document.querySelector("[data-search]");
+  if (!form) return;
+  var base = (form.getAttribute("data-search-base") || "") + "search/";
+  var siteBase = form.getAttribute("data-search-base") || "";
+  var input = form.querySelector("input");
+  var panel = form.querySelector(".search-results");
+  var manifest = null;
+  var cache = {};
+  var timer = null;
+  var seq = 0;
+
+  function getJson(name){
+    if (!cache[name]){
+      cache[name] = fetch(base + name).then(function(r){ return r.ok ? r.json() : null; }).catch(function(){ return null; });
+    }
+    return cache[name];
+  }
+
+  function loadManifest(){
+    if (manifest) return Promise.resolve(manifest);
+    return getJson("manifest.json").then(function(m){ manifest = m; return m; });
+  }
+
+  function normalize(text){
+    var out = String(text || "");
+    if (out.normalize) out = out.normalize("NFKD").replace(/[\u0300-\u036f]/g, "");
+    return out.toLowerCase();
+  }
+
+  function stem(term){
+    for (var i = 0; i < rules.length; i++){
+      var suffix = rules[i][0];
+      if (term.length - suffix.length >= minStem && term.slice(-suffix.length) === suffix){
+        return term.slice(0, term.length - suffix.length) + rules[i][1];
+      }
+    }
+    return term;
+  }
+
+  function words(text){
+    return normalize(text).split(/[^a-z0-9]+/).filter(function(t){
+      return t.length >= minTerm && !stop[t];
+    });
+  }
+
+  function tokens(text){
+    return words(text).map(stem);
+  }
+
+  function lowerBound(list, target){
+    var lo = 0, hi = list.length;
+    while (lo < hi){
+      var mid = (lo + hi) >> 1;
+      if (list[mid] < target) lo = mid + 1; else hi = mid;
+    }
+    return lo;
+  }
+
+  function decode(deltas, into){
+    var id = 0;
+    for (var i = 0; i < deltas.length; i++){
+      id += deltas[i];
+      into[id] = true;
+    }
+  }
+
+  function scan(list, prefix, each){
+    for (var i = lowerBound(list, prefix); i < list.length && list[i].indexOf(prefix) === 0; i++) each(i);
+  }
+
+  // With partial (the word as typed so far), match terms starting with the
+  // term or the word, and terms of indexed words starting with the word.
+  function lookup(shard, term, partial){
+    var hits = {};
+    if (!shard) return hits;
+    if (!partial){
+      var i = lowerBound(shard.t, term);
+      if (shard.t[i] === term) decode(shard.p[i], hits);
+      return hits;
+    }
+    var add = function(i){ decode(shard.p[i], hits); };
+    scan(shard.t, term, add);
+    scan(shard.t, partial, add);
+    scan(shard.w || [], partial, function(i){ add(shard.s[i]); });
+    return hits;
+  }
+
+  function intersect(sets){
+    var out = sets[0];
+    for (var i = 1; i < sets.length; i++){
+      var next = {};
+      for (var id in out){ if (sets[i][id]) next[id] = true; }
+      out = next;
+    }
+    return Object.keys(out).map(Number).sort(function(a, b){ return a - b; });
+  }
+
+  function render(rows, query){
+    panel.innerHTML = "";
+    if (!query){
+      panel.hidden = true;
+      return;
+    }
+    if (!rows.length){
+      panel.innerHTML = '<div class="search-empty">No matches yet.</div>';
+      panel.hidden = false;
+      return;
+    }
+    rows.forEach(function(doc){
+      var link = document.createElement("a");
+      link.href = siteBase + "destinations/" + doc[0] + ".html";
+      var title = document.createElement("strong");
+      title.textContent = doc[1];
+      var summary = document.createElement("span");
+      summary.textContent = doc[2];
+      link.appendChild(title);
+      link.appendChild(summary);
+      panel.appendChild(link);
+    });
+    panel.hidden = false;
+  }
+
+  function run(query){
+    var typed = words(query);
+    var terms = typed.map(stem);
+    var mine = ++seq;
+    if (!terms.length){
+      render([], "");
+      return;
+    }
+    loadManifest().then(function(m){
+      if (!m) return;
+      var names = terms.map(function(t){ return m.terms[t.slice(0, prefixLen)]; });
+      return Promise.all(names.map(function(n){ return n ? getJson(n) : null; })).then(function(shards){
+        var sets = terms.map(function(t, i){ return lookup(shards[i], t, i === terms.length - 1 ? typed[i] : null); });
+        var ids = intersect(sets);
+        var title = normalize(query);
+        var chunks = {};
+        ids.forEach(function(id){ chunks[Math.floor(id / docChunk)] = true; });
+        return Promise.all(Object.keys(chunks).map(function(c){ return getJson(m.docs[c]); })).then(function(){
+          return Promise.all(ids.map(function(id){ return getJson(m.docs[Math.floor(id / docChunk)]).then(function(d){ return d ? d[id % docChunk] : null; }); }));
+        }).then(function(rows){
+          if (mine !== seq) return;
+          rows = rows.filter(Boolean);
+          rows.sort(function(a, b){
+            var at = normalize(a[1]).indexOf(title) === -1 ? 1 : 0;
+            var bt = normalize(b[1]).indexOf(title) === -1 ? 1 : 0;
+            return at - bt;
+          });
+          render(rows.slice(0, 8), query);
+        });
+      });
+    });
+  }
+
+  form.addEventListener("submit", function(e){
+    e.preventDefault();
+    var first = panel.querySelector("a");
+    if (first) window.location.href = first.href;
+  });
+  input.addEventListener("focus", loadManifest);
+  input.addEventListener("input", function(){
+    if (timer) clearTimeout(timer);
+    timer = setTimeout(function(){ run(input.value); }, 80);
+  });
+  document.addEventListener("keydown", function(e){
+    if (e.key === "Escape"){ panel.hidden = true; }
+  });
+})();
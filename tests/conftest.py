@@ -0,0 +1,22 @@
+import json
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+
+REPO = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO / "scripts"))
+
+
+@pytest.fixture
+def site(tmp_path):
+    records = json.loads((REPO / "data" / "destinations.json").read_text(encoding="utf-8"))
+    picked = [dest for dest in records if dest.get("photo_deck")][:2] + [dest for dest in records if not dest.get("photo_deck")][:1]
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "destinations.json").write_text(json.dumps(picked), encoding="utf-8")
+    (tmp_path / "templates").mkdir()
+    shutil.copy(REPO / "templates" / "destination.html", tmp_path / "templates" / "destination.html")
+    shutil.copy(REPO / "index.html", tmp_path / "index.html")
+    return tmp_path, [dest["slug"] for dest in picked]
@@ -0,0 +1,138 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import build_cache
+import generate_destinations
+
+
+def parse_from(path, calls):
+    def parse():
+        calls.append(path)
+        for record in json.loads(path.read_text(encoding="utf-8")):
+            record["normalised"] = True
+            yield record
+
+    return parse
+
+
+def test_warm_run_skips_parsing(tmp_path):
+    data = tmp_path / "data.json"
+    data.write_text(json.dumps([{"slug": "a"}, {"slug": "b"}]), encoding="utf-8")
+    calls = []
+    cold = build_cache.BuildCache(tmp_path / "cache.pickle", {"data": data}, salt="v1")
+    cold.load(parse_from(data, calls), header=lambda: {"css": "body{}"})
+    assert list(cold.cached_records()) == [
+        {"slug": "a", "normalised": True},
+        {"slug": "b", "normalised": True},
+    ]
+    assert cold.warm is False
+
+    warm = build_cache.BuildCache(tmp_path / "cache.pickle", {"data": data}, salt="v1")
+    warm.load(parse_from(data, calls))
+    restored = []
+    records = list(warm.cached_records(restore=lambda record, extra: restored.append(extra)))
+    assert warm.warm is True
+    assert len(calls) == 1
+    assert records[1] == {"slug": "b", "normalised": True}
+    assert warm.header == {"css": "body{}"}
+    assert "warm" in warm.describe() and "2 destinations" in warm.describe()
+
+
+def test_records_are_stored_before_later_stages_mutate_them(tmp_path):
+    data = tmp_path / "data.json"
+    data.write_text(json.dumps([{"slug": "a"}]), encoding="utf-8")
+    cache_path = tmp_path / "cache.pickle"
+    cold = build_cache.BuildCache(cache_path, {"data": data})
+    cold.load(parse_from(data, []), derive=lambda r: r["slug"])
+    for record in cold.cached_records():
+        record["photo_deck"] = ["added downstream"]
+    warm = build_cache.BuildCache(cache_path, {"data": data})
+    warm.load(None)
+    extras = []
+    assert list(warm.cached_records(restore=lambda r, extra: extras.append(extra))) == [{"slug": "a", "normalised": True}]
+    assert extras == ["a"]
+
+
+def test_invalidated_by_source_or_salt_change(tmp_path):
+    data = tmp_path / "data.json"
+    data.write_text(json.dumps([{"slug": "a"}]), encoding="utf-8")
+    cache_path = tmp_path / "cache.pickle"
+    build_cache.BuildCache(cache_path, {"data": data}, salt="v1").load(parse_from(data, []))
+
+    data.write_text(json.dumps([{"slug": "changed"}]), encoding="utf-8")
+    edited = build_cache.BuildCache(cache_path, {"data": data}, salt="v1")
+    edited.load(parse_from(data, []))
+    assert [r["slug"] for r in edited.cached_records()] == ["changed"]
+    assert edited.warm is False
+
+    other_code = build_cache.BuildCache(cache_path, {"data": data}, salt="v2")
+    other_code.load(parse_from(data, []))
+    assert other_code.warm is False
+
+
+def test_failed_parse_does_not_replace_cache(tmp_path):
+    data = tmp_path / "data.json"
+    data.write_text(json.dumps([{"slug": "a"}, {"slug": "b"}]), encoding="utf-8")
+    cache_path = tmp_path / "cache.pickle"
+
+    def parse():
+        yield {"slug": "a"}
+        raise ValueError("bad record")
+
+    with pytest.raises(ValueError):
+        build_cache.BuildCache(cache_path, {"data": data}).load(parse)
+    assert not cache_path.exists()
+    assert list(tmp_path.glob(".cache.pickle.*")) == []
+
+
+def test_salt_changes_with_the_modules_that_build_records_and_rows(tmp_path, monkeypatch):
+    scripts = Path(generate_destinations.__file__).parent
+    for name in generate_destinations.SALT_MODULES:
+        (tmp_path / name).write_bytes((scripts / name).read_bytes())
+    monkeypatch.setattr(generate_destinations, "__file__", str(tmp_path / "generate_destinations.py"))
+    salts = [generate_destinations.source_fingerprint()]
+    for name in ("related.py", "trip_planner.py"):
+        with open(tmp_path / name, "a", encoding="utf-8") as handle:
+            handle.write("\n# edited\n")
+        salts.append(generate_destinations.source_fingerprint())
+    assert len(set(salts)) == 3
+
+
+def test_builder_output_matches_with_warm_cache(site):
+    root, _ = site
+    plain = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False).render()
+    cache_path = root / ".cache" / "build.pickle"
+    cold = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False, cache_path=cache_path)
+    assert cold.render() == plain
+    warm = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False, cache_path=cache_path)
+    assert warm.render() == plain
+    assert warm.build_cache.warm
+
+
+def test_load_settles_the_cache_before_streaming(tmp_path):
+    data = tmp_path / "data.json"
+    data.write_text(json.dumps([{"slug": "a"}, {"slug": "b"}]), encoding="utf-8")
+    calls = []
+    cold = build_cache.BuildCache(tmp_path / "cache.pickle", {"data": data})
+    assert cold.load(parse_from(data, calls), index=lambda record: record["slug"]) == ["a", "b"]
+    assert cold.warm is False and (tmp_path / "cache.pickle").exists()
+    assert [record["slug"] for record in cold.cached_records()] == ["a", "b"]
+
+    warm = build_cache.BuildCache(tmp_path / "cache.pickle", {"data": data})
+    assert warm.load(parse_from(data, calls)) == ["a", "b"]
+    assert warm.warm is True and len(calls) == 1
+    assert list(warm.cached_records()) == list(cold.cached_records())
+
+
+def test_warm_builder_takes_base_css_from_the_cache(site, monkeypatch):
+    root, _ = site
+    cache_path = root / ".cache" / "build.pickle"
+    plain = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False, cache_path=cache_path).render()
+    parsed = []
+    base_css_from_html = generate_destinations.base_css_from_html
+    monkeypatch.setattr(generate_destinations, "base_css_from_html", lambda html: parsed.append(html) or base_css_from_html(html))
+    warm = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False, cache_path=cache_path)
+    assert warm.render() == plain
+    assert warm.build_cache.warm and parsed == []
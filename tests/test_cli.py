@@ -0,0 +1,122 @@
+import argparse
+import json
+
+import pytest
+
+import generate_destinations
+
+
+class RecordingClient:
+    def __init__(self):
+        self.requests = 0
+
+    def start_budget(self, seconds):
+        pass
+
+    def get_json(self, url):
+        self.requests += 1
+        return {"query": {"pages": {"1": {"imageinfo": [{"url": "https://upload.wikimedia.org/wikipedia/commons/a/ab/Cli.jpg"}]}}}}
+
+    def format_stats(self):
+        return f"{self.requests} requests"
+
+
+@pytest.fixture
+def cli(site, tmp_path, monkeypatch, capsys):
+    root, slugs = site
+    cache = tmp_path / "cache"
+    for name, filename in (
+        ("BUILD_CACHE_PATH", "build.pickle"),
+        ("PLACEHOLDER_CACHE_PATH", "placeholders.json"),
+        ("DISTANCE_CACHE_PATH", "distances.pickle"),
+        ("RELATED_CACHE_PATH", "related-terms.pickle"),
+        ("FRAGMENT_CACHE_PATH", "fragments.pickle"),
+        ("WEIGHT_REPORT_PATH", "page-weight.json"),
+    ):
+        monkeypatch.setattr(generate_destinations, name, cache / filename)
+    client = RecordingClient()
+    monkeypatch.setattr(generate_destinations, "HTTP_CLIENT", client)
+    out = tmp_path / "out"
+
+    def run(*args, out=out):
+        generate_destinations.main(
+            ["build", "--data", str(root / "data" / "destinations.json"), "--out", str(out), "--no-shared-cache", "--no-weight-check", *args]
+        )
+        return capsys.readouterr().out
+
+    return run, out, slugs, client
+
+
+def written(out):
+    return {path.relative_to(out).as_posix() for path in out.rglob("*") if path.is_file()}
+
+
+def home_destination_pages(names):
+    return {name for name in names if name.startswith("destinations/")}
+
+
+def test_option_parsing():
+    assert generate_destinations.comma_list(" a, b,,c ") == ["a", "b", "c"]
+    assert generate_destinations.page_types("lists,hubs") == ["lists", "hubs"]
+    with pytest.raises(argparse.ArgumentTypeError):
+        generate_destinations.page_types("lists,maps")
+
+
+def test_data_and_out_choose_where_the_build_reads_and_writes(cli):
+    run, out, slugs, _ = cli
+    output = run("--skip-photos")
+    names = written(out)
+    assert home_destination_pages(names) == {f"destinations/{slug}.html" for slug in slugs}
+    assert "search/manifest.json" in names and "day-trips-car.html" in names
+    pages = sum(1 for name in names if generate_destinations.is_destination_page(name))
+    assert f"Generated {pages} destination pages" in output
+
+
+def test_only_builds_those_destinations_and_their_list_pages(cli):
+    run, out, slugs, _ = cli
+    run("--skip-photos", "--only", slugs[0])
+    names = written(out)
+    assert home_destination_pages(names) == {f"destinations/{slugs[0]}.html"}
+    with pytest.raises(SystemExit):
+        run("--skip-photos", "--only", "no-such-place")
+
+
+def test_pages_limits_the_page_types(cli):
+    run, out, _, _ = cli
+    run("--skip-photos", "--pages", "lists")
+    names = written(out)
+    assert "day-trips-car.html" in names
+    assert not any(generate_destinations.is_destination_page(name) or name.startswith("search/") for name in names)
+    assert "kinder-hotels.html" not in names
+    with pytest.raises(SystemExit):
+        run("--pages", "maps")
+
+
+def test_skip_photos_makes_no_requests(cli):
+    run, out, slugs, client = cli
+    run("--skip-photos", "--pages", "destinations")
+    assert client.requests == 0
+    run("--pages", "destinations", "--only", slugs[2])
+    assert client.requests > 0
+    assert "Cli.jpg" in (out / "destinations" / f"{slugs[2]}.html").read_text(encoding="utf-8")
+
+
+def test_dry_run_lists_files_without_writing(cli):
+    run, out, slugs, _ = cli
+    output = run("--skip-photos", "--dry-run")
+    assert not out.exists()
+    assert f"would write destinations/{slugs[0]}.html" in output
+
+    run("--skip-photos")
+    output = run("--skip-photos", "--dry-run")
+    assert "would write" not in output and "0 would change" in output
+
+
+def test_data_written_back_by_write_photos_is_the_data_option(cli, site):
+    run, _, slugs, _ = cli
+    root, _ = site
+    run("--pages", "destinations", "--only", slugs[2], "--write-photos", "data")
+    text = (root / "data" / "destinations.json").read_text(encoding="utf-8")
+    saved = {dest["slug"]: dest for dest in json.loads(text)}
+    assert saved[slugs[2]]["auto_photos"] is True and "Cli.jpg" in saved[slugs[2]]["image"]
+    assert "\n" not in text  # a compact file stays compact
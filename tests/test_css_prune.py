@@ -0,0 +1,76 @@
+import re
+
+import css_prune
+import generate_destinations
+
+
+CSS = """
+:root { --ink: #222; }
+body { color: var(--ink); }
+.card h3 { margin: 0; }
+.pager a.active { font-weight: 700; }
+#trierMap { height: 320px; }
+.search-empty { opacity: 0.6; }
+.leaflet-popup { padding: 4px; }
+.card[hidden] { display: none; }
+.spin { animation: spin 1s linear infinite; }
+@keyframes spin { to { transform: rotate(360deg); } }
+@media (max-width: 600px) {
+  .card { padding: 8px; }
+  .pager { display: none; }
+}
+"""
+
+
+def page(body, script=""):
+    return f"<html><head><style>{CSS}</style></head><body>{body}<script>{script}</script></body></html>"
+
+
+def styles(html):
+    return re.search(r"<style>(.*?)</style>", html, re.S).group(1)
+
+
+def test_keeps_only_rules_the_page_matches():
+    pruner = css_prune.CssPruner(CSS)
+    css = styles(pruner.apply(page('<article class="card"><h3>Trier</h3></article>')))
+    assert ".card h3" in css and ":root" in css and "body {" in css
+    assert ".pager" not in css and "#trierMap" not in css and ".spin" not in css
+    assert "@media (max-width: 600px) {\n.card { padding: 8px; }\n}" in css
+    assert "@keyframes spin" not in css
+    assert ".leaflet-popup" in css
+
+
+def test_script_words_and_later_markup_count_as_used():
+    pruner = css_prune.CssPruner(CSS, extra_scripts=('panel.innerHTML = "<div class=\\"search-empty\\"></div>";',))
+    css = styles(pruner.apply(page("<div></div>", 'el.classList.add("spin"); map = L.map("trierMap");'), '<a class="active">1</a>'))
+    assert ".search-empty" in css and "#trierMap" in css
+    assert ".spin" in css and "@keyframes spin" in css
+    assert ".pager a.active" not in css
+
+    css = styles(pruner.apply(page("<div></div>"), '<nav class="pager"><a class="active">1</a></nav>'))
+    assert ".pager a.active" in css
+
+
+def test_pages_with_the_same_layout_share_one_variant():
+    pruner = css_prune.CssPruner(CSS)
+    first = pruner.apply(page('<article class="card"><h3>Trier</h3></article>', 'var DATA = ["Porta Nigra"];'))
+    second = pruner.apply(page('<article class="card"><h3>Mainz</h3></article>', 'var DATA = ["Dom"];'))
+    assert styles(first) == styles(second)
+    assert pruner.pages == 2 and len(pruner.cache) == 1
+    assert pruner.apply("<p>no styles</p>") == "<p>no styles</p>"
+
+
+def test_build_prunes_stylesheet_per_page(site):
+    root, slugs = site
+    full = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False, prune_css=False).render()
+    builder = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False)
+    pruned = builder.render()
+    assert set(pruned) == set(full)
+    page_name = f"destinations/{slugs[0]}.html"
+    assert len(pruned[page_name]) < len(full[page_name])
+    assert styles(pruned[page_name]) != styles(pruned["trips-car.html"])
+    assert ".search-results" in styles(pruned[page_name]) and ".search-empty" in styles(pruned[page_name])
+    for name, content in pruned.items():
+        if name.endswith(".html"):
+            assert content.replace(styles(content), "") == full[name].replace(styles(full[name]), "")
+    assert builder.pruner.pages == sum(name.endswith(".html") for name in pruned)
@@ -0,0 +1,102 @@
+import json
+
+import destination_store
+import generate_destinations
+
+
+def real_records():
+    return json.loads(generate_destinations.DATA_PATH.read_text(encoding="utf-8"))
+
+
+def test_export_reproduces_the_imported_json(tmp_path):
+    records = real_records()
+    records[0] = dict(records[0], odd={"nested": [1, None]}, groomed=False, tips=[])
+    conn = destination_store.connect(tmp_path / "store.sqlite")
+    report = destination_store.import_records(conn, records)
+    assert len(report["changed"]) == len(records) and report["revision"] == 1
+    assert json.dumps(destination_store.export_records(conn)) == json.dumps(records)
+    assert conn.execute("SELECT COUNT(*) FROM map_points").fetchone()[0] > 0
+    assert conn.execute("SELECT COUNT(*) FROM photos").fetchone()[0] > 0
+
+    again = destination_store.import_records(conn, records)
+    assert again["changed"] == [] and again["revision"] == 1
+
+
+def test_changes_are_tracked_by_revision(tmp_path):
+    records = real_records()
+    conn = destination_store.connect(tmp_path / "store.sqlite")
+    destination_store.import_records(conn, records)
+    edited = dict(records[3], summary="Edited.")
+    destination_store.import_records(conn, [edited], merge=True)
+    assert destination_store.changed_since(conn, 1) == ([edited["slug"]], [], 2)
+    assert len(destination_store.slugs_in_order(conn)) == len(records)
+
+    destination_store.import_records(conn, [record for record in records if record["slug"] != records[5]["slug"]])
+    changed, removed, current = destination_store.changed_since(conn, 2)
+    assert removed == [records[5]["slug"]] and changed == [edited["slug"]] and current == 3
+    assert destination_store.changed_since(conn, 3) == ([], [], 3)
+
+    kept = [record for record in records if record is not records[5]]
+    kept[0], kept[1] = kept[1], kept[0]
+    destination_store.import_records(conn, kept)
+    assert set(destination_store.changed_since(conn, 3)[0]) == {kept[0]["slug"], kept[1]["slug"]}
+    assert destination_store.slugs_in_order(conn) == [record["slug"] for record in kept]
+
+
+def test_indexed_selection_matches_list_pages(tmp_path):
+    records = real_records()
+    conn = destination_store.connect(tmp_path / "store.sqlite")
+    destination_store.import_records(conn, records, generate_destinations.store_travel)
+    data = list(generate_destinations.normalize_stage(real_records()))
+    for filename in generate_destinations.LIST_FILENAMES + generate_destinations.HUB_FILENAMES:
+        filters = generate_destinations.page_filters(filename)
+        expected = generate_destinations.page_members(data, filename)
+        assert (destination_store.select_slugs(conn, **filters) if filters else []) == expected, filename
+    plan = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN SELECT slug FROM destinations WHERE category_page = 'x'"))
+    assert "destinations_category" in plan
+
+    assert destination_store.search(conn, "chairlift")[0][0] == "cochem-germany"
+    assert destination_store.search(conn, 'chair" OR') == []
+
+
+def test_builds_and_watch_reloads_from_the_store(site):
+    root, slugs = site
+    store = root / "data" / "destinations.sqlite"
+    records = json.loads((root / "data" / "destinations.json").read_text(encoding="utf-8"))
+    conn = destination_store.connect(store)
+    destination_store.import_records(conn, records, generate_destinations.store_travel)
+
+    from_json = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False).render()
+    from_store = generate_destinations.SiteBuilder(root, data_path=store, maps_key="", fetch_photos=False).render()
+    assert from_store == from_json
+
+    rebuilder = generate_destinations.Rebuilder(generate_destinations.SiteBuilder(root, data_path=store, maps_key="", fetch_photos=False))
+    assert dict(rebuilder.outputs()) == from_json
+    destination_store.import_records(conn, [dict(records[0], groomed=False)], generate_destinations.store_travel, merge=True)
+    assert rebuilder.stale()
+    rebuilt = dict(rebuilder.outputs())
+    assert rebuilder.changed == {slugs[0]}
+    assert f"destinations/{slugs[0]}.html" in rebuilt and f"destinations/{slugs[1]}.html" not in rebuilt
+    assert generate_destinations.FUTURE_PAGE["filename"] in rebuilt
+
+
+def test_store_builds_select_list_pages_from_the_indexes(site, monkeypatch):
+    root, _ = site
+    store = root / "data" / "destinations.sqlite"
+    records = json.loads((root / "data" / "destinations.json").read_text(encoding="utf-8"))
+    destination_store.import_records(destination_store.connect(store), records, generate_destinations.store_travel)
+    scanned = []
+    select = generate_destinations.select_list_destinations
+
+    def recording(destinations, *args, **kwargs):
+        selected = select(destinations, *args, **kwargs)
+        scanned.append(([dest["slug"] for dest in destinations], [dest["slug"] for dest in selected]))
+        return selected
+
+    monkeypatch.setattr(generate_destinations, "select_list_destinations", recording)
+    from_store = generate_destinations.SiteBuilder(root, data_path=store, maps_key="", fetch_photos=False).render(pages=("lists",))
+    assert scanned and all(given == kept for given, kept in scanned)
+
+    scanned.clear()
+    assert generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False).render(pages=("lists",)) == from_store
+    assert any(given != kept for given, kept in scanned)
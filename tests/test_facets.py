@@ -0,0 +1,58 @@
+import base64
+import json
+import re
+import struct
+
+import facets
+import generate_destinations
+
+
+def decode_bitset(encoded, size):
+    raw = base64.b64decode(encoded)
+    words = struct.unpack(f"<{len(raw) // 4}I", raw)
+    return [idx for idx in range(size) if words[idx >> 5] >> (idx & 31) & 1]
+
+
+def dest(title, best_for, length="1 day", indoor=False):
+    return {"title": title, "best_for": best_for, "length": length, "indoor_attractions": ["Museum"] if indoor else []}
+
+
+def test_best_for_matches_whole_words():
+    assert facets.best_for_groups("Party start, apartment season, capacity") == []
+    assert facets.best_for_groups("Art museums and castles") == ["Culture and history"]
+    assert facets.best_for_groups("Riverside towns") == ["Water and beaches"]
+    assert facets.best_for_groups("Low-stress hiking with views") == ["Outdoors and scenery", "Easy pace"]
+    assert facets.best_for_groups("Beaches") == ["Water and beaches"]
+
+
+def test_facet_table_bitsets_and_orders():
+    destinations = [
+        dest("Trier, Germany", "History", indoor=True),
+        dest("Bled, Slovenia", "Lake swims"),
+        dest("Cochem, Germany", "Castle views", length="2-3 days"),
+    ]
+    rows = [{"values": facets.facet_values(d, minutes), "minutes": minutes, "title": d["title"]} for d, minutes in zip(destinations, (70, None, 90))]
+    table, counts = facets.build_facet_table(rows)
+    assert decode_bitset(table["facets"]["country"]["Germany"], 3) == [0, 2]
+    assert decode_bitset(table["facets"]["indoor"]["Has indoor options"], 3) == [0]
+    assert "minutes" not in table["facets"] and "minutes" not in counts  # one bucket only
+    assert table["orders"] == {"minutes": [0, 2, 1], "title": [1, 2, 0]}
+
+    wide = [{"values": {"country": ["A" if idx % 2 else "B"]}, "minutes": None, "title": str(idx)} for idx in range(40)]
+    table, _ = facets.build_facet_table(wide)
+    assert decode_bitset(table["facets"]["country"]["A"], 40) == list(range(1, 40, 2))
+
+
+def test_list_page_carries_the_filter_payload():
+    builder = generate_destinations.SiteBuilder(maps_key="", fetch_photos=False, drive_budget=0, related_limit=0)
+    page = builder.render(pages=("lists",))["day-trips-car.html"]
+    payload = json.loads(re.search(r'<script type="application/json" id="facet-table">(.*?)</script>', page).group(1))
+    cards = re.findall(r'data-card="(\d+)"', page)
+    assert payload["size"] == len(cards) and sorted(map(int, cards)) == list(range(len(cards)))
+    assert payload["facets"]["best_for"]
+    for values in payload["facets"].values():
+        members = [decode_bitset(encoded, payload["size"]) for encoded in values.values()]
+        assert all(members) and set().union(*map(set, members)) <= set(range(payload["size"]))
+
+    controls = facets.facet_controls_html({"size": 2, "facets": {}, "orders": {"x": "</script>"}}, {})
+    assert controls.count("</script>") == 1 and "<\\/script>" in controls
@@ -0,0 +1,58 @@
+import fragment_cache
+
+
+def test_counts_hits_and_misses_per_kind():
+    cache = fragment_cache.FragmentCache()
+    calls = []
+    render = lambda: calls.append(1) or "<a></a>"
+    assert cache.get("nav", "index.html", render) == "<a></a>"
+    assert cache.get("nav", "index.html", render) == "<a></a>"
+    cache.get("card", ("paris", "Paris"), render)
+    assert len(calls) == 2
+    assert cache.stats() == {"card": {"hits": 0, "misses": 1}, "nav": {"hits": 1, "misses": 1}}
+    assert "nav 1/2 (50%)" in cache.format_stats()
+
+
+def test_evicts_oldest_entry_at_limit():
+    cache = fragment_cache.FragmentCache(max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.get("kind", key, lambda: key.upper())
+    assert list(cache.entries) == [("kind", "b"), ("kind", "c")]
+
+
+def test_hits_keep_entries_from_eviction():
+    cache = fragment_cache.FragmentCache(max_entries=2)
+    cache.get("kind", "hot", lambda: "H")
+    cache.get("kind", "a", lambda: "A")
+    cache.get("kind", "hot", lambda: "H")
+    cache.get("kind", "b", lambda: "B")
+    assert list(cache.entries) == [("kind", "hot"), ("kind", "b")]
+
+
+def test_disabled_cache_always_renders():
+    cache = fragment_cache.FragmentCache(max_entries=0)
+    cache.get("kind", "a", lambda: "A")
+    cache.get("kind", "a", lambda: "A")
+    assert cache.stats()["kind"] == {"hits": 0, "misses": 2}
+    assert not cache.entries
+
+
+def test_persists_between_builds_only_for_same_salt(tmp_path):
+    path = tmp_path / "fragments.pickle"
+    first = fragment_cache.FragmentCache(salt="v1")
+    first.get("nav", "index.html", lambda: "<nav>")
+    first.save(path)
+
+    warm = fragment_cache.FragmentCache(salt="v1")
+    assert warm.load(path) == 1
+    assert warm.get("nav", "index.html", lambda: "stale") == "<nav>"
+
+    changed = fragment_cache.FragmentCache(salt="v2")
+    assert changed.load(path) == 0
+    assert not changed.entries
+
+
+def test_ignores_unreadable_cache(tmp_path):
+    path = tmp_path / "fragments.pickle"
+    path.write_bytes(b"not a pickle")
+    assert fragment_cache.FragmentCache().load(path) == 0
@@ -0,0 +1,166 @@
+"""Golden-output tests: render the real dataset offline and compare with tests/golden.
+
+Run with UPDATE_GOLDEN=1 to rewrite the snapshots and the throughput baseline
+after an intended change, then review the diff under tests/golden/.
+"""
+
+import difflib
+import hashlib
+import html
+import json
+import os
+import shutil
+import statistics
+import time
+from pathlib import Path
+
+import fragment_cache
+import generate_destinations
+
+
+GOLDEN = Path(__file__).resolve().parent / "golden"
+SNAPSHOT_DIR = GOLDEN / "site"
+BASELINE_PATH = GOLDEN / "baseline.json"
+UPDATE_ENV = "UPDATE_GOLDEN"
+TOLERANCE_ENV = "GOLDEN_PERF_TOLERANCE"
+DEFAULT_TOLERANCE = 0.25
+TIMING_RUNS = 7
+ORIGIN = "ramstein"
+MAPS_KEY = "golden-key"
+DIFF_LINES = 40
+
+
+class OfflineClient:
+    """Answers every Commons search with one image named after the request, so photo lookups are repeatable."""
+
+    def start_budget(self, seconds):
+        pass
+
+    def get_json(self, url):
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+        return {"query": {"pages": {"1": {"imageinfo": [{"url": f"https://upload.wikimedia.org/wikipedia/commons/a/ab/{name}.jpg"}]}}}}
+
+
+def updating():
+    return os.environ.get(UPDATE_ENV, "") not in ("", "0")
+
+
+def render_site(tmp_path):
+    builder = generate_destinations.SiteBuilder(
+        generate_destinations.ROOT,
+        maps_key=MAPS_KEY,
+        client=OfflineClient(),
+        distance_path=tmp_path / "distances.pickle",
+        origins=[ORIGIN],
+    )
+    return builder.render()
+
+
+def normalized_records():
+    records = generate_destinations.normalize_stage(generate_destinations.read_records(generate_destinations.DATA_PATH))
+    return {dest["slug"]: {"modes": dest["modes"], "tag": dest.get("tag") or ""} for dest in records}
+
+
+def golden_outputs(tmp_path):
+    outputs = render_site(tmp_path)
+    outputs["normalized.json"] = json.dumps(normalized_records(), indent=2, ensure_ascii=False) + "\n"
+    return outputs
+
+
+def write_snapshots(outputs):
+    shutil.rmtree(SNAPSHOT_DIR, ignore_errors=True)
+    for name, body in outputs.items():
+        path = SNAPSHOT_DIR / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(body.encode("utf-8"))
+
+
+def read_snapshots():
+    return {
+        path.relative_to(SNAPSHOT_DIR).as_posix(): path.read_bytes().decode("utf-8")
+        for path in SNAPSHOT_DIR.rglob("*")
+        if path.is_file()
+    }
+
+
+def describe_differences(expected, actual):
+    missing = sorted(set(expected) - set(actual))
+    extra = sorted(set(actual) - set(expected))
+    changed = sorted(name for name in set(expected) & set(actual) if expected[name] != actual[name])
+    if not (missing or extra or changed):
+        return ""
+    lines = [f"{len(changed)} changed, {len(missing)} missing, {len(extra)} new (set {UPDATE_ENV}=1 to accept)"]
+    lines += [f"  changed {name}" for name in changed[:10]]
+    lines += [f"  missing {name}" for name in missing[:10]]
+    lines += [f"  new {name}" for name in extra[:10]]
+    if changed:
+        name = changed[0]
+        diff = difflib.unified_diff(
+            expected[name].splitlines(), actual[name].splitlines(), f"golden/{name}", f"rendered/{name}", lineterm="", n=1
+        )
+        lines += [line[:200] for line in list(diff)[:DIFF_LINES]]
+    return "\n".join(lines)
+
+
+def calibrate(records):
+    """Seconds for a fixed escape-and-format loop, the same kind of work as rendering."""
+    start = time.perf_counter()
+    for _ in range(10):
+        parts = []
+        for dest in records:
+            for key, value in sorted(dest.items()):
+                parts.append(f"<dt>{html.escape(key)}</dt><dd>{html.escape(str(value))}</dd>")
+        "".join(parts)
+    return time.perf_counter() - start
+
+
+def measure_throughput(tmp_path, monkeypatch):
+    """Median pages rendered per calibration loop.
+
+    Calibration runs alternate with renders so both see the same machine
+    load, and the ratio carries the baseline over between machines.
+    """
+    records = json.loads(generate_destinations.DATA_PATH.read_text(encoding="utf-8"))
+    render_site(tmp_path)  # warm up lazy imports and the distance table
+    ratios = []
+    for _ in range(TIMING_RUNS):
+        calibration = calibrate(records)
+        # Each run starts from an empty fragment cache, as a fresh build does.
+        monkeypatch.setattr(generate_destinations, "FRAGMENTS", fragment_cache.FragmentCache())
+        start = time.perf_counter()
+        outputs = render_site(tmp_path)
+        ratios.append(len(outputs) * calibration / (time.perf_counter() - start))
+    return len(outputs), statistics.median(ratios)
+
+
+def test_rendered_site_matches_golden_snapshots(tmp_path):
+    outputs = golden_outputs(tmp_path)
+    assert golden_outputs(tmp_path) == outputs  # rendering is deterministic
+    if updating():
+        write_snapshots(outputs)
+    report = describe_differences(read_snapshots(), outputs)
+    assert not report, report
+
+
+def test_snapshots_cover_every_page_type(tmp_path):
+    names = set(read_snapshots())
+    for filename in generate_destinations.LIST_FILENAMES + generate_destinations.HUB_FILENAMES:
+        assert filename in names and f"{ORIGIN}/{filename}" in names
+    slugs = normalized_records()
+    assert {f"destinations/{slug}.html" for slug in slugs} <= names
+    assert {f"{ORIGIN}/destinations/{slug}.html" for slug in slugs} <= names
+    assert "search/manifest.json" in names
+
+
+def test_render_throughput_has_not_regressed(tmp_path, monkeypatch):
+    pages, throughput = measure_throughput(tmp_path, monkeypatch)
+    if updating():
+        baseline = {"pages": pages, "throughput": round(throughput, 2)}
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2) + "\n", encoding="utf-8")
+    baseline = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+    tolerance = float(os.environ.get(TOLERANCE_ENV) or DEFAULT_TOLERANCE)
+    floor = baseline["throughput"] * (1 - tolerance)
+    assert throughput >= floor, (
+        f"render throughput {throughput:.2f} pages per calibration loop is below {floor:.2f}"
+        f" ({baseline['throughput']:.2f} baseline - {tolerance:.0%}) for {pages} pages"
+    )
@@ -0,0 +1,85 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_client
+
+
+@pytest.fixture
+def stub_server():
+    state = {"responses": [], "connections": set()}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            state["connections"].add(self.client_address)
+            status, headers, body = state["responses"].pop(0) if state["responses"] else (200, {}, b'{"ok": true}')
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", state
+    server.shutdown()
+    server.server_close()
+
+
+def test_reuses_connections(stub_server):
+    base, state = stub_server
+    client = http_client.HttpClient()
+    for _ in range(5):
+        assert client.get_json(base + "/api") == {"ok": True}
+    client.close()
+    assert len(state["connections"]) == 1
+    assert client.stats()["hosts"][base[len("http://") :]]["count"] == 5
+
+
+def test_retries_honour_retry_after(stub_server):
+    base, state = stub_server
+    state["responses"] = [(429, {"Retry-After": "3"}, b""), (503, {}, b"")]
+    delays = []
+    client = http_client.HttpClient(backoff=0.25, sleep=delays.append)
+    assert client.get_json(base + "/api") == {"ok": True}
+    assert delays == [3.0, 0.5]
+    assert client.retried == 2
+
+
+def test_follows_redirects_and_gives_up_on_loops(stub_server):
+    base, state = stub_server
+    state["responses"] = [(302, {"Location": "/moved"}, b"<a>moved</a>")]
+    client = http_client.HttpClient()
+    assert client.get_json(base + "/api") == {"ok": True}
+
+    state["responses"] = [(301, {"Location": "/again"}, b"")] * (http_client.MAX_REDIRECTS + 1)
+    with pytest.raises(http_client.HttpError):
+        client.get(base + "/api")
+    state["responses"] = [(302, {}, b"")]
+    with pytest.raises(http_client.HttpError):
+        client.get(base + "/api")
+
+
+def test_retry_after_beyond_budget_gives_up(stub_server):
+    base, state = stub_server
+    state["responses"] = [(503, {"Retry-After": "120"}, b"")]
+    client = http_client.HttpClient(budget=5, sleep=lambda _: None)
+    with pytest.raises(http_client.DeadlineExceeded):
+        client.get(base + "/api")
+
+
+def test_circuit_opens_after_repeated_failures():
+    client = http_client.HttpClient(retries=0, failure_threshold=3, timeout=0.5)
+    for _ in range(3):
+        with pytest.raises(OSError):
+            client.get("http://127.0.0.1:9/unreachable")
+    assert client.offline
+    with pytest.raises(http_client.CircuitOpen):
+        client.get("http://127.0.0.1:9/unreachable")
@@ -0,0 +1,116 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import generate_destinations
+import image_check
+
+
+FILES = {
+    "Good_photo.jpg": {"mime": "image/jpeg", "width": 4000, "height": 3000},
+    "Tiny_photo.jpg": {"mime": "image/jpeg", "width": 320, "height": 240},
+    "Drawing.svg": {"mime": "image/svg+xml", "width": 2000, "height": 2000},
+}
+
+
+@pytest.fixture
+def stub_api():
+    calls = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            params = parse_qs(urlparse(self.path).query)
+            titles = params["titles"][0].split("|")
+            calls.append(titles)
+            pages = []
+            for title in titles:
+                info = FILES.get(title[len("File:") :].replace(" ", "_"))
+                if info is None:
+                    pages.append({"title": title, "missing": True})
+                else:
+                    pages.append({"title": title, "imageinfo": [dict(info, url="https://example.invalid/" + title)]})
+            body = json.dumps({"query": {"pages": pages}}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/w/api.php", calls
+    server.shutdown()
+    server.server_close()
+
+
+def commons(name):
+    return f"https://upload.wikimedia.org/wikipedia/commons/thumb/a/ab/{name}/900px-{name}"
+
+
+def destinations():
+    return [
+        {
+            "slug": "one",
+            "image": commons("Good_photo.jpg"),
+            "photo_deck": [
+                {"src": "https://commons.wikimedia.org/wiki/Special:FilePath/Tiny_photo.jpg"},
+                {"src": commons("Missing_photo.jpg")},
+            ],
+        },
+        {"slug": "two", "image": commons("Drawing.svg"), "photo_deck": [{"src": "https://example.com/photo.jpg"}]},
+    ]
+
+
+def test_reports_missing_small_and_unsupported_files(stub_api, tmp_path):
+    api_url, calls = stub_api
+    report = image_check.check_destinations(
+        destinations(), generate_destinations.wikimedia_filename, tmp_path / "cache.json", api_url=api_url
+    )
+
+    problems = {(item["slug"], item["field"]): item["problem"] for item in report["failures"]}
+    assert problems == {
+        ("one", "photo_deck[0]"): "too small (320x240)",
+        ("one", "photo_deck[1]"): "file does not exist",
+        ("two", "image"): "unsupported type image/svg+xml",
+    }
+    assert [item["url"] for item in report["unchecked"]] == ["https://example.com/photo.jpg"]
+    assert len(calls) == 1 and len(calls[0]) == 4
+
+
+def test_batches_titles_and_reuses_cache(stub_api, tmp_path, monkeypatch):
+    api_url, calls = stub_api
+    monkeypatch.setattr(image_check, "BATCH_SIZE", 2)
+    cache_path = tmp_path / "cache.json"
+
+    first = image_check.check_destinations(destinations(), generate_destinations.wikimedia_filename, cache_path, api_url=api_url)
+    assert first["queried"] == 4
+    assert sorted(len(batch) for batch in calls) == [2, 2]
+
+    second = image_check.check_destinations(destinations(), generate_destinations.wikimedia_filename, cache_path, api_url=api_url)
+    assert second["queried"] == 0
+    assert len(calls) == 2
+    assert second["failures"] == first["failures"]
+
+
+def test_files_the_api_leaves_out_are_asked_about_again(tmp_path):
+    calls = []
+
+    def fetch(url):
+        calls.append(url)
+        return {"query": {"pages": [{"title": "File:Good photo.jpg", "imageinfo": [FILES["Good_photo.jpg"]]}]}}
+
+    cache = {}
+    results, queried, errors = image_check.check_files(["Good_photo.jpg", "Lost_photo.jpg"], cache, fetch=fetch, now=10**9)
+    assert results["Lost_photo.jpg"] == {"error": "not returned by API"} and not errors
+    assert set(cache) == {"Good_photo.jpg"}
+
+    results, queried, _ = image_check.check_files(["Good_photo.jpg", "Lost_photo.jpg"], cache, fetch=fetch, now=10**9 + 1)
+    assert queried == 1 and calls[-1].endswith("File%3ALost+photo.jpg")
+    assert results["Good_photo.jpg"]["checked"] == 10**9
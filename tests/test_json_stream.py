@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+import json_stream
+
+
+def write(tmp_path, text):
+    path = tmp_path / "data.json"
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, json_stream.CHUNK_SIZE])
+def test_matches_json_load(tmp_path, chunk_size):
+    items = [{"slug": f"place-{i}", "title": "Café \"quoted\" [x]", "n": i * 1000, "tags": ["a", {"b": None}]} for i in range(20)]
+    items += [12345, "plain, string", 1.5e3, True, None, []]
+    path = write(tmp_path, json.dumps(items, indent=2))
+    assert list(json_stream.iter_json_array(path, chunk_size=chunk_size)) == items
+
+
+def test_empty_array_and_bom(tmp_path):
+    assert list(json_stream.iter_json_array(write(tmp_path, "﻿ [ ]\n"), chunk_size=2)) == []
+
+
+def test_rejects_non_array(tmp_path):
+    with pytest.raises(ValueError):
+        list(json_stream.iter_json_array(write(tmp_path, '{"a": 1}')))
+
+
+def test_rejects_truncated_array(tmp_path):
+    with pytest.raises(ValueError):
+        list(json_stream.iter_json_array(write(tmp_path, '[{"a": 1}, {"b": 2}'), chunk_size=4))
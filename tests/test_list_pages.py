@@ -0,0 +1,79 @@
+import json
+import re
+from html import unescape
+
+import generate_destinations
+
+
+PAGE_SIZE = 3
+CHUNK_SIZE = 2
+
+
+def paginated(filename="trips-plane.html"):
+    data = list(generate_destinations.normalize_stage(generate_destinations.read_records(generate_destinations.DATA_PATH)))
+    page = next(page for page in generate_destinations.LIST_PAGES if page["filename"] == filename)
+    selected = generate_destinations.select_list_destinations(data, page["mode"], page["day_trip"])
+    outputs = generate_destinations.build_list_page(
+        data, page["title"], page["lede"], filename, page["mode"], page["day_trip"], "", page_size=PAGE_SIZE, chunk_size=CHUNK_SIZE
+    )
+    return selected, outputs
+
+
+def card_slugs(html):
+    return re.findall(r'<article class="card"[^>]*>\s*<a href="destinations/([^"]+)\.html"', html)
+
+
+def test_small_page_size_splits_list_into_numbered_pages():
+    selected, outputs = paginated()
+    total = -(-len(selected) // PAGE_SIZE)
+    assert total > 2
+    pages = [generate_destinations.numbered_page_name("trips-plane.html", number) for number in range(1, total + 1)]
+    assert [name for name in outputs if name.endswith(".html")] == pages
+    assert [slug for name in pages for slug in card_slugs(outputs[name])] == [dest["slug"] for dest in selected]
+
+    first, second, last = outputs[pages[0]], outputs[pages[1]], outputs[pages[-1]]
+    assert 'rel="prev"' not in first and f'<a href="{pages[1]}" rel="next">Next</a>' in first
+    assert f'<a href="{pages[0]}" rel="prev">Previous</a>' in second and f'<a href="{pages[2]}" rel="next">' in second
+    assert 'rel="next"' not in last and f'<a href="{pages[-1]}" class="active" aria-current="page">{total}</a>' in last
+    assert "(page 2)" in second and 'id="facet-table"' in first and 'id="facet-table"' not in second
+
+
+def test_first_page_lists_chunks_with_the_remaining_cards():
+    selected, outputs = paginated()
+    first = outputs["trips-plane.html"]
+    manifest = json.loads(unescape(re.search(r'data-chunks="([^"]+)"', first).group(1)))
+    assert manifest and all(name.startswith("chunks/trips-plane/") for name in manifest)
+    assert set(manifest) == {name for name in outputs if name.startswith("chunks/")}
+    assert "kmcGrid" in first and "data-chunks" not in outputs["trips-plane-2.html"]
+
+    starts, slugs = [], card_slugs(first)
+    for name in manifest:
+        chunk = json.loads(outputs[name])
+        assert len(chunk["cards"]) <= CHUNK_SIZE
+        starts.append(chunk["start"])
+        slugs += [slug for card in chunk["cards"] for slug in card_slugs(card)]
+    assert starts == list(range(PAGE_SIZE, len(selected), CHUNK_SIZE))
+    assert slugs == [dest["slug"] for dest in selected]
+
+
+def test_default_sizes_keep_small_lists_on_one_page():
+    data = list(generate_destinations.normalize_stage(generate_destinations.read_records(generate_destinations.DATA_PATH)))
+    page = generate_destinations.LIST_PAGES[0]
+    single = generate_destinations.build_list_page(
+        data, page["title"], page["lede"], page["filename"], page["mode"], page["day_trip"], "", page_size=generate_destinations.LIST_PAGE_SIZE
+    )
+    assert list(single) == [page["filename"]] and 'class="pager"' not in single[page["filename"]]
+
+
+def test_builder_takes_page_and_chunk_sizes(site):
+    root, _ = site
+    selected, expected = paginated()
+    options = dict(data_path=generate_destinations.DATA_PATH, maps_key="", fetch_photos=False)
+    builder = generate_destinations.SiteBuilder(root, page_size=PAGE_SIZE, chunk_size=CHUNK_SIZE, **options)
+    outputs = builder.render(pages=("lists",))
+    assert {name for name in outputs if re.fullmatch(r"trips-plane(-\d+)?\.html", name)} == {name for name in expected if name.endswith(".html")}
+    chunks = [json.loads(outputs[name]) for name in outputs if name.startswith("chunks/trips-plane/")]
+    assert sorted(chunk["start"] for chunk in chunks) == list(range(PAGE_SIZE, len(selected), CHUNK_SIZE))
+
+    single = generate_destinations.SiteBuilder(root, page_size=0, **options).render(pages=("lists",))
+    assert "trips-plane-2.html" not in single and not any(name.startswith("chunks/") for name in single)
@@ -0,0 +1,54 @@
+import json
+
+import generate_destinations
+
+
+ORIGINS = [
+    {"slug": "ramstein", "name": "Ramstein", "lat": 49.4369, "lon": 7.6003},
+    {"slug": "spangdahlem", "name": "Spangdahlem", "lat": 49.9727, "lon": 6.6925},
+]
+
+
+def mosel_site(root):
+    records = json.loads((generate_destinations.ROOT / "data" / "destinations.json").read_text(encoding="utf-8"))
+    picked = [dest for dest in records if dest["slug"] in ("cochem-germany", "burg-eltz-germany", "koblenz-germany")]
+    (root / "data" / "destinations.json").write_text(json.dumps(picked), encoding="utf-8")
+    (root / "data" / "origins.json").write_text(json.dumps(ORIGINS), encoding="utf-8")
+
+
+def test_estimated_tag_shifts_the_home_drive_time():
+    ramstein, spangdahlem = generate_destinations.parse_origins(json.dumps(ORIGINS))[1:]
+    dest = {"tag": "Drive | 1h 20m / Train | 2h", "center": {"lat": 50.1469, "lon": 7.1667}, "modes": ["car", "train"]}
+    assert ramstein.travel_tag(dest).startswith("Drive | about 1h ")
+    assert spangdahlem.travel_tag(dest) == "Drive | about 32m (from Spangdahlem) / Train | 2h"
+    assert generate_destinations.HOME_ORIGIN.travel_tag(dest) == dest["tag"]
+
+    curated = dict(dest, travel={"spangdahlem": "Drive | 40m (from Spangdahlem)"})
+    assert spangdahlem.travel_tag(curated) == "Drive | 40m (from Spangdahlem)"
+    assert ramstein.travel_tag({"tag": "Drive | 1h"}) == "Drive | 1h"  # no centre to estimate from
+
+
+def test_origins_share_one_render_pass(site, monkeypatch):
+    root, _ = site
+    mosel_site(root)
+    builder = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False, distance_path=root / "distances.pickle")
+    calls = []
+    shared_page = generate_destinations.shared_page
+    monkeypatch.setattr(generate_destinations, "shared_page", lambda *args: calls.append(args[0]["slug"]) or shared_page(*args))
+    outputs = builder.render()
+
+    assert calls.count("cochem-germany") == 1
+    assert not [name for name, body in outputs.items() if "{{origin." in str(body)]
+    home = outputs["destinations/cochem-germany.html"]
+    away = outputs["spangdahlem/destinations/cochem-germany.html"]
+    assert "(from Landstuhl)" in home and "Spangdahlem" not in home
+    assert "about 32m (from Spangdahlem)" in away and "approximate from Spangdahlem." in away
+    assert 'href="../../index.html"' in away and 'href="../trips-car.html"' in away
+    assert outputs["ramstein/search/manifest.json"] == outputs["search/manifest.json"]
+    assert "from Ramstein" in outputs["ramstein/day-trips-car.html"] and "Ramstein" not in outputs["day-trips-car.html"]
+    assert builder.trips["origins"] == 3 and "Combine with" in away
+
+    only = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False, origins=["ramstein"])
+    names = only.render(pages=("destinations",))
+    assert "ramstein/destinations/cochem-germany.html" in names and "destinations/cochem-germany.html" in names
+    assert not any(name.startswith("spangdahlem/") for name in names)
@@ -0,0 +1,129 @@
+import base64
+import json
+
+import generate_destinations
+import osm_import
+
+
+EXTRACT = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6" generator="test">
+  <node id="1" lat="48.8566" lon="2.3522"><tag k="place" v="city"/><tag k="name" v="Paris"/></node>
+  <node id="2" lat="33.6609" lon="-95.5555"><tag k="place" v="hamlet"/><tag k="name" v="Paris"/></node>
+  <node id="3" lat="48.8584" lon="2.2945"><tag k="tourism" v="attraction"/><tag k="name" v="Tour Eiffel"/><tag k="wikidata" v="Q243"/></node>
+  <node id="4" lat="48.8606" lon="2.3376"><tag k="tourism" v="museum"/><tag k="name" v="Musée du Louvre"/></node>
+  <node id="5" lat="48.8570" lon="2.3530"><tag k="amenity" v="parking"/></node>
+  <node id="6" lat="48.8550" lon="2.3500"><tag k="amenity" v="restaurant"/><tag k="name" v="Le Petit Zinc"/><tag k="kids_area" v="yes"/></node>
+  <node id="7" lat="48.8600" lon="2.3600"><tag k="leisure" v="playground"/></node>
+  <node id="8" lat="48.8561" lon="2.3525"/>
+  <node id="9" lat="48.5734" lon="7.7521"><tag k="place" v="city"/><tag k="name" v="Strasbourg"/></node>
+  <node id="10" lat="48.5740" lon="7.7530"><tag k="amenity" v="parking"/><tag k="name" v="Parking Kléber"/></node>
+  <node id="11" lat="49.9000" lon="2.3000"><tag k="amenity" v="restaurant"/><tag k="name" v="Far Away"/></node>
+  <node id="12" lat="48.8567" lon="2.3523"><tag k="shop" v="bakery"/><tag k="name" v="Boulangerie"/></node>
+</osm>
+"""
+
+# The same nodes written as a zlib-compressed PBF with dense nodes.
+EXTRACT_PBF = base64.b64decode(
+    "AAAADQoJT1NNSGVhZGVyGDsQLxo3eJxT4vMvzg1OzkjNTdQNM9AzU+JySc0rTvXLT0ktbmIUyMlMyi/OzSzN1TfSMzLWMwQAX2cO"
+    "kwAAAAwKB09TTURhdGEYtwMQ+gMasQN4nFWPPWhTURTH73u5eS85ef3wqVXr8nCsTjaDW7HQDlohfkyCyElyml7yPsL9sGTr5KKl"
+    "BXFx0CxFioNFB7sl0MFNrQoiCMalS8G6SHHzli7JOXDg9+fwP/8DD11gtvOtGGsEvCZ0G3iKCUG+glIo8JYwiUmDrzNjOQFArSXW"
+    "tMhSKN2xYjQnFhcphsKyaIo6agR+83J5GrzEKDIJjN8wameTorqJFjLzQBL41j89uuS3UDZF2gCQpDQaiamGkQWKKqSFju6KtAZF"
+    "a6ruoySEXJsU+DEJZawL2MzthsxMWge4bTOpqk3TgLHKsWl0Pd7ZrJKEwjzK6Ooy2s/UUtYCr4pNkm0ozWYmxrRBUlD42wn3HQjc"
+    "gZqah4ANVDhEk0N0YYimAneAZi/13x7u5ta2/647W7uH607/m9t9w7vbbmfVe/2LHzz67vbv9b58Dj6+/1e8drHz6t3E2vMfG35v"
+    "7+mGv/Wh3NkLf37N9Z4FB0+KvZfd6U+PnRfdlfKf/ZlbV9wczzPXs8Mv8CKUmB/wETY6xkbH+YnwJDt1mjG7M2ElfuZIPMvOTfLz"
+    "7D9IE41z"
+)
+
+
+def write_extract(tmp_path):
+    path = tmp_path / "region.osm"
+    path.write_text(EXTRACT, encoding="utf-8")
+    return path
+
+
+def destinations():
+    return [
+        {"slug": "paris-france", "title": "Paris, France"},
+        {"slug": "strasbourg-france", "title": "Strasbourg (Alsace), France"},
+        {"slug": "atlantis", "title": "Atlantis"},
+    ]
+
+
+def test_pbf_decoder_matches_xml(tmp_path):
+    pbf = tmp_path / "region.osm.pbf"
+    pbf.write_bytes(EXTRACT_PBF)
+    selector = osm_import.Selector(osm_import.DEFAULT_CATEGORIES)
+    xml_nodes = sorted((round(lat, 6), round(lon, 6), sorted(tags.items())) for lat, lon, tags in osm_import.iter_xml_nodes(write_extract(tmp_path), selector))
+    pbf_nodes = sorted((round(lat, 6), round(lon, 6), sorted(tags.items())) for lat, lon, tags in osm_import.iter_pbf_nodes(pbf, selector, 1))
+    assert pbf_nodes == xml_nodes
+    assert len(xml_nodes) == 10  # untagged node and the bakery are dropped
+
+
+def test_import_geocodes_and_fills_layers(tmp_path):
+    overlay_path = tmp_path / "map-overlay.json"
+    report = osm_import.import_extract(destinations(), write_extract(tmp_path), overlay_path, tmp_path / "cache", workers=1)
+    assert report["updated"] == ["paris-france", "strasbourg-france"] and report["not_found"] == ["atlantis"]
+    assert report["parsed"] and report["nodes"] == 10
+
+    paris = json.loads(overlay_path.read_text(encoding="utf-8"))["paris-france"]
+    assert paris["center"] == {"lat": 48.8566, "lon": 2.3522}  # the city, not the hamlet in Texas
+    assert paris["layers"]["poi"][0]["name"] == "Tour Eiffel"
+    assert paris["layers"]["indoor"][0]["name"] == "Musée du Louvre"
+    assert paris["layers"]["parking"] == [{"name": "Parking", "lat": 48.857, "lon": 2.353}]
+    assert [point["name"] for point in paris["layers"]["restaurants"]] == ["Le Petit Zinc"]
+    assert paris["layers"]["family_restaurants"][0]["name"] == "Le Petit Zinc"
+    assert paris["layers"]["playgrounds"][0]["name"] == "Playground"
+    assert osm_import.normalize_name("Musée du Louvre") == osm_import.normalize_name("MUSEE DU LOUVRE")
+
+
+def test_rerun_skips_unchanged_destinations_and_reuses_index(tmp_path, monkeypatch):
+    extract = write_extract(tmp_path)
+    overlay_path = tmp_path / "map-overlay.json"
+    osm_import.import_extract(destinations(), extract, overlay_path, tmp_path / "cache", workers=1)
+
+    monkeypatch.setattr(osm_import, "iter_nodes", lambda *args: 1 / 0)
+    report = osm_import.import_extract(destinations(), extract, overlay_path, tmp_path / "cache", workers=1)
+    assert report["unchanged"] == 2 and report["updated"] == [] and not report["parsed"]
+
+    report = osm_import.import_extract(destinations(), extract, overlay_path, tmp_path / "cache", radius_km=1.0, workers=1)
+    assert report["updated"] == ["paris-france", "strasbourg-france"] and not report["parsed"]
+    assert "poi" not in json.loads(overlay_path.read_text(encoding="utf-8"))["paris-france"]["layers"]
+    assert "reused cached node index" in osm_import.format_report(report)
+
+
+def test_changing_the_destination_set_keeps_the_index_and_stamps(tmp_path, monkeypatch):
+    extract = write_extract(tmp_path)
+    overlay_path = tmp_path / "map-overlay.json"
+    paris, strasbourg, _ = destinations()
+    osm_import.import_extract([paris], extract, overlay_path, tmp_path / "cache", workers=1)
+
+    monkeypatch.setattr(osm_import, "iter_nodes", lambda *args: 1 / 0)
+    report = osm_import.import_extract([paris, strasbourg], extract, overlay_path, tmp_path / "cache", workers=1)
+    assert report["unchanged"] == 1 and report["updated"] == ["strasbourg-france"] and not report["parsed"]
+    assert json.loads(overlay_path.read_text(encoding="utf-8"))["strasbourg-france"]["center"] == {"lat": 48.5734, "lon": 7.7521}
+
+    report = osm_import.import_extract([dict(paris, title="Strasbourg, France")], extract, overlay_path, tmp_path / "cache", workers=1)
+    assert report["updated"] == ["paris-france"]
+
+
+def test_overlay_never_replaces_curated_layers():
+    curated = {"slug": "x", "map": {"center": {"lat": 1.0, "lon": 2.0}, "poi": [{"name": "Curated", "lat": 1.0, "lon": 2.0}]}}
+    entry = {"center": {"lat": 5.0, "lon": 5.0}, "layers": {"poi": [{"name": "Imported"}], "parking": [{"name": "Parking"}]}}
+    merged = osm_import.apply_overlay(curated, entry)
+    assert merged["map"]["poi"] == [{"name": "Curated", "lat": 1.0, "lon": 2.0}]
+    assert merged["map"]["parking"] == [{"name": "Parking"}] and merged["map"]["center"] == {"lat": 1.0, "lon": 2.0}
+    assert "parking" not in curated["map"]
+    assert osm_import.apply_overlay(curated, None) is curated
+
+
+def test_build_renders_imported_map(site):
+    root, slugs = site
+    records = json.loads((root / "data" / "destinations.json").read_text(encoding="utf-8"))
+    bare = next(dest for dest in records if not dest.get("map"))
+    builder = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False)
+    assert "Points from OpenStreetMap" not in builder.render()[f"destinations/{bare['slug']}.html"]
+
+    extract = write_extract(root)
+    osm_import.import_extract([bare], extract, root / "data" / "map-overlay.json", root / ".cache", workers=1)
+    page = builder.render()[f"destinations/{bare['slug']}.html"]
+    assert "Points from OpenStreetMap" in page and "Tour Eiffel" in page
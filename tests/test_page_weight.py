@@ -0,0 +1,66 @@
+import json
+
+import generate_destinations
+import page_weight
+
+
+PAGE = """<!doctype html>
+<html><head><style>body{color:red}</style>
+<link rel="stylesheet" href="https://unpkg.com/leaflet.css" />
+<script src="https://unpkg.com/leaflet.js"></script>
+</head><body>
+<img src="https://example.org/a.jpg" alt="" />
+<img src="data:image/gif;base64,R0lGOD" alt="" />
+<script type="application/json" id="facet-table">{"size":1}</script>
+<script>var poiPoints = [{"lat":1,"lon":2}];
+L.tileLayer("https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png");</script>
+</body></html>"""
+
+
+def test_breaks_page_down_by_category():
+    result = page_weight.analyze_page(PAGE)
+    breakdown = result["breakdown"]
+    assert breakdown["css"] == len("body{color:red}")
+    assert breakdown["data"] == len('{"size":1}') + len('[{"lat":1,"lon":2}]')
+    assert breakdown["inline_images"] == len("data:image/gif;base64,R0lGOD")
+    assert breakdown["js"] > 0
+    assert sum(breakdown.values()) == result["bytes"] == len(PAGE.encode("utf-8"))
+    assert 0 < result["gzip"] < result["bytes"]
+    assert result["requests"] == {"scripts": 1, "stylesheets": 1, "images": 1, "tiles": page_weight.TILES_PER_VIEW, "total": 3 + page_weight.TILES_PER_VIEW}
+
+
+def test_budgets_flag_regressions(tmp_path):
+    overrides = tmp_path / "budgets.json"
+    overrides.write_text(json.dumps({"list": {"bytes": 100}}), encoding="utf-8")
+    report = page_weight.WeightReport(page_weight.load_budgets(overrides))
+    report.add("trips-car.html", "list", PAGE)
+    assert [(v["page"], v["metric"]) for v in report.violations] == [("trips-car.html", "bytes")]
+    assert report.budgets["list"]["gzip"] == page_weight.DEFAULT_BUDGETS["list"]["gzip"]
+
+    report.save(tmp_path / "report.json")
+    saved = json.loads((tmp_path / "report.json").read_text(encoding="utf-8"))
+    assert saved["summary"]["list"]["pages"] == 1
+    assert "OVER BUDGET trips-car.html" in report.format_summary()
+
+
+def test_generated_pages_fit_default_budgets(site):
+    root, _ = site
+    report = page_weight.WeightReport()
+    outputs = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False).stream()
+    for _ in generate_destinations.weigh_stage(outputs, report):
+        pass
+    assert report.pages
+    assert report.violations == []
+
+
+def test_slideshow_defers_hidden_slides(site):
+    root, slugs = site
+    builder = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False)
+    dest = next(dest for dest in builder.destinations() if dest["slug"] == slugs[0])
+    html = builder.render(pages=("destinations",))[f"destinations/{slugs[0]}.html"]
+    assert html.count('fetchpriority="high"') == 1
+    result = page_weight.analyze_page(html)
+    assert result["deferred_images"] == len(dest["photo_deck"]) - 1 > 0
+    report = page_weight.WeightReport()
+    report.add("slides.html", "destination-map", html)
+    assert f"(+{result['deferred_images']} deferred images)" in report.format_summary()
@@ -0,0 +1,83 @@
+import json
+
+import generate_destinations
+
+
+class PhotoClient:
+    def __init__(self, name=None):
+        self.name = name
+
+    def start_budget(self, seconds):
+        pass
+
+    def get_json(self, url):
+        if self.name is None:
+            raise OSError("offline")
+        return {"query": {"pages": {"1": {"imageinfo": [{"url": f"https://upload.wikimedia.org/wikipedia/commons/a/ab/{self.name}"}]}}}}
+
+
+def deck(name):
+    return {"photo_deck": [{"src": name, "alt": "view"}], "image": name, "alt": "view"}
+
+
+def test_write_back_keeps_every_untouched_byte(tmp_path):
+    records = [{"slug": "a", "title": "A"}, {"slug": "b", "title": "B", "tips": ["one"]}, {"slug": "c", "title": "C"}]
+    lines = (json.dumps(records, indent=2) + "\n").split("\n")
+    # A data file edited on two platforms: CRLF up to the second record, LF after it.
+    raw = "\r\n".join(lines[:8]) + "\r\n" + "\n".join(lines[8:])
+    path = tmp_path / "destinations.json"
+    path.write_bytes(raw.encode("utf-8"))
+
+    assert generate_destinations.save_discovered_photos({"b": deck("b.jpg")}, "data", data_path=path) == 1
+    text = path.read_bytes().decode("utf-8")
+    saved = json.loads(text)
+    assert saved[1]["photo_deck"][0]["src"] == "b.jpg" and saved[1]["auto_photos"] is True
+    assert saved[0] == records[0] and saved[2] == records[2]
+
+    before, after = generate_destinations.array_spans(raw), generate_destinations.array_spans(text)
+    assert text[: after[1][0]] == raw[: before[1][0]]
+    assert text[after[1][1] :] == raw[before[1][1] :]
+    element = text[after[1][0] : after[1][1]]
+    assert "\r\n" in element and "\n" not in element.replace("\r\n", "")
+
+
+def test_overlay_merges_with_saved_decks(tmp_path):
+    overlay = tmp_path / "photo-overlay.json"
+    overlay.write_text(json.dumps({"b": deck("old-b.jpg"), "z": deck("z.jpg")}), encoding="utf-8")
+    generate_destinations.save_discovered_photos({"b": deck("b.jpg"), "a": deck("a.jpg")}, "overlay", overlay_path=overlay)
+    saved = json.loads(overlay.read_text(encoding="utf-8"))
+    assert list(saved) == ["a", "b", "z"]
+    assert saved["b"] == deck("b.jpg") and saved["z"] == deck("z.jpg")
+
+
+def test_refresh_replaces_auto_decks_and_keeps_them_when_lookups_fail(site):
+    root, slugs = site
+    path = root / "data" / "destinations.json"
+    records = json.loads(path.read_text(encoding="utf-8"))
+    records[0].update(deck("saved.jpg"), auto_photos=True)
+    path.write_text(json.dumps(records), encoding="utf-8")
+    (root / "data" / "photo-overlay.json").write_text(json.dumps({slugs[2]: deck("overlay.jpg")}), encoding="utf-8")
+
+    def refreshed(client):
+        discovered = {}
+        builder = generate_destinations.SiteBuilder(root, maps_key="", client=client)
+        by_slug = {dest["slug"]: dest for dest in builder.destinations(refresh_photos=True, discovered=discovered)}
+        return by_slug, discovered
+
+    by_slug, discovered = refreshed(PhotoClient())
+    assert by_slug[slugs[0]]["image"] == "saved.jpg" and by_slug[slugs[2]]["image"] == "overlay.jpg"
+    assert discovered == {}
+
+    by_slug, discovered = refreshed(PhotoClient("Fresh.jpg"))
+    assert by_slug[slugs[0]]["image"].endswith("Fresh.jpg") and by_slug[slugs[2]]["image"].endswith("Fresh.jpg")
+    assert set(discovered) == {slugs[0], slugs[2]}
+    assert by_slug[slugs[1]]["photo_deck"] == records[1]["photo_deck"]
+
+
+def test_write_back_keeps_a_compact_file_compact(tmp_path):
+    path = tmp_path / "destinations.json"
+    path.write_text(json.dumps([{"slug": "a"}, {"slug": "b"}]), encoding="utf-8")
+    generate_destinations.save_discovered_photos({"a": deck("a.jpg")}, "data", data_path=path)
+    text = path.read_text(encoding="utf-8")
+    assert "\n" not in text and text.endswith(', {"slug": "b"}]')
+    assert json.loads(text)[0]["image"] == "a.jpg"
@@ -0,0 +1,76 @@
+import base64
+import hashlib
+
+import generate_destinations
+import placeholders
+
+
+# 16x8 baseline JPEG: left half rgb(200, 40, 40), right half rgb(40, 60, 200).
+TWO_BLOCK_JPEG = base64.b64decode(
+    "/9j/4AAQSkZJRgABAQAAAQABAAD/2wBDAAMCAgMCAgMDAwMEAwMEBQgFBQQEBQoHBwYIDAoMDAsKCwsNDhIQDQ4RDgsLEBYQERMU"
+    "FRUVDA8XGBYUGBIUFRT/2wBDAQMEBAUEBQkFBQkUDQsNFBQUFBQUFBQUFBQUFBQUFBQUFBQUFBQUFBQUFBQUFBQUFBQUFBQUFBQU"
+    "FBQUFBQUFBT/wAARCAAIABADAREAAhEBAxEB/8QAHwAAAQUBAQEBAQEAAAAAAAAAAAECAwQFBgcICQoL/8QAtRAAAgEDAwIEAwUF"
+    "BAQAAAF9AQIDAAQRBRIhMUEGE1FhByJxFDKBkaEII0KxwRVS0fAkM2JyggkKFhcYGRolJicoKSo0NTY3ODk6Q0RFRkdISUpTVFVW"
+    "V1hZWmNkZWZnaGlqc3R1dnd4eXqDhIWGh4iJipKTlJWWl5iZmqKjpKWmp6ipqrKztLW2t7i5usLDxMXGx8jJytLT1NXW19jZ2uHi"
+    "4+Tl5ufo6erx8vP09fb3+Pn6/8QAHwEAAwEBAQEBAQEBAQAAAAAAAAECAwQFBgcICQoL/8QAtREAAgECBAQDBAcFBAQAAQJ3AAEC"
+    "AxEEBSExBhJBUQdhcRMiMoEIFEKRobHBCSMzUvAVYnLRChYkNOEl8RcYGRomJygpKjU2Nzg5OkNERUZHSElKU1RVVldYWVpjZGVm"
+    "Z2hpanN0dXZ3eHl6goOEhYaHiImKkpOUlZaXmJmaoqOkpaanqKmqsrO0tba3uLm6wsPExcbHyMnK0tPU1dbX2Nna4uPk5ebn6Onq"
+    "8vP09fb3+Pn6/9oADAMBAAIRAxEAPwDxSvzc/tU4+v8AQs/zyP/Z"
+)
+
+
+def test_decodes_block_colours_from_baseline_jpeg():
+    width, height, cols, rows, pixels = placeholders.image_pixels(TWO_BLOCK_JPEG)
+    assert (width, height, cols, rows) == (16, 8, 2, 1)
+    for pixel, expected in zip(pixels, [(200, 40, 40), (40, 60, 200)]):
+        assert all(abs(a - b) <= 6 for a, b in zip(pixel, expected))
+
+
+def test_placeholder_is_a_tiny_png_that_round_trips():
+    entry = placeholders.make_placeholder(TWO_BLOCK_JPEG)
+    assert entry["width"] == 16 and entry["height"] == 8
+    assert entry["uri"].startswith("data:image/png;base64,") and len(entry["uri"]) < 400
+    png = base64.b64decode(entry["uri"].split(",", 1)[1])
+    cols, rows, pixels = placeholders.png_pixels(png)
+    assert (cols, rows) == (2, 1)
+    assert entry["color"] in ("#%02x%02x%02x" % pixel for pixel in pixels)
+
+
+def test_cache_never_reprocesses_an_image(tmp_path, monkeypatch):
+    url = "https://example.org/a.jpg"
+    fetched = []
+
+    def fetch(source):
+        fetched.append(source)
+        return TWO_BLOCK_JPEG if source == url else b"GIF89a"
+
+    cache = placeholders.PlaceholderCache(tmp_path / "placeholders.json", tmp_path / "images", fetch)
+    assert cache.get(url)["width"] == 16
+    assert cache.get("https://example.org/broken.jpg") is None
+    assert fetched == [url, "https://example.org/broken.jpg"]
+    assert (tmp_path / "images" / hashlib.sha1(url.encode("utf-8")).hexdigest()).read_bytes() == TWO_BLOCK_JPEG
+    cache.save()
+
+    monkeypatch.setattr(placeholders, "make_placeholder", lambda data: 1 / 0)
+    again = placeholders.PlaceholderCache(tmp_path / "placeholders.json", tmp_path / "images")
+    assert again.load() == 2
+    assert again.get(url) == cache.get(url)
+    assert again.get("https://example.org/broken.jpg") is None
+    assert again.computed == 0
+
+
+def test_build_emits_placeholders_with_intrinsic_size(site):
+    root, slugs = site
+    builder = generate_destinations.SiteBuilder(
+        root, maps_key="", fetch_photos=False, placeholder_path=root / ".cache" / "placeholders.json"
+    )
+    images = root / ".cache" / "images"
+    images.mkdir(parents=True)
+    for dest in generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False).destinations():
+        for url in [dest["image"]] + [photo["src"] for photo in dest.get("photo_deck") or []]:
+            (images / hashlib.sha1(url.encode("utf-8")).hexdigest()).write_bytes(TWO_BLOCK_JPEG)
+    outputs = builder.render()
+    page = outputs[f"destinations/{slugs[0]}.html"]
+    assert 'width="16" height="8" style="background:#' in page
+    assert "url(data:image/png;base64," in outputs["trips-car.html"] or "url(data:image/png;base64," in outputs["future-destinations.html"]
+    assert builder.placeholders.computed and not builder.placeholders.missing
@@ -0,0 +1,99 @@
+import http.client
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import generate_destinations
+import preview_server
+
+
+@pytest.fixture
+def preview(site):
+    root, slugs = site
+    builder = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), preview_server.make_handler(generate_destinations.preview_resolver(builder)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def get(path, etag=None):
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+        try:
+            conn.request("GET", path, headers={"If-None-Match": etag} if etag else {})
+            response = conn.getresponse()
+            return response.status, dict(response.getheaders()), response.read()
+        finally:
+            conn.close()
+
+    yield root, slugs, builder, get
+    server.shutdown()
+    server.server_close()
+
+
+def test_pages_revalidate_with_etags(preview):
+    root, slugs, builder, get = preview
+    page = f"/destinations/{slugs[0]}.html"
+    status, headers, body = get(page)
+    assert status == 200 and headers["Cache-Control"] == preview_server.REVALIDATE
+    assert body.decode("utf-8") == builder.render()[page[1:]]
+
+    status, again, body = get(page, headers["ETag"])
+    assert status == 304 and body == b"" and again["ETag"] == headers["ETag"]
+
+    path = root / "data" / "destinations.json"
+    records = json.loads(path.read_text(encoding="utf-8"))
+    records[0]["tips"] = ["An edited tip"]
+    path.write_text(json.dumps(records), encoding="utf-8")
+    status, edited, body = get(page, headers["ETag"])
+    assert status == 200 and edited["ETag"] != headers["ETag"] and b"An edited tip" in body
+
+
+def test_only_content_addressed_files_are_immutable(preview):
+    root, _, builder, get = preview
+    status, headers, _ = get("/search/manifest.json")
+    assert status == 200 and headers["Cache-Control"] == preview_server.REVALIDATE
+    assert get("/search/search.js")[1]["Cache-Control"] == preview_server.REVALIDATE
+    script = f"/search/{generate_destinations.search_index.SCRIPT_NAME}"
+    assert get(script)[1]["Cache-Control"] == preview_server.IMMUTABLE
+    shard = next(name for name in builder.render() if name.startswith("search/terms-"))
+    status, headers, _ = get("/" + shard)
+    assert status == 200 and headers["Cache-Control"] == preview_server.IMMUTABLE
+    assert get("/" + shard, headers["ETag"])[0] == 304
+
+    (root / "notes.0123456789.txt").write_text("not named by its digest", encoding="utf-8")
+    assert get("/notes.0123456789.txt")[1]["Cache-Control"] == preview_server.REVALIDATE
+
+
+def test_renders_only_the_requested_page(preview):
+    _, slugs, builder, get = preview
+    requests = []
+    stream = builder.stream
+    builder.stream = lambda **request: requests.append(request) or stream(**request)
+    assert get(f"/destinations/{slugs[0]}.html")[0] == 200
+    assert requests == [{"pages": ("destinations",), "only": {slugs[0]}}]
+    assert get(f"/destinations/{slugs[0]}.html")[0] == 200 and get("/search/manifest.json")[0] == 200
+    assert len(requests) == 1
+    assert get("/index.html")[0] == 200 and len(requests) == 1
+    assert get(f"/destinations/{slugs[1]}.html")[0] == 200 and len(requests) == 2
+
+
+def test_render_cache_evicts_least_recently_used():
+    cache = preview_server.RenderCache(max_entries=2)
+    cache.get("a", lambda: 1)
+    cache.get("b", lambda: 2)
+    assert cache.get("a", lambda: None) == 1
+    cache.get("c", lambda: 3)
+    assert set(cache.entries) == {"a", "c"}
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_serves_files_from_the_root_and_nothing_outside_it(preview):
+    root, _, _, get = preview
+    status, headers, body = get("/")
+    assert status == 200 and body == (root / "index.html").read_bytes()
+    assert headers["Content-Type"] == "text/html; charset=utf-8"
+    assert get("/missing.html")[0] == 404
+    outside = root.parent / f"{root.name}-outside.txt"
+    outside.write_text("secret", encoding="utf-8")
+    assert get(f"/%2e%2e/{outside.name}")[0] == 404
@@ -0,0 +1,94 @@
+import random
+import time
+
+import generate_destinations
+import related
+
+
+SCALE_DESTINATIONS = 2000
+SCALE_BUDGET_S = 1.0
+
+
+def destination(slug, summary, highlights=()):
+    return {"slug": slug, "title": slug.title(), "summary": summary, "highlights": list(highlights)}
+
+
+def test_links_destinations_that_share_distinctive_terms():
+    records = [
+        destination("cochem", "Mosel castle town with river cruises", ["Reichsburg castle"]),
+        destination("beilstein", "Tiny Mosel village below a castle ruin", ["River cruises"]),
+        destination("alps", "Ski slopes and cable cars in the mountains"),
+        destination("dolomites", "Mountain cable cars, ski school and alpine huts"),
+        destination("plain", "Something else entirely"),
+    ]
+    links = related.related_destinations(records)
+    assert [other["slug"] for other in links["cochem"]][0] == "beilstein"
+    assert [other["slug"] for other in links["dolomites"]][0] == "alps"
+    assert "plain" not in links
+    assert all(other["slug"] != slug for slug, others in links.items() for other in others)
+    assert links["alps"][0] == {"slug": "dolomites", "title": "Dolomites", "summary": records[3]["summary"]}
+
+
+def test_term_vectors_are_cached_per_record(tmp_path):
+    records = [destination(f"town-{index}", f"River town {index} with castle views") for index in range(5)]
+    path = tmp_path / "related.pickle"
+    stats = {}
+    first = generate_destinations.related_links(records, path, stats=stats)
+    assert stats["computed"] and stats["reused"] == 0
+
+    again = generate_destinations.related_links(records, path, stats=stats)
+    assert again == first and not stats["computed"] and stats["reused"] == 5
+
+    records[0] = dict(records[0], summary="Lake beach with pedal boats")
+    generate_destinations.related_links(records, path, stats=stats)
+    assert stats["computed"] and stats["reused"] == 4
+    assert len(related.TermCache(path).load().counts) == 5
+
+
+def test_postings_are_capped_for_common_terms():
+    vectors = related.tfidf_vectors([{"castle": 1, f"name{index}": 1} for index in range(200)])
+    assert len(related.inverted_index(vectors)["castle"]) == related.MAX_POSTINGS
+
+
+def test_thousands_of_destinations_stay_under_budget():
+    rng = random.Random(7)
+    words = [f"word{index}" for index in range(3000)]
+    records = [
+        destination(f"place-{index}", " ".join(rng.choice(words) for _ in range(30)), [rng.choice(words)])
+        for index in range(SCALE_DESTINATIONS)
+    ]
+    started = time.perf_counter()
+    links = related.related_destinations(records)
+    assert time.perf_counter() - started < SCALE_BUDGET_S
+    assert len(links) > SCALE_DESTINATIONS / 2
+
+
+def test_pages_show_related_strip(site):
+    root, slugs = site
+    outputs = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False).render(pages=("destinations",))
+    pages = [outputs[f"destinations/{slug}.html"] for slug in slugs]
+    assert any("You might also like" in page for page in pages)
+
+    builder = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False, related_limit=0)
+    outputs = builder.render(pages=("destinations",))
+    assert not any("You might also like" in outputs[f"destinations/{slug}.html"] for slug in slugs)
+
+
+def test_warm_build_links_from_the_cache_index(site, monkeypatch):
+    root, slugs = site
+    options = dict(maps_key="", fetch_photos=False, drive_budget=0, related_path=root / "related.pickle")
+    cold = generate_destinations.SiteBuilder(root, cache_path=root / "build.pickle", **options).render(pages=("destinations",))
+    assert cold == generate_destinations.SiteBuilder(root, **options).render(pages=("destinations",))
+
+    def unread(path):
+        raise AssertionError(f"read {path} on a warm build")
+
+    monkeypatch.setattr(generate_destinations, "read_records", unread)
+    warm = generate_destinations.SiteBuilder(root, cache_path=root / "build.pickle", **options)
+    assert warm.render(pages=("destinations",)) == cold
+    assert warm.related == dict(warm.related, destinations=len(slugs), reused=len(slugs), computed=False)
+
+    # Term counts lost with the related cache are refilled from the cached records.
+    (root / "related.pickle").unlink()
+    refilled = generate_destinations.SiteBuilder(root, cache_path=root / "build.pickle", **options)
+    assert refilled.render(pages=("destinations",)) == cold and refilled.related["computed"]
@@ -0,0 +1,45 @@
+import generate_destinations
+import resource_hints
+
+
+PAGE = """<!doctype html>
+<html><head><style>body{color:red}</style>
+</head><body>
+<a href="https://example.org/elsewhere">Not fetched</a>
+<img src="https://commons.wikimedia.org/wiki/Special:FilePath/A.jpg?width=900" alt="" />
+<link rel="stylesheet" href="https://unpkg.com/leaflet.css" crossorigin="" />
+<script src="https://unpkg.com/leaflet.js" crossorigin=""></script>
+<script>L.tileLayer("https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png");</script>
+</body></html>"""
+
+
+def test_preconnects_to_hosts_the_page_loads_from():
+    assert resource_hints.used_origins(PAGE) == [
+        ("https://commons.wikimedia.org", False),
+        ("https://upload.wikimedia.org", False),
+        ("https://unpkg.com", True),
+        ("https://a.tile.openstreetmap.org", False),
+        ("https://b.tile.openstreetmap.org", False),
+        ("https://c.tile.openstreetmap.org", False),
+    ]
+    html = resource_hints.add_hints(PAGE)
+    assert html.count('rel="preconnect"') == resource_hints.MAX_PRECONNECT
+    assert '<link rel="preconnect" href="https://unpkg.com" crossorigin />' in html
+    assert "example.org" not in html.split("</head>")[0]
+    assert resource_hints.add_hints("<p>no head</p>") == "<p>no head</p>"
+
+
+def test_pages_prefetch_their_likely_next_page(site):
+    root, slugs = site
+    builder = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False)
+    outputs = builder.render()
+    dest = next(dest for dest in builder.destinations() if dest["slug"] == slugs[0])
+    head = outputs[f"destinations/{slugs[0]}.html"].split("</head>")[0]
+    assert f'<link rel="prefetch" href="../{dest["category_page"]}" />' in head
+
+    head = outputs[dest["category_page"]].split("</head>")[0]
+    assert 0 < head.count('rel="prefetch" href="destinations/') <= resource_hints.MAX_PREFETCH
+    assert '<script type="speculationrules">' in head
+
+    plain = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False, resource_hints=False).render()
+    assert not any('rel="prefetch"' in body for name, body in plain.items() if name.endswith(".html"))
@@ -0,0 +1,79 @@
+import json
+import shutil
+import subprocess
+
+import pytest
+
+import search_index
+
+
+SAMPLES = [
+    "Parking near the Cathedral, playgrounds and cities",
+    "Crème brûlée in the old town; museums, bridges & classes",
+    "Kids love the rides at Europa-Park 2024",
+]
+
+requires_node = pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+
+
+def run_script(tmp_path, code):
+    script = tmp_path / "search.js"
+    script.write_text(search_index.search_script(), encoding="utf-8")
+    program = f"const search = require({json.dumps(str(script))});\nconsole.log(JSON.stringify({code}));"
+    result = subprocess.run(["node", "-e", program], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def build(*dests):
+    docs, postings, forms = [], {}, {}
+    for dest in dests:
+        search_index.index_document(docs, postings, dest, forms)
+    return docs, postings, forms
+
+
+def test_tokenize_folds_accents_drops_stopwords_and_stems():
+    assert search_index.words("Crème of the Crop, a B&B") == ["creme", "crop"]
+    assert search_index.tokenize("Parking at the cities' classes and museums") == ["park", "city", "class", "museum"]
+    assert search_index.stem("bus") == "bus" and search_index.stem("ing") == "ing"
+
+
+def test_shards_hold_delta_coded_postings_and_word_forms():
+    docs, postings, forms = build(
+        {"slug": "a", "title": "Parking garage"},
+        {"slug": "b", "title": "Quiet park"},
+        {"slug": "c", "title": "Parks", "tips": ["More parking"]},
+    )
+    assert postings["park"] == [0, 1, 2]
+    shard = search_index.shard_postings(postings, forms)["pa"]
+    assert shard["t"] == ["park"] and shard["p"] == [[0, 1, 1]]
+    assert shard["w"] == ["parking", "parks"] and shard["s"] == [0, 0]
+    assert "w" not in search_index.shard_postings(postings)["pa"]
+
+
+def test_docs_are_chunked_and_files_named_by_content(monkeypatch):
+    monkeypatch.setattr(search_index, "DOC_CHUNK_SIZE", 2)
+    files = search_index.render_search_files(*build(*({"slug": f"d{n}", "title": f"Town {n}"} for n in range(5))))
+    manifest = json.loads(files["manifest.json"])
+    assert manifest["count"] == 5 and len(manifest["docs"]) == 3
+    assert [json.loads(files[name])[0][0] for name in manifest["docs"]] == ["d0", "d2", "d4"]
+    for name in list(manifest["terms"].values()) + manifest["docs"]:
+        assert name.split(".")[-2] == search_index.fingerprint(files[name])
+    assert files["search.js"] == files[search_index.SCRIPT_NAME]
+
+
+@requires_node
+def test_script_tokenizes_like_python(tmp_path):
+    found = run_script(tmp_path, f"{json.dumps(SAMPLES)}.map(text => [search.words(text), search.tokens(text)])")
+    assert found == [[search_index.words(text), search_index.tokenize(text)] for text in SAMPLES]
+
+
+@requires_node
+def test_partial_words_match_before_they_stem(tmp_path):
+    _, postings, forms = build({"slug": "a", "title": "Parking garage"}, {"slug": "b", "title": "Museum"})
+    shards = search_index.shard_postings(postings, forms)
+    found = run_script(
+        tmp_path,
+        f"[['parkin', 'parkin'], ['park', null], ['parkin', null], ['museum', 'museums']].map(([term, partial]) => "
+        f"Object.keys(search.lookup({json.dumps(shards)}[term.slice(0, 2)], term, partial)))",
+    )
+    assert found == [["0"], ["0"], [], ["1"]]
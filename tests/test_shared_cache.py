@@ -0,0 +1,139 @@
+import multiprocessing
+import os
+import time
+
+import generate_destinations
+import placeholders
+import shared_cache
+
+
+def compute_once(root, log):
+    cache = shared_cache.SharedCache(root)
+
+    def compute():
+        with open(log, "a") as handle:
+            handle.write("computed\n")
+        time.sleep(0.2)
+        return b"expensive"
+
+    return cache.get_or_compute("work", "key", compute)
+
+
+def test_entries_are_content_addressed_and_verified(tmp_path):
+    cache = shared_cache.SharedCache(tmp_path)
+    cache.put("a", "one", b"same")
+    cache.put("b", "two", b"same")
+    assert cache.get("a", "one") == cache.get("b", "two") == b"same"
+    assert cache.stats() == {"objects": 1, "bytes": 4, "refs": {"a": 1, "b": 1}}
+    assert cache.get("a", "two") is None
+
+    (path,) = [path for _, _, path in cache.objects()]
+    path.write_bytes(b"torn")
+    assert cache.get("a", "one") is None and not path.exists()
+
+    photos = cache.namespace("photos")
+    assert "Paris" not in photos and photos.get("Paris", []) == []
+    photos["Paris"] = ["a.jpg"]
+    assert shared_cache.SharedCache(tmp_path).namespace("photos")["Paris"] == ["a.jpg"]
+
+
+def test_parallel_builds_compute_a_missing_entry_once(tmp_path):
+    log = tmp_path / "log"
+    context = multiprocessing.get_context("fork")
+    with context.Pool(4) as pool:
+        results = pool.starmap(compute_once, [(tmp_path / "cache", log)] * 4)
+    assert results == [b"expensive"] * 4
+    assert log.read_text().count("computed") == 1
+
+
+def test_gc_drops_least_recently_used_entries(tmp_path):
+    cache = shared_cache.SharedCache(tmp_path, max_bytes=250)
+    for index, key in enumerate(("old", "middle", "new")):
+        cache.put("ns", key, bytes([index]) * 100)
+        for _, _, path in cache.objects():
+            if path.read_bytes()[0] == index:
+                os.utime(path, (1000 + index, 1000 + index))
+    assert cache.get("ns", "old") is not None  # reading counts as a use
+    (cache.root / "objects" / "ab").mkdir()
+    (cache.root / "objects" / "ab" / ".left-behind.tmp").write_bytes(b"x")
+
+    report = cache.gc()
+    assert report == {"removed": 1, "freed": 100, "dangling": 1, "bytes": 200}
+    assert cache.get("ns", "middle") is None and cache.get("ns", "new") and cache.get("ns", "old")
+    assert not (cache.root / "objects" / "ab" / ".left-behind.tmp").exists()
+
+    cache.clear()
+    assert cache.stats()["objects"] == 0
+
+
+def test_placeholder_thumbnails_are_shared_between_builds(tmp_path):
+    cache = shared_cache.SharedCache(tmp_path / "shared")
+    fetched = []
+
+    def fetch(url):
+        fetched.append(url)
+        return b"not an image"
+
+    first = placeholders.PlaceholderCache(tmp_path / "a.json", tmp_path / "a", fetch, cache)
+    second = placeholders.PlaceholderCache(tmp_path / "b.json", tmp_path / "b", fetch, cache)
+    assert first.local_image("https://example.org/x.jpg") == second.local_image("https://example.org/x.jpg")
+    assert fetched == ["https://example.org/x.jpg"]
+
+    first.get("https://example.org/x.jpg")
+    second.entries["https://example.org/y.jpg"] = {"error": "x"}
+    second.path, second.dirty = first.path, True
+    first.save()
+    second.save()
+    again = placeholders.PlaceholderCache(first.path, tmp_path)
+    again.load()
+    assert set(again.entries) == {"https://example.org/x.jpg", "https://example.org/y.jpg"}
+
+
+class PhotoClient:
+    def __init__(self, pages=None, online=True):
+        self.pages = pages
+        self.online = online
+        self.urls = []
+
+    def start_budget(self, seconds):
+        pass
+
+    def get_json(self, url):
+        self.urls.append(url)
+        if not self.online:
+            raise OSError("offline")
+        return {"query": {"pages": self.pages or {}}}
+
+
+def test_failed_and_empty_photo_lookups_are_not_shared(site, tmp_path):
+    root, slugs = site
+    cache = shared_cache.SharedCache(tmp_path / "shared")
+    page = f"destinations/{slugs[2]}.html"
+    offline = PhotoClient(online=False)
+    generate_destinations.SiteBuilder(root, maps_key="", client=offline, shared_cache=cache).render(pages=("destinations",))
+    assert offline.urls and cache.stats()["objects"] == 0
+
+    empty = PhotoClient()
+    builder = generate_destinations.SiteBuilder(root, maps_key="", client=empty, shared_cache=cache)
+    builder.render(pages=("destinations",))
+    calls = len(empty.urls)
+    builder.render(pages=("destinations",))
+    assert calls and len(empty.urls) == calls
+    assert cache.stats()["objects"] == 0
+
+    found = {"1": {"imageinfo": [{"url": "https://upload.wikimedia.org/wikipedia/commons/a/ab/Found.jpg"}]}}
+    online = PhotoClient(found)
+    outputs = generate_destinations.SiteBuilder(root, maps_key="", client=online, shared_cache=cache).render(pages=("destinations",))
+    assert "Found.jpg" in outputs[page]
+    again = PhotoClient(online=False)
+    outputs = generate_destinations.SiteBuilder(root, maps_key="", client=again, shared_cache=cache).render(pages=("destinations",))
+    assert "Found.jpg" in outputs[page] and not again.urls
+
+
+def test_cache_command(tmp_path, capsys):
+    shared_cache.SharedCache(tmp_path).put("commons-photos", "Paris", b"[]")
+    generate_destinations.main(["cache", "stats", "--dir", str(tmp_path)])
+    assert "1 objects, 2 B of 512.0 MB" in capsys.readouterr().out
+    generate_destinations.main(["cache", "gc", "--dir", str(tmp_path), "--max-size", "0"])
+    assert "Removed 1 objects" in capsys.readouterr().out
+    assert shared_cache.parse_size("1.5K") == 1536
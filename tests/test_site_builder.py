@@ -0,0 +1,103 @@
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+import generate_destinations
+
+
+REPO = Path(__file__).resolve().parents[1]
+SCRIPTS = REPO / "scripts"
+IMPORT_BUDGET_MS = 150
+LAZY_MODULES = ("argparse", "http.client", "urllib.request", "concurrent.futures", "http_client", "image_check", "preview_server")
+
+
+class FakeClient:
+    def __init__(self):
+        self.urls = []
+        self.budgets = []
+
+    def start_budget(self, seconds):
+        self.budgets.append(seconds)
+
+    def get_json(self, url):
+        self.urls.append(url)
+        name = f"Fake_{len(self.urls)}.jpg"
+        return {"query": {"pages": {"1": {"imageinfo": [{"url": f"https://upload.wikimedia.org/wikipedia/commons/a/ab/{name}"}]}}}}
+
+
+def test_renders_in_memory_without_writing(site):
+    root, slugs = site
+    builder = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False)
+    outputs = builder.render()
+    assert {f"destinations/{slug}.html" for slug in slugs} <= set(outputs)
+    assert "search/manifest.json" in outputs
+    assert not (root / "destinations").exists()
+
+    builder.write(outputs)
+    assert (root / "destinations" / f"{slugs[0]}.html").read_text(encoding="utf-8") == outputs[f"destinations/{slugs[0]}.html"]
+
+
+def test_repeated_renders_reuse_cached_sources(site):
+    root, _ = site
+    builder = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False)
+    first = builder.render()
+    cached = dict(builder.sources)
+    assert builder.render() == first
+    assert builder.sources == cached
+
+
+def test_uses_pluggable_client_and_warm_photo_cache(site):
+    root, slugs = site
+    client = FakeClient()
+    builder = generate_destinations.SiteBuilder(root, maps_key="", client=client)
+    outputs = builder.render(pages=("destinations",))
+    assert client.urls
+    assert "Fake_1.jpg" in outputs[f"destinations/{slugs[2]}.html"]
+
+    calls = len(client.urls)
+    builder.render(pages=("destinations",))
+    assert len(client.urls) == calls
+
+
+def test_maps_key_is_per_builder(site):
+    root, slugs = site
+    with_key = generate_destinations.SiteBuilder(root, maps_key="test-key", fetch_photos=False).render(only={slugs[0]})
+    without = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False).render(only={slugs[0]})
+    page = f"destinations/{slugs[0]}.html"
+    assert "key=test-key" in with_key[page]
+    assert "maps.googleapis.com" not in without[page]
+
+
+def test_import_skips_heavy_modules():
+    code = f"import sys, generate_destinations; print([m for m in {LAZY_MODULES!r} if m in sys.modules])"
+    result = subprocess.run([sys.executable, "-c", code], cwd=SCRIPTS, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+
+def test_import_time_budget():
+    code = "import time; t = time.perf_counter(); import generate_destinations; print((time.perf_counter() - t) * 1000)"
+    timings = [
+        float(subprocess.run([sys.executable, "-c", code], cwd=SCRIPTS, capture_output=True, text=True, check=True).stdout)
+        for _ in range(3)
+    ]
+    assert statistics.median(timings) < IMPORT_BUDGET_MS
+
+
+def test_stream_renders_each_destination_as_it_arrives(site):
+    root, slugs = site
+    builder = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False)
+    consumed = []
+
+    def records():
+        for dest in builder.iter_destinations():
+            consumed.append(dest["slug"])
+            yield dest
+
+    stream = builder.stream(records())
+    name, first = next(stream)
+    assert name == f"destinations/{slugs[0]}.html"
+    assert consumed == slugs[:1]
+    outputs = dict(stream)
+    outputs[name] = first
+    assert outputs == builder.render()
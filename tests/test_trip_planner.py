@@ -0,0 +1,100 @@
+import json
+import random
+
+import generate_destinations
+import trip_planner
+
+
+def stop(slug, lat, lon, minutes=None):
+    return {"slug": slug, "title": slug.title() + ", Germany", "lat": lat, "lon": lon, "minutes": minutes}
+
+
+MOSEL = [
+    stop("cochem", 50.1469, 7.1667, 80),
+    stop("burg-eltz", 50.2056, 7.3365, 95),
+    stop("koblenz", 50.3569, 7.5890),
+    stop("saarbrucken", 49.2344, 6.9964, 37),
+    stop("cologne", 50.9375, 6.9603),
+]
+
+
+def test_matrix_rows_match_brute_force_and_are_cached(tmp_path):
+    rng = random.Random(7)
+    points = [(rng.uniform(48.0, 51.0), rng.uniform(6.0, 9.0)) for _ in range(300)]
+    matrix = trip_planner.DistanceMatrix(points, 60.0, limit=10).compute()
+    for index in (0, 42, 299):
+        brute = sorted(
+            (trip_planner.haversine_km(*matrix.points[index], *matrix.points[other]), other)
+            for other in range(len(points))
+            if other != index
+        )
+        expected = [(other, km) for km, other in brute if km <= 60.0][:10]
+        got = list(matrix.row(index))
+        assert [other for other, _ in got] == [other for other, _ in expected]
+        assert all(abs(km - want) < 1e-3 for (_, km), (_, want) in zip(got, expected))
+
+    stops = [stop(f"s{index}", lat, lon) for index, (lat, lon) in enumerate(points)]
+    cache = tmp_path / "distances.pickle"
+    assert trip_planner.distance_matrix(stops, cache).computed
+    assert not trip_planner.distance_matrix(stops, cache).computed
+    stops[3] = dict(stops[3], lat=stops[3]["lat"] + 0.01)
+    assert trip_planner.distance_matrix(stops, cache).computed
+
+
+def test_plans_stay_within_the_drive_budget():
+    matrix = trip_planner.distance_matrix(MOSEL)
+    plans = trip_planner.plan_trips(MOSEL, matrix, budget=300)
+    longest = plans["cochem"][0]
+    assert [item["slug"] for item in longest["route"]] == ["cochem", "burg-eltz", "koblenz"]
+    assert longest["minutes"] <= 300
+    assert [len(trip["route"]) for trip in plans["cochem"]] == [3, 2]
+    assert "cologne" not in plans  # more than half the budget each way
+    assert not any(item["slug"] == "saarbrucken" for trip in plans["koblenz"] for item in trip["route"])
+
+    tight = trip_planner.plan_trips(MOSEL, matrix, budget=200)
+    assert all(trip["minutes"] <= 200 for trips in tight.values() for trip in trips)
+    assert [len(trip["route"]) for trip in tight["cochem"]] == [2]
+
+
+def test_two_opt_untangles_a_route():
+    stops = [stop("a", 50.0, 7.0, 60), stop("b", 50.0, 7.6, 60), stop("c", 50.3, 7.3, 90), stop("d", 49.8, 7.3, 45)]
+    matrix = trip_planner.distance_matrix(stops)
+    crossed = [0, 1, 2, 3]
+    route, minutes = trip_planner.two_opt(crossed, stops, matrix)
+    assert minutes < trip_planner.tour_minutes(crossed, stops, matrix)
+    assert sorted(route) == crossed
+
+
+def test_build_renders_combine_sections(site):
+    root, _ = site
+    records = json.loads((generate_destinations.ROOT / "data" / "destinations.json").read_text(encoding="utf-8"))
+    picked = [dest for dest in records if dest["slug"] in ("cochem-germany", "burg-eltz-germany", "koblenz-germany")]
+    (root / "data" / "destinations.json").write_text(json.dumps(picked), encoding="utf-8")
+
+    builder = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False, distance_path=root / "distances.pickle")
+    page = builder.render(pages=("destinations",))["destinations/cochem-germany.html"]
+    assert "<h2>Combine with</h2>" in page
+    assert '<a href="burg-eltz-germany.html">Burg Eltz</a> + <a href="koblenz-germany.html">Koblenz</a>' in page
+    assert builder.trips["stops"] == 3 and builder.trips["computed"]
+    builder.render(pages=("destinations",))
+    assert not builder.trips["computed"]
+
+    plain = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False, drive_budget=0)
+    assert "Combine with" not in plain.render(pages=("destinations",))["destinations/cochem-germany.html"]
+
+
+def test_warm_build_plans_from_the_cache_index(site, monkeypatch):
+    root, _ = site
+    records = json.loads((generate_destinations.ROOT / "data" / "destinations.json").read_text(encoding="utf-8"))
+    picked = [dest for dest in records if dest["slug"] in ("cochem-germany", "burg-eltz-germany", "koblenz-germany")]
+    (root / "data" / "destinations.json").write_text(json.dumps(picked), encoding="utf-8")
+    options = dict(maps_key="", fetch_photos=False, distance_path=root / "distances.pickle", related_limit=0)
+    cold = generate_destinations.SiteBuilder(root, cache_path=root / "build.pickle", **options).render(pages=("destinations",))
+    assert cold == generate_destinations.SiteBuilder(root, **options).render(pages=("destinations",))
+
+    def unread(path):
+        raise AssertionError(f"read {path} on a warm build")
+
+    monkeypatch.setattr(generate_destinations, "read_records", unread)
+    warm = generate_destinations.SiteBuilder(root, cache_path=root / "build.pickle", **options)
+    assert warm.render(pages=("destinations",)) == cold and warm.trips["stops"] == 3
@@ -0,0 +1,79 @@
+import json
+
+import generate_destinations
+
+
+def rebuild(builder, rebuilder, out, written):
+    assert rebuilder.stale()
+    names = builder.write(rebuilder.outputs(), out, written)
+    assert not rebuilder.stale()
+    return names
+
+
+def edit(root, slug, **fields):
+    path = root / "data" / "destinations.json"
+    records = json.loads(path.read_text(encoding="utf-8"))
+    path.write_text(json.dumps([dict(dest, **fields) if dest["slug"] == slug else dest for dest in records]), encoding="utf-8")
+
+
+def destination_pages(names):
+    return {name for name in names if generate_destinations.is_destination_page(name)}
+
+
+def test_rebuilds_only_changed_destinations_into_out(site, tmp_path):
+    root, slugs = site
+    out = tmp_path / "out"
+    builder = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False)
+    rebuilder = generate_destinations.Rebuilder(builder)
+    written = {}
+    first = rebuild(builder, rebuilder, out, written)
+    assert set(first) == set(builder.render())
+    assert (out / "destinations" / f"{slugs[0]}.html").exists() and not (root / "destinations").exists()
+
+    edit(root, slugs[1], tips=["An edited tip"])
+    assert destination_pages(rebuild(builder, rebuilder, out, written)) == {f"destinations/{slugs[1]}.html"}
+    assert rebuilder.changed == {slugs[1]}
+    assert "An edited tip" in (out / "destinations" / f"{slugs[1]}.html").read_text(encoding="utf-8")
+
+
+def test_rebuilds_pages_a_destination_left(site, tmp_path):
+    root, slugs = site
+    builder = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False)
+    rebuilder = generate_destinations.Rebuilder(builder)
+    written = {}
+    rebuild(builder, rebuilder, tmp_path, written)
+    listed = {name for name, members in rebuilder.members["landstuhl"].items() if slugs[0] in members}
+    assert listed
+
+    edit(root, slugs[0], groomed=False)
+    rebuilt = rebuild(builder, rebuilder, tmp_path, written)
+    assert listed | {generate_destinations.FUTURE_PAGE["filename"]} <= set(rebuilt)
+    assert not any(slugs[0] in rebuilder.members["landstuhl"][name] for name in listed)
+
+
+def test_layout_changes_rebuild_every_page(site, tmp_path):
+    root, slugs = site
+    builder = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False)
+    rebuilder = generate_destinations.Rebuilder(builder)
+    written = {}
+    rebuild(builder, rebuilder, tmp_path, written)
+    template = root / "templates" / "destination.html"
+    template.write_text(template.read_text(encoding="utf-8").replace("</body>", "<!-- edited --></body>"), encoding="utf-8")
+    assert destination_pages(rebuild(builder, rebuilder, tmp_path, written)) == {f"destinations/{slug}.html" for slug in slugs}
+    assert rebuilder.changed == set()
+
+
+def test_prompt_edits_are_noticed_without_rendering(site, tmp_path):
+    root, _ = site
+    builder = generate_destinations.SiteBuilder(root, maps_key="", fetch_photos=False)
+    rebuilder = generate_destinations.Rebuilder(builder)
+    rebuild(builder, rebuilder, tmp_path, {})
+    prompt = root / "prompts" / "destination.md"
+    prompt.parent.mkdir()
+    prompt.write_text("Describe the town.", encoding="utf-8")
+    assert prompt in rebuilder.paths()
+    assert rebuild(builder, rebuilder, tmp_path, {}) == []
+    assert rebuilder.noticed == [prompt]
+
+    prompt.write_text("Describe the town and its playgrounds.", encoding="utf-8")
+    assert rebuild(builder, rebuilder, tmp_path, {}) == [] and rebuilder.noticed == [prompt]